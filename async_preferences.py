@@ -0,0 +1,252 @@
+from typing import Any, Callable, Dict, Optional
+import asyncio
+import functools
+import json
+
+from preference_manager import PreferenceManager
+
+
+class PreferenceChange:
+    """One change delivered to an async subscription."""
+    __slots__ = ('category', 'key', 'old_value', 'new_value')
+
+    def __init__(self, category: str, key: str, old_value: Any, new_value: Any):
+        self.category = category
+        self.key = key
+        self.old_value = old_value
+        self.new_value = new_value
+
+    def __repr__(self):
+        return (f"PreferenceChange({self.category}.{self.key}: "
+                f"{self.old_value!r} -> {self.new_value!r})")
+
+
+# Queued to tell a subscription's iterator to stop
+_CLOSED = object()
+
+
+class PreferenceSubscription:
+    """Async iterator over the changes to matching preferences.
+
+    Listeners may run on any thread, so each change is handed to the event
+    loop with call_soon_threadsafe and queued there. With a maxsize, the
+    oldest queued change is dropped when a slow consumer falls behind.
+    """
+
+    def __init__(self, pref_manager: PreferenceManager, loop: asyncio.AbstractEventLoop,
+                 category: str = None, key: str = None, maxsize: int = 0):
+        self.pref_manager = pref_manager
+        self.category = category
+        self.key = key
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize)
+        self._closed = False
+        pref_manager.add_change_listener(self._on_change, category, key)
+
+    def _on_change(self, category: str, key: str, old_value: Any, new_value: Any):
+        try:
+            self._loop.call_soon_threadsafe(
+                self._put, PreferenceChange(category, key, old_value, new_value)
+            )
+        except RuntimeError:
+            # The loop has been closed; nobody is left to read the change
+            pass
+
+    def _put(self, item):
+        queue = self._queue
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(item)
+
+    def close(self):
+        """Stop listening; iteration ends once the queued changes are read."""
+        if not self._closed:
+            self._closed = True
+            self.pref_manager.remove_change_listener(self._on_change, self.category, self.key)
+            self._put(_CLOSED)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> PreferenceChange:
+        if self._closed and self._queue.empty():
+            raise StopAsyncIteration
+        item = await self._queue.get()
+        if item is _CLOSED:
+            raise StopAsyncIteration
+        return item
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+        return False
+
+
+class AsyncPreferenceManager:
+    """asyncio façade over a PreferenceManager.
+
+    Storage is only touched from an executor: the manager is loaded there
+    and runs with autoflush off. Every change made through the façade is
+    applied on the loop thread, where it only updates memory. A single
+    writer task then flushes in the executor. Every write that arrives while
+    a flush is running or queued is covered by the next flush, so a burst of
+    concurrent aset() calls costs one save. Each aset() returns once its
+    value has been written, and raises OSError if it could not be.
+
+        prefs = AsyncPreferenceManager("preferences.json")
+        await prefs.aload()
+        await prefs.aset("general", "time_format", "24h")
+        async with prefs.subscribe("general") as changes:
+            async for change in changes:
+                ...
+
+    Arguments other than executor are passed to PreferenceManager.
+    """
+
+    def __init__(self, *args, executor=None, **kwargs):
+        kwargs["autoflush"] = False
+        self._args = args
+        self._kwargs = kwargs
+        self._executor = executor
+        self._manager = None
+        self._writer = None
+        self._wake = None
+        self._waiters = []
+
+    @property
+    def manager(self) -> PreferenceManager:
+        """The wrapped manager, for synchronous reads and listeners."""
+        if self._manager is None:
+            raise RuntimeError("Preferences are not loaded; await aload() first")
+        return self._manager
+
+    def get(self, category: str, key: str = None, default=None) -> Any:
+        """Read a preference; reads never touch storage, so they need no await."""
+        return self.manager.get(category, key, default)
+
+    async def _run(self, func: Callable, *args, **kwargs):
+        """Run blocking work in the executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def aload(self) -> PreferenceManager:
+        """Load preferences, or pick up changes another process stored since."""
+        if self._manager is None:
+            self._manager = await self._run(PreferenceManager, *self._args, **self._kwargs)
+        else:
+            await self._run(self._manager.check_for_changes)
+        return self._manager
+
+    async def aset(self, category: str, key: str, value: Any, layer: str = "user") -> bool:
+        """Set a preference and wait until it has been saved."""
+        self.manager.set(category, key, value, layer)
+        await self.aflush()
+        return True
+
+    async def aset_many(self, values: Dict[str, Dict[str, Any]], layer: str = "user") -> bool:
+        """Set several preferences at once and wait until they have been saved."""
+        self.manager.set_many(values, layer)
+        await self.aflush()
+        return True
+
+    async def areset_to_defaults(self, category: str = None):
+        """Reset preferences to defaults and wait until that has been saved."""
+        self.manager.reset_to_defaults(category)
+        await self.aflush()
+
+    async def aimport_preferences(self, filepath: str) -> bool:
+        """Import preferences from a file and wait until they have been saved.
+
+        The file is read in the executor and applied on the loop thread.
+        """
+        manager = self.manager
+        try:
+            imported = await self._run(_read_json, filepath)
+        except Exception as e:
+            print(f"Error importing preferences: {e}")
+            manager.metrics.increment("import_errors_total")
+            return False
+        if not manager.import_data(imported):
+            return False
+        await self.aflush()
+        return True
+
+    async def aexport_preferences(self, filepath: str, materialize: bool = True):
+        """Export preferences to a file."""
+        await self._run(self.manager.export_preferences, filepath, materialize)
+
+    def aflush(self) -> asyncio.Future:
+        """Wait until everything set so far has been written.
+
+        Joins the next flush of the writer task rather than starting one.
+        """
+        manager = self.manager
+        loop = asyncio.get_running_loop()
+        if self._writer is None or self._writer.done():
+            self._wake = asyncio.Event()
+            self._writer = loop.create_task(self._write_loop(manager))
+        future = loop.create_future()
+        self._waiters.append(future)
+        self._wake.set()
+        return future
+
+    async def _write_loop(self, manager: PreferenceManager):
+        """The single writer: flush once for everything waiting, then repeat."""
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            waiters, self._waiters = self._waiters, []
+            try:
+                if not await self._run(manager.flush):
+                    raise OSError("Could not save preferences")
+            except Exception as e:
+                for future in waiters:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for future in waiters:
+                    if not future.done():
+                        future.set_result(None)
+
+    def subscribe(self, category: str = None, key: str = None,
+                  maxsize: int = 0) -> PreferenceSubscription:
+        """Async iterator over changes to category.key; None matches anything."""
+        return PreferenceSubscription(self.manager, asyncio.get_running_loop(),
+                                      category, key, maxsize)
+
+    async def drain(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every change notification has been delivered."""
+        return await self._run(self.manager.drain, timeout)
+
+    async def aclose(self):
+        """Write pending changes, stop the writer task and close the manager."""
+        if self._manager is None:
+            return
+        try:
+            if self._writer is not None:
+                await self.aflush()
+        finally:
+            if self._writer is not None:
+                self._writer.cancel()
+                try:
+                    await self._writer
+                except asyncio.CancelledError:
+                    pass
+                self._writer = None
+            manager, self._manager = self._manager, None
+            await self._run(manager.close)
+
+    async def __aenter__(self):
+        await self.aload()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+        return False
+
+
+def _read_json(filepath: str) -> Dict:
+    with open(filepath, 'r') as f:
+        return json.load(f)
@@ -0,0 +1,274 @@
+"""Benchmarks for the PreferenceManager and SettingsDialog hot paths.
+
+Run with:
+    python benchmarks.py                      # full run, JSON results on stdout
+    python benchmarks.py --quick -o run.json  # smaller sizes, results to a file
+    python benchmarks.py --compare base.json run.json
+
+Results are JSON so runs from different commits can be compared.
+"""
+from typing import Any, Callable, Dict, List
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from preference_manager import PREFERENCE_SCHEMA, PreferenceManager
+from preference_storage import JSONStorage
+
+
+def make_schema(n_keys: int, keys_per_category: int = 50) -> Dict:
+    """Build a synthetic schema with n_keys preferences of every type."""
+    schema = {}
+    for i in range(n_keys):
+        category = schema.setdefault(f"category_{i // keys_per_category}", {})
+        kind = i % 4
+        if kind == 0:
+            spec = {"type": "boolean", "default": False}
+        elif kind == 1:
+            spec = {"type": "integer", "default": 10, "min": 0, "max": 1000}
+        elif kind == 2:
+            spec = {"type": "string", "default": ""}
+        else:
+            spec = {"type": "choice", "options": ["a", "b", "c", "d"], "default": "a"}
+        spec["label"] = f"Setting {i}"
+        spec["description"] = f"Synthetic setting number {i}"
+        category[f"key_{i}"] = spec
+    return schema
+
+
+def changed_values(schema: Dict) -> Dict[str, Dict[str, Any]]:
+    """A valid non-default value for every key in a schema."""
+    values = {}
+    for category, prefs in schema.items():
+        for key, spec in prefs.items():
+            if spec["type"] == "boolean":
+                value = not spec["default"]
+            elif spec["type"] == "integer":
+                value = spec.get("max", spec["default"] + 1)
+            elif spec["type"] == "string":
+                value = "changed"
+            else:
+                value = spec["options"][-1]
+            values.setdefault(category, {})[key] = value
+    return values
+
+
+def measure(func: Callable, number: int, repeat: int = 5) -> Dict[str, float]:
+    """Time func over repeat rounds of number calls; report per-call seconds."""
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        rounds.append((time.perf_counter() - start) / number)
+    return {
+        "min": min(rounds),
+        "median": statistics.median(rounds),
+        "mean": statistics.mean(rounds),
+        "ops_per_sec": 1 / min(rounds) if min(rounds) else float("inf"),
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+class Benchmarks:
+    """Collects results of the individual benchmarks."""
+
+    def __init__(self, workdir: str, sizes: List[int], fanouts: List[int]):
+        self.workdir = workdir
+        self.sizes = sizes
+        self.fanouts = fanouts
+        self.results = []
+
+    def record(self, name: str, params: Dict, stats: Dict):
+        self.results.append({"name": name, "params": params, **stats})
+        print(f"{name:<28} {json.dumps(params):<28} {stats.get('median', 0) * 1e6:12.2f} us",
+              file=sys.stderr)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.workdir, name)
+
+    def run_all(self):
+        self.bench_get_set()
+        for size in self.sizes:
+            self.bench_save_load(size)
+            self.bench_validation(size)
+            self.bench_reset_import(size)
+        for fanout in self.fanouts:
+            self.bench_listener_fanout(fanout)
+        self.bench_dialog_build()
+
+    def bench_get_set(self):
+        """get() and set() on the real schema, with and without writing to disk."""
+        manager = PreferenceManager(self.path("getset.json"))
+        self.record("get", {}, measure(lambda: manager.get("display", "theme"), 100000))
+        self.record("get_default", {}, measure(lambda: manager.get("data", "cache_duration"), 100000))
+
+        values = iter(range(10**9))
+        manager.set("data", "update_interval", 5)
+        self.record("set_sync_save", {}, measure(
+            lambda: manager.set("data", "update_interval", 5 + next(values) % 100), 200))
+
+        deferred = PreferenceManager(self.path("getset_deferred.json"), autoflush=False)
+        self.record("set_no_save", {}, measure(
+            lambda: deferred.set("data", "update_interval", 5 + next(values) % 100), 20000))
+
+    def bench_save_load(self, size: int):
+        """Full save and fresh load of a profile where every key is overridden."""
+        schema = make_schema(size)
+        path = self.path(f"saveload_{size}.json")
+        manager = PreferenceManager(path, schema=schema, autoflush=False)
+        manager.set_many(changed_values(schema))
+
+        def save():
+            manager._save_preferences(None)
+            manager.flush()
+
+        self.record("save_full", {"keys": size}, measure(save, max(1, 2000 // size), 5))
+        self.record("load", {"keys": size}, measure(
+            lambda: PreferenceManager(path, schema=schema), max(1, 2000 // size), 5))
+        self.record("load_snapshot_cache", {"keys": size}, measure(
+            lambda: PreferenceManager(path, schema=schema, snapshot_cache=True), max(1, 2000 // size), 5))
+
+        # The storage read on its own, where the snapshot cache makes its difference
+        plain = JSONStorage(path)
+        cached = JSONStorage(path, snapshot_cache=True)
+        cached.load("default")
+        self.record("storage_load", {"keys": size}, measure(
+            lambda: plain.load("default"), max(1, 20000 // size), 5))
+        self.record("storage_load_snapshot_cache", {"keys": size}, measure(
+            lambda: cached.load("default"), max(1, 20000 // size), 5))
+
+    def bench_validation(self, size: int):
+        """validate_many() over a whole profile."""
+        schema = make_schema(size)
+        manager = PreferenceManager(self.path(f"validate_{size}.json"), schema=schema)
+        values = changed_values(schema)
+        self.record("validate_many", {"keys": size}, measure(
+            lambda: manager.validate_many(values), max(1, 20000 // size)))
+
+    def bench_reset_import(self, size: int):
+        """reset_to_defaults() of a fully changed profile, and import_preferences()."""
+        schema = make_schema(size)
+        values = changed_values(schema)
+        manager = PreferenceManager(self.path(f"reset_{size}.json"), schema=schema)
+        export_path = self.path(f"export_{size}.json")
+        with open(export_path, "w") as f:
+            json.dump(values, f)
+
+        def reset():
+            manager.set_many(values)
+            manager.reset_to_defaults()
+
+        self.record("set_many_then_reset", {"keys": size}, measure(reset, max(1, 200 // size), 3))
+        self.record("import_preferences", {"keys": size}, measure(
+            lambda: (manager.import_preferences(export_path), manager.reset_to_defaults()),
+            max(1, 200 // size), 3))
+
+    def bench_listener_fanout(self, listeners: int):
+        """Cost of one set() with many listeners, half subscribed to an unrelated key."""
+        manager = PreferenceManager(self.path(f"fanout_{listeners}.json"), autoflush=False)
+        for i in range(listeners):
+            if i % 2:
+                manager.add_change_listener(lambda *a: None, "display", "theme")
+            else:
+                manager.add_change_listener(lambda *a: None, "data", "update_interval")
+        values = iter(range(10**9))
+        self.record("set_with_listeners", {"listeners": listeners}, measure(
+            lambda: manager.set("display", "theme", ("light", "dark")[next(values) % 2]), 2000))
+
+    def bench_dialog_build(self):
+        """Time to open the settings dialog; skipped when no display is available."""
+        try:
+            import tkinter as tk
+            from settings_dialog import SettingsDialog
+            root = tk.Tk()
+        except Exception as e:
+            self.results.append({"name": "dialog_build", "params": {}, "skipped": str(e)})
+            print(f"{'dialog_build':<28} skipped: {e}", file=sys.stderr)
+            return
+        try:
+            root.withdraw()
+            for size in self.sizes:
+                schema = make_schema(size)
+                manager = PreferenceManager(self.path(f"dialog_{size}.json"), schema=schema)
+
+                def build():
+                    dialog = SettingsDialog(root, manager)
+                    dialog.dialog.destroy()
+
+                self.record("dialog_build", {"keys": size}, measure(build, 1, 3))
+        finally:
+            root.destroy()
+
+
+def git_commit() -> str:
+    """The current commit hash, or '' outside a git checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except OSError:
+        return ""
+
+
+def compare(base_path: str, new_path: str):
+    """Print median time ratios (new / base) for benchmarks present in both runs."""
+    with open(base_path) as f:
+        base = {(r["name"], json.dumps(r["params"], sort_keys=True)): r for r in json.load(f)["results"]}
+    with open(new_path) as f:
+        new = json.load(f)["results"]
+    for result in new:
+        old = base.get((result["name"], json.dumps(result["params"], sort_keys=True)))
+        if not old or "median" not in old or "median" not in result:
+            continue
+        ratio = result["median"] / old["median"] if old["median"] else float("inf")
+        flag = "  SLOWER" if ratio > 1.10 else ("  faster" if ratio < 0.90 else "")
+        print(f"{result['name']:<28} {json.dumps(result['params']):<28} {ratio:6.2f}x{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-o", "--output", help="write JSON results here instead of stdout")
+    parser.add_argument("--quick", action="store_true", help="use smaller schema sizes and fan-outs")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="compare two result files")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    sizes = [10, 100, 1000] if args.quick else [10, 100, 1000, 10000]
+    fanouts = [1, 10, 100] if args.quick else [1, 10, 100, 1000]
+    with tempfile.TemporaryDirectory() as workdir:
+        benchmarks = Benchmarks(workdir, sizes, fanouts)
+        benchmarks.run_all()
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.time(),
+            # Real-schema size, for context when comparing runs
+            "schema_keys": sum(len(prefs) for prefs in PREFERENCE_SCHEMA.values()),
+        },
+        "results": benchmarks.results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+from typing import Any, Dict
+
+
+class BooleanValidator:
+    """Accept only True/False."""
+    __slots__ = ()
+
+    def __call__(self, value: Any) -> bool:
+        return isinstance(value, bool)
+
+
+class IntegerValidator:
+    """Accept integers inside optional min/max bounds."""
+    __slots__ = ('minimum', 'maximum')
+
+    def __init__(self, minimum=None, maximum=None):
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def __call__(self, value: Any) -> bool:
+        if not isinstance(value, int):
+            return False
+        if self.minimum is not None and value < self.minimum:
+            return False
+        if self.maximum is not None and value > self.maximum:
+            return False
+        return True
+
+
+class StringValidator:
+    """Accept any string."""
+    __slots__ = ()
+
+    def __call__(self, value: Any) -> bool:
+        return isinstance(value, str)
+
+
+class ChoiceValidator:
+    """Accept one of a fixed set of options."""
+    __slots__ = ('options',)
+
+    def __init__(self, options):
+        self.options = frozenset(options)
+
+    def __call__(self, value: Any) -> bool:
+        try:
+            return value in self.options
+        except TypeError:
+            # Unhashable values such as lists can never be one of the options
+            return False
+
+
+class RejectValidator:
+    """Reject everything; used for specs with an unknown type."""
+    __slots__ = ()
+
+    def __call__(self, value: Any) -> bool:
+        return False
+
+
+def compile_validator(spec: Dict):
+    """Build the validator object for a single preference spec."""
+    pref_type = spec['type']
+    if pref_type == 'boolean':
+        return BooleanValidator()
+    elif pref_type == 'integer':
+        return IntegerValidator(spec.get('min'), spec.get('max'))
+    elif pref_type == 'string':
+        return StringValidator()
+    elif pref_type == 'choice':
+        return ChoiceValidator(spec['options'])
+    return RejectValidator()
+
+
+class PreferenceEntry:
+    """One preference in the flat keyspace: its slot, dotted name, spec and default."""
+    __slots__ = ('slot', 'category', 'key', 'name', 'spec', 'default', '_validator', '_validators')
+
+    def __init__(self, slot: int, category: str, key: str, spec: Dict, validators):
+        self.slot = slot
+        self.category = category
+        self.key = key
+        self.name = f"{category}.{key}"
+        self.spec = spec
+        self.default = spec['default']
+        self._validator = None
+        self._validators = validators
+
+    @property
+    def validator(self):
+        """The compiled validator, compiled along with its category on first use."""
+        validator = self._validator
+        if validator is None:
+            validator = self._validator = self._validators[self.category][self.key]
+        return validator
+
+    def __repr__(self):
+        return f"<PreferenceEntry {self.slot}: {self.name}>"
+
+
+class _LazyValidators(dict):
+    """{category: {key: validator}} that compiles each category on first use."""
+
+    def __init__(self, schema: Dict, by_spec: Dict):
+        super().__init__()
+        self._schema = schema
+        self._by_spec = by_spec
+
+    def __missing__(self, category):
+        # Raises KeyError for categories the schema does not have
+        prefs = self._schema[category]
+        compiled = {}
+        for key, spec in prefs.items():
+            validator = compile_validator(spec)
+            compiled[key] = validator
+            self._by_spec[id(spec)] = validator
+        self[category] = compiled
+        return compiled
+
+    def get(self, category, default=None):
+        try:
+            return self[category]
+        except KeyError:
+            return default
+
+
+class CompiledSchema:
+    """A preference schema turned into validator objects and a defaults table.
+
+    Validators are compiled one category at a time, the first time a key in
+    that category is validated, so a program touching a single category never
+    compiles validators for the rest of the schema. Only the validators are
+    deferred: the defaults table, the entries and the index are built for the
+    whole schema up front, once per schema object, since compile_schema()
+    shares them between managers.
+
+    Every preference also gets an integer slot in schema order. entries holds
+    one PreferenceEntry per slot, index maps "category.key" names to them and
+    by_category maps category -> key -> entry.
+    """
+
+    def __init__(self, schema: Dict):
+        self.schema = schema
+        self._by_spec = {}  # id(spec) -> validator, for callers that only have a spec
+        self.validators = _LazyValidators(schema, self._by_spec)
+        self.defaults = {
+            category: {key: spec['default'] for key, spec in prefs.items()}
+            for category, prefs in schema.items()
+        }
+        entries = []
+        self.by_category = {}
+        for category, prefs in schema.items():
+            category_entries = self.by_category[category] = {}
+            for key, spec in prefs.items():
+                entry = PreferenceEntry(len(entries), category, key, spec, self.validators)
+                entries.append(entry)
+                category_entries[key] = entry
+        self.entries = tuple(entries)
+        self.index = {entry.name: entry for entry in entries}
+
+    def validator_for_spec(self, spec: Dict):
+        """Return the compiled validator for a spec dict from this schema."""
+        validator = self._by_spec.get(id(spec))
+        if validator is None:
+            validator = compile_validator(spec)
+        return validator
+
+    def validate(self, category: str, key: str, value: Any) -> bool:
+        """Return True if value is valid for category.key."""
+        try:
+            return self.validators[category][key](value)
+        except KeyError:
+            return False
+
+    def validate_many(self, values: Dict[str, Dict[str, Any]]) -> Dict[str, str]:
+        """Validate a nested {category: {key: value}} dict.
+
+        Returns every problem found as {"category.key": message}; an empty dict
+        means everything is valid.
+        """
+        errors = {}
+        validators = self.validators
+        for category, prefs in values.items():
+            category_validators = validators.get(category)
+            for key, value in prefs.items():
+                validator = category_validators.get(key) if category_validators else None
+                if validator is None:
+                    errors[f"{category}.{key}"] = f"Unknown preference: {category}.{key}"
+                elif not validator(value):
+                    errors[f"{category}.{key}"] = f"Invalid value for {category}.{key}: {value}"
+        return errors
+
+
+# Compiled schemas shared by every manager built from the same schema object
+_COMPILE_CACHE = {}
+
+
+def compile_schema(schema: Dict) -> CompiledSchema:
+    """Compile a schema, reusing the earlier result for the same schema object."""
+    compiled = _COMPILE_CACHE.get(id(schema))
+    # CompiledSchema keeps a reference to its schema, so a live entry's id
+    # cannot have been reused by a different dict
+    if compiled is None or compiled.schema is not schema:
+        compiled = CompiledSchema(schema)
+        _COMPILE_CACHE[id(schema)] = compiled
+    return compiled
@@ -0,0 +1,175 @@
+from typing import Any, Callable, List, Optional
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import queue
+import threading
+import time
+
+from preference_metrics import NULL_METRICS, listener_name
+
+
+def report_slow_listener(listener: Callable, category: str, key: str, elapsed: float):
+    """Default slow-listener report: print which listener held up which preference."""
+    name = listener_name(listener)
+    print(f"Slow preference change listener {name} for {category}.{key}: {elapsed * 1000:.1f} ms")
+
+
+class ListenerDispatcher:
+    """Decides where and when preference change listeners run.
+
+    This base class runs listeners immediately on the thread that made the
+    change, which is how PreferenceManager has always behaved. Slow listener
+    reports are opt-in: with slow_threshold set, listeners slower than that
+    many seconds are passed to on_slow. While metrics is enabled every timing
+    and error is also recorded, labelled with the listener's name.
+    """
+
+    # Set by PreferenceManager when its instrumentation is switched on
+    metrics = NULL_METRICS
+
+    def __init__(self, slow_threshold: Optional[float] = None,
+                 on_slow: Callable = report_slow_listener):
+        self.slow_threshold = slow_threshold
+        self.on_slow = on_slow
+
+    def dispatch(self, listeners: List[Callable], category: str, key: str,
+                 old_value: Any, new_value: Any):
+        """Deliver one change to a list of listeners."""
+        self._run(listeners, category, key, old_value, new_value)
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every dispatched change has been delivered."""
+        return True
+
+    def close(self):
+        """Deliver what is queued and release any worker threads."""
+        pass
+
+    def _run(self, listeners, category, key, old_value, new_value):
+        """Call listeners in order, timing each one and reporting errors."""
+        metrics = self.metrics
+        slow_threshold = self.slow_threshold
+        # Listeners are only timed when someone is looking
+        timed = metrics.enabled or slow_threshold is not None
+        for listener in listeners:
+            if timed:
+                start = time.perf_counter()
+            try:
+                listener(category, key, old_value, new_value)
+            except Exception as e:
+                print(f"Error in preference change listener: {e}")
+                if metrics.enabled:
+                    metrics.increment("listener_errors_total", listener=listener_name(listener))
+            if not timed:
+                continue
+            elapsed = time.perf_counter() - start
+            if metrics.enabled:
+                metrics.observe("listener_seconds", elapsed, listener=listener_name(listener))
+            if slow_threshold is not None and elapsed > slow_threshold:
+                try:
+                    self.on_slow(listener, category, key, elapsed)
+                except Exception as e:
+                    print(f"Error reporting slow preference change listener: {e}")
+
+
+# The default, synchronous dispatcher
+SyncDispatcher = ListenerDispatcher
+
+
+class ThreadPoolDispatcher(ListenerDispatcher):
+    """Run listeners on a bounded pool of worker threads.
+
+    Changes to the same preference are delivered one at a time and in the
+    order they were made; changes to different preferences run in parallel.
+    """
+
+    def __init__(self, max_workers: int = 4, slow_threshold: Optional[float] = None,
+                 on_slow: Callable = report_slow_listener):
+        super().__init__(slow_threshold, on_slow)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="PreferenceListener"
+        )
+        self._queues = {}  # (category, key) -> deque of pending changes
+        self._condition = threading.Condition()
+
+    def dispatch(self, listeners, category, key, old_value, new_value):
+        """Queue a change behind earlier changes to the same preference."""
+        with self._condition:
+            pending = self._queues.get((category, key))
+            if pending is not None:
+                # A worker is already delivering this key and will pick it up
+                pending.append((listeners, old_value, new_value))
+                return
+            self._queues[(category, key)] = deque([(listeners, old_value, new_value)])
+        self._executor.submit(self._deliver, category, key)
+
+    def _deliver(self, category, key):
+        """Worker loop: deliver queued changes for one key until none are left."""
+        while True:
+            with self._condition:
+                pending = self._queues[(category, key)]
+                if not pending:
+                    del self._queues[(category, key)]
+                    self._condition.notify_all()
+                    return
+                listeners, old_value, new_value = pending[0]
+            try:
+                self._run(listeners, category, key, old_value, new_value)
+            finally:
+                # Never leave the key's queue stuck behind a change that failed
+                with self._condition:
+                    pending.popleft()
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued change has been delivered."""
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._queues, timeout)
+
+    def close(self):
+        """Deliver what is queued and stop the worker threads."""
+        self.drain()
+        self._executor.shutdown(wait=True)
+
+
+class TkDispatcher(ListenerDispatcher):
+    """Run listeners on the Tk main loop, whichever thread made the change.
+
+    Changes are queued and picked up by a poll scheduled with widget.after(),
+    so listeners can safely update widgets. Delivery order matches the order
+    the changes were made.
+    """
+
+    def __init__(self, widget, poll_interval_ms: int = 20, slow_threshold: Optional[float] = None,
+                 on_slow: Callable = report_slow_listener):
+        super().__init__(slow_threshold, on_slow)
+        self.widget = widget
+        self.poll_interval_ms = poll_interval_ms
+        self._queue = queue.SimpleQueue()
+        self._closed = False
+        self._after_id = self.widget.after(self.poll_interval_ms, self._poll)
+
+    def dispatch(self, listeners, category, key, old_value, new_value):
+        """Queue a change for the Tk thread."""
+        self._queue.put((listeners, category, key, old_value, new_value))
+
+    def _poll(self):
+        """Deliver everything queued so far, then schedule the next poll."""
+        self.drain()
+        if not self._closed:
+            self._after_id = self.widget.after(self.poll_interval_ms, self._poll)
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """Deliver queued changes now; must be called on the Tk thread."""
+        while True:
+            try:
+                listeners, category, key, old_value, new_value = self._queue.get_nowait()
+            except queue.Empty:
+                return True
+            self._run(listeners, category, key, old_value, new_value)
+
+    def close(self):
+        """Stop polling after delivering what is queued."""
+        self._closed = True
+        self.widget.after_cancel(self._after_id)
+        self.drain()
@@ -136,178 +136,1047 @@ PREFERENCE_SCHEMA = {
 
 
 
-from typing import Any, Dict, List, Callable
+from typing import Any, Dict, List, Callable, Set, Tuple
+from contextlib import contextmanager
+import atexit
+import inspect
 import json
-import os
-from datetime import datetime
+import threading
+import time
+import weakref
+
+from compiled_schema import compile_schema
+from listener_dispatch import ListenerDispatcher, SyncDispatcher
+from preference_metrics import NULL_METRICS, LoggingSink, Metrics
+from preference_migration import (
+    DEFAULT_MIGRATIONS, META_CATEGORY, SCHEMA_VERSION_KEY, MigrationRegistry, stored_version
+)
+from preference_storage import JSONStorage, PreferenceStorage
+from recent_locations import RecentLocations
+
+
+# Preference layers from lowest to highest precedence; the schema defaults sit
+# below all of them. Only the user layer is saved to storage
+LAYERS = ("system", "user", "session")
+_LAYER_ATTRIBUTES = {"system": "_system", "user": "_overrides", "session": "_session"}
+
+# Marks a preference that no layer and no default provides
+_MISSING = object()
+
+
+def _is_internal(category: str) -> bool:
+    """Internal categories (such as _meta) hold bookkeeping data, not preferences."""
+    return category.startswith("_")
+
+
+def _listener_token(callback: Callable):
+    """Identify a listener; bound methods are recreated on every attribute access."""
+    if inspect.ismethod(callback):
+        return (id(callback.__self__), id(callback.__func__))
+    return id(callback)
+
+
+class PreferenceSnapshot:
+    """A consistent, read-only view of a profile's preferences at one moment.
+    
+    Later changes to the manager do not show up in a snapshot, so several
+    values read from it always belong together.
+    """
+    
+    __slots__ = ('_overrides', '_defaults')
+    
+    def __init__(self, overrides: Dict, defaults: Dict):
+        self._overrides = overrides
+        self._defaults = defaults
+    
+    def get(self, category: str, key: str, default=None) -> Any:
+        """Get a preference value."""
+        try:
+            return self._overrides[category][key]
+        except KeyError:
+            pass
+        try:
+            return self._defaults[category][key]
+        except KeyError:
+            return default
+    
+    def overridden_keys(self):
+        """Yield (category, key) for every schema preference not at its default."""
+        for category, prefs in self._overrides.items():
+            defaults = self._defaults.get(category)
+            # Categories nothing overrides share the defaults dict itself
+            if defaults is not None and prefs is not defaults:
+                for key, value in prefs.items():
+                    if key in defaults and defaults[key] != value:
+                        yield category, key
+    
+    def as_dict(self) -> Dict:
+        """All preferences with defaults filled in, as a new nested dictionary."""
+        overrides = self._overrides
+        materialized = {
+            category: {**defaults, **overrides.get(category, {})}
+            for category, defaults in self._defaults.items()
+        }
+        # Categories the schema does not know about are kept as they were stored
+        for category, prefs in overrides.items():
+            if category not in materialized:
+                materialized[category] = dict(prefs)
+        return materialized
+
 
 class PreferenceManager:
-    def __init__(self, storage_path="preferences.json", schema=PREFERENCE_SCHEMA):
+    def __init__(self, storage_path="preferences.json", schema=PREFERENCE_SCHEMA,
+                 write_behind=False, flush_delay=0.5,
+                 storage: PreferenceStorage = None, profile: str = "default",
+                 autoflush=True, dispatcher: ListenerDispatcher = None,
+                 snapshot_cache=False, migrations: MigrationRegistry = DEFAULT_MIGRATIONS,
+                 metrics: Metrics = None, system: Dict[str, Dict[str, Any]] = None, locked=()):
         self.storage_path = storage_path
         self.schema = schema
-        self.preferences = self._load_preferences()
-        self._change_listeners = []
-        self._ensure_defaults()
+        # Steps that upgrade preferences stored under older schema versions
+        self.migrations = migrations
+        # Validators and defaults are compiled once per schema object and shared
+        self._compiled = compile_schema(schema)
+        
+        # Where preferences live; defaults to the JSON file at storage_path,
+        # optionally with a marshal snapshot next to it for fast startup
+        self._owns_storage = storage is None
+        if storage is None:
+            storage = JSONStorage(storage_path, snapshot_cache=snapshot_cache)
+        self.storage = storage
+        self.profile = profile
+        
+        # Write-behind mode: set() only marks the state dirty and a background
+        # thread writes the file once per flush_delay window
+        self.write_behind = write_behind
+        self.flush_delay = flush_delay
+        # With autoflush off nothing is written until flush() is called
+        self.autoflush = autoflush
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self._flush_condition = threading.Condition(self._lock)
+        self._dirty = False
+        self._dirty_keys = set()
+        self._full_save = False
+        self._closed = False
+        self._flusher = None
+        self._watcher = None
+        self._watch_stop = threading.Event()
+        
+        # Instrumentation is always on when a recorder is passed in; otherwise
+        # advanced.debug_mode and advanced.log_api_calls switch it on and off.
+        # self.metrics is the recorder in use, or NULL_METRICS while off
+        self._metrics_recorder = metrics
+        self._metrics_forced = metrics is not None
+        self._metrics_log_sink = None
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        
+        # Only values that differ from the schema default are kept per profile;
+        # everything else is read from the shared defaults table.
+        # Layer dicts are never modified in place: writers build a new one
+        # under the lock and swap it in, so readers never need the lock
+        self._defaults = self._compiled.defaults
+        
+        # Layers around the stored (user) preferences: administrator-enforced
+        # system values below them and temporary session values above them.
+        # Locked keys always show the system value, or the default
+        if system:
+            errors = self._compiled.validate_many(system)
+            if errors:
+                raise ValueError("; ".join(errors.values()))
+        self._system = {category: dict(prefs) for category, prefs in (system or {}).items() if prefs}
+        self._session = {}
+        self._locked = frozenset(locked)
+        
+        # Taken before loading, so a write racing the load is noticed later
+        self._signature = self.storage.signature(self.profile)
+        self._overrides, migrated = self._prepare_stored(self._load_preferences())
+        
+        # Effective value of every preference, resolved through the layers, so
+        # get() is a plain lookup. Categories no layer touches share the
+        # defaults dicts; the rest are rebuilt per key when a layer changes
+        self._resolved = self._build_resolved()
+        # Listeners indexed by the (category, key) they subscribed to; None is a wildcard
+        self._listeners = {}
+        # Decides where listeners run; by default right away on the caller's thread
+        self.dispatcher = dispatcher if dispatcher is not None else SyncDispatcher()
+        self._batch_depth = 0
+        # While a batch is open its effective values are staged here and only
+        # published, all at once, when it ends
+        self._staged_resolved = None
+        self._staged_categories = set()
+        self._pending_changes = {}
+        self._pending_saves = set()
+        self._batch_needs_save = False
+        
+        # Created on first use by the recent_locations property
+        self._recent_locations = None
+        
+        self._sync_metrics()
+        if "advanced" in self.schema:
+            self.add_change_listener(self._on_advanced_change, "advanced", weak=True)
+        
+        # Write the schema version along with the first save, and write a
+        # migrated profile back right away so it is only migrated once
+        self._dirty_keys.add((META_CATEGORY, SCHEMA_VERSION_KEY))
+        if migrated:
+            self._save_preferences(None)
     
     def _load_preferences(self) -> Dict:
         """Load preferences from storage or return defaults."""
-        if os.path.exists(self.storage_path):
-            try:
-                with open(self.storage_path, 'r') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, IOError):
-                print(f"Error loading preferences, using defaults")
-        return {}
-    
-    def _ensure_defaults(self):
-        """Ensure all preferences have values, using defaults if needed."""
-        for category, prefs in self.schema.items():
-            if category not in self.preferences:
-                self.preferences[category] = {}
-            for key, spec in prefs.items():
-                if key not in self.preferences[category]:
-                    self.preferences[category][key] = spec['default']
+        with self.metrics.timer("load_seconds"):
+            return self.storage.load(self.profile)
     
-    def get(self, category: str, key: str, default=None) -> Any:
-        """Get a preference value."""
+    def _prepare_stored(self, stored: Dict):
+        """Migrate freshly loaded preferences and reduce them to overrides.
+        
+        Returns the overrides and whether a migration ran.
+        """
+        migrated = self.migrations.migrate(stored)
+        overrides = self._strip_defaults(stored)
+        # A profile saved by a newer version keeps its stamp, so that version
+        # does not run its migrations over it again
+        version = max(
+            stored_version(stored, self.migrations.base_version),
+            self.migrations.target_version
+        )
+        overrides[META_CATEGORY] = {**overrides.get(META_CATEGORY, {}), SCHEMA_VERSION_KEY: version}
+        return overrides, migrated
+    
+    def _strip_defaults(self, stored: Dict) -> Dict:
+        """Drop stored values equal to their defaults, leaving only overrides.
+        
+        Values for keys the system layer sets are always kept, as in _apply_value().
+        """
+        overrides = {}
+        for category, prefs in stored.items():
+            defaults = self._defaults.get(category, {})
+            system = self._system.get(category, {})
+            kept = {
+                key: value for key, value in prefs.items()
+                if key in system or defaults.get(key, _MISSING) != value
+            }
+            if kept:
+                overrides[category] = kept
+        return overrides
+    
+    @property
+    def preferences(self) -> Dict:
+        """All preferences with defaults filled in, as a new nested dictionary."""
+        return self.snapshot().as_dict()
+    
+    def snapshot(self) -> PreferenceSnapshot:
+        """Return a consistent read-only view for reading several values together."""
+        return PreferenceSnapshot(self._resolved, self._defaults)
+    
+    def get(self, category: str, key: str = None, default=None) -> Any:
+        """Get the effective value of a preference (never blocks on writers).
+        
+        The preference can also be named in one string, as in get("display.theme").
+        """
+        if key is None:
+            entry = self._compiled.index.get(category)
+            if entry is not None:
+                return self._resolved[entry.category][entry.key]
+            category, _, key = category.partition(".")
         try:
-            return self.preferences[category][key]
+            return self._resolved[category][key]
         except KeyError:
             return default
     
-    def set(self, category: str, key: str, value: Any) -> bool:
-        """Set a preference value with validation."""
-        # Validate the preference exists in schema and if not, raises an error
-        if category not in self.schema or key not in self.schema[category]:
-            raise ValueError(f"Unknown preference: {category}.{key}")
+    def entry(self, category: str, key: str = None):
+        """Return the PreferenceEntry for category.key, or for a dotted name."""
+        try:
+            if key is None:
+                return self._compiled.index[category]
+            return self._compiled.by_category[category][key]
+        except KeyError:
+            name = category if key is None else f"{category}.{key}"
+            raise ValueError(f"Unknown preference: {name}")
+    
+    def entries(self, category: str = None) -> Tuple:
+        """The PreferenceEntry of every schema preference, or of one category, in slot order."""
+        if category is None:
+            return self._compiled.entries
+        return tuple(self._compiled.by_category[category].values())
+    
+    def get_slot(self, slot: int) -> Any:
+        """Get the effective value of the preference in a schema slot."""
+        entry = self._compiled.entries[slot]
+        return self._resolved[entry.category][entry.key]
+    
+    def set_slot(self, slot: int, value: Any, layer: str = "user") -> bool:
+        """Set the preference in a schema slot, with the same checks as set()."""
+        entry = self._compiled.entries[slot]
+        return self.set(entry.category, entry.key, value, layer)
+    
+    def set(self, category: str, key: str, value: Any, layer: str = "user") -> bool:
+        """Set a preference value with validation.
         
-        # Gets the preference specification from the schema
-        spec = self.schema[category][key]
+        layer picks where the value goes: "user" (saved to storage), "session"
+        (kept until clear_session()) or "system". Locked preferences can only
+        be set in the system layer.
+        """
+        # Gets the compiled validator for the preference, and if it is not in the schema, raises an error
+        try:
+            validator = self._compiled.validators[category][key]
+        except KeyError:
+            raise ValueError(f"Unknown preference: {category}.{key}")
+        if layer not in _LAYER_ATTRIBUTES:
+            raise ValueError(f"Unknown preference layer: {layer}")
+        if layer != "system" and (category, key) in self._locked:
+            raise ValueError(f"Preference is locked: {category}.{key}")
         
         # Validate the value - calls a validation to make sure the value matches the spec
-        if not self._validate_value(value, spec):
+        metrics = self.metrics
+        if metrics.enabled:
+            start = time.perf_counter()
+            valid = validator(value)
+            metrics.observe("validate_seconds", time.perf_counter() - start)
+            if not valid:
+                metrics.increment("validation_errors_total")
+        else:
+            valid = validator(value)
+        if not valid:
             raise ValueError(f"Invalid value for {category}.{key}: {value}")
         
-        # Store old value for change notification
-        old_value = self.preferences.get(category, {}).get(key)
+        self._apply_value(category, key, value, layer)
         
-        # Updates the internal preferences dictionary with the new value.
-        if category not in self.preferences:
-            self.preferences[category] = {}
-        self.preferences[category][key] = value
+        # Indicates the value was suiccessfully set
+        return True
+    
+    def set_many(self, values: Dict[str, Dict[str, Any]], layer: str = "user") -> bool:
+        """Set several preferences in one layer at once, applying all of them or none."""
+        if layer not in _LAYER_ATTRIBUTES:
+            raise ValueError(f"Unknown preference layer: {layer}")
+        # Validate everything up front so a bad value leaves nothing half-applied
+        errors = self.validate_many(values)
+        if layer != "system" and self._locked:
+            for category, prefs in values.items():
+                for key in prefs:
+                    if (category, key) in self._locked:
+                        errors[f"{category}.{key}"] = f"Preference is locked: {category}.{key}"
+        if errors:
+            raise ValueError("; ".join(errors.values()))
         
-        # Save to storage - writes the updated preferences to the json file
-        self._save_preferences()
+        with self.batch():
+            for category, prefs in values.items():
+                for key, value in prefs.items():
+                    self._apply_value(category, key, value, layer)
+        return True
+    
+    @contextmanager
+    def batch(self):
+        """Group updates so they are saved once and announced together.
         
-        # If the value actually changed, call any registered change listeners (functions that react to updates, like re-theming the app).
-        if old_value != value:
-            self._notify_change(category, key, old_value, value)
+        Readers see none of the batch's changes until it ends, and then all
+        of them at once. If the block raises, every change made inside it is
+        rolled back.
+        """
+        # Hold the lock for the whole batch so a background flush never writes
+        # a half-applied batch. It is taken before looking at the depth, so
+        # only the thread running a batch ever sees one open
+        with self._lock:
+            outermost = self._batch_depth == 0
+            if outermost:
+                # Layers are replaced rather than modified, so keeping the old dicts is enough
+                backup = (self._system, self._overrides, self._session, self._locked)
+                self._staged_resolved = self._resolved
+                self._staged_categories = set()
+                self._pending_changes = {}
+                self._pending_saves = set()
+                self._batch_needs_save = False
+            self._batch_depth += 1
+            try:
+                yield self
+            except BaseException:
+                if outermost:
+                    self._system, self._overrides, self._session, self._locked = backup
+                    self._pending_changes = {}
+                    self._pending_saves = set()
+                    self._batch_needs_save = False
+                raise
+            else:
+                if outermost:
+                    # Publish the staged view in a single assignment
+                    self._resolved = self._staged_resolved
+            finally:
+                self._batch_depth -= 1
+                if outermost:
+                    self._staged_resolved = None
+                    self._staged_categories = set()
+                    # Take the batch's bookkeeping while the lock is still held;
+                    # the next batch on another thread starts from empty fields
+                    committed = (self._pending_changes, self._pending_saves, self._batch_needs_save)
+                    self._pending_changes = {}
+                    self._pending_saves = set()
+                    self._batch_needs_save = False
         
-        # Indicates the value was suiccessfully set
-        return True
+        if outermost:
+            self._commit_batch(*committed)
+    
+    def _apply_value(self, category: str, key: str, value: Any, layer: str = "user"):
+        """Store an already validated value in a layer, then save and notify (or defer to the batch)."""
+        attribute = _LAYER_ATTRIBUTES[layer]
+        with self._lock:
+            # Build a new dict for the layer that keeps the value, or drops it
+            # if it is the schema default, then publish it in a single
+            # assignment. User values are not compared with the system layer,
+            # which can change later, and a default-valued user choice is kept
+            # while a system value would otherwise show through. Session
+            # values are kept until cleared
+            values = getattr(self, attribute)
+            prefs = dict(values.get(category, {}))
+            if (layer != "session"
+                    and value == self._resolve(category, key, below="system")
+                    and (layer == "system" or key not in self._system.get(category, {}))):
+                prefs.pop(key, None)
+            else:
+                prefs[key] = value
+            values = dict(values)
+            if prefs:
+                values[category] = prefs
+            else:
+                values.pop(category, None)
+            setattr(self, attribute, values)
+            changes = self._refresh_resolved([(category, key)])
+            
+            # Inside a batch only record the change; the batch saves and notifies on exit
+            if self._batch_depth:
+                for change in changes:
+                    self._record_change(*change)
+                if layer == "user":
+                    self._pending_saves.add((category, key))
+                return
+        
+        # Save to storage - only this key needs to be written, and only the user layer is stored
+        if layer == "user":
+            self._save_preferences([(category, key)])
+        
+        # If the effective value actually changed, call any registered change listeners (functions that react to updates, like re-theming the app).
+        for change in changes:
+            self._notify_change(*change)
+    
+    def _resolve(self, category: str, key: str, below: str = None) -> Any:
+        """Work out the effective value of category.key from the layers.
+        
+        With below set, only the layers under that one and the defaults count.
+        Returns _MISSING if nothing provides a value.
+        """
+        # Falls through from the highest layer that applies to the lowest;
+        # locked keys skip straight to the system layer
+        if below is None:
+            if (category, key) in self._locked:
+                below = "user"
+            else:
+                prefs = self._session.get(category)
+                if prefs is not None and key in prefs:
+                    return prefs[key]
+                below = "session"
+        if below == "session":
+            prefs = self._overrides.get(category)
+            if prefs is not None and key in prefs:
+                return prefs[key]
+        if below != "system":
+            prefs = self._system.get(category)
+            if prefs is not None and key in prefs:
+                return prefs[key]
+        defaults = self._defaults.get(category)
+        return defaults.get(key, _MISSING) if defaults is not None else _MISSING
+    
+    def _refresh_resolved(self, keys) -> List:
+        """Re-resolve the given (category, key) pairs and publish the new view.
+        
+        Must be called with the lock held. Inside a batch the new view is only
+        staged; the batch publishes it when it ends. Returns (category, key,
+        old_value, new_value) for every pair whose effective value changed.
+        """
+        published_resolved = self._resolved
+        if self._batch_depth:
+            resolved = self._staged_resolved
+            copied = self._staged_categories
+        else:
+            resolved = published_resolved
+            copied = set()
+        # Published dicts are copied only once something actually changes
+        changes = []
+        for category, key in keys:
+            prefs = resolved.get(category)
+            old_value = prefs.get(key, _MISSING) if prefs is not None else _MISSING
+            new_value = self._resolve(category, key)
+            if old_value is new_value or old_value == new_value:
+                continue
+            if resolved is published_resolved:
+                resolved = dict(resolved)
+            if category not in copied:
+                resolved[category] = dict(resolved.get(category, {}))
+                copied.add(category)
+            if new_value is _MISSING:
+                del resolved[category][key]
+                if not resolved[category]:
+                    del resolved[category]
+                    copied.discard(category)
+            else:
+                resolved[category][key] = new_value
+            changes.append((
+                category, key,
+                None if old_value is _MISSING else old_value,
+                None if new_value is _MISSING else new_value
+            ))
+        if self._batch_depth:
+            self._staged_resolved = resolved
+        else:
+            self._resolved = resolved
+        return changes
+    
+    def _build_resolved(self) -> Dict:
+        """Resolve every preference from scratch, sharing untouched defaults dicts."""
+        resolved = dict(self._defaults)
+        for values in (self._system, self._overrides, self._session):
+            for category, prefs in values.items():
+                resolved[category] = {**resolved.get(category, {}), **prefs}
+        for category, key in self._locked:
+            value = self._resolve(category, key)
+            prefs = resolved.get(category, {})
+            if prefs.get(key, _MISSING) != value:
+                prefs = resolved[category] = dict(prefs)
+                if value is _MISSING:
+                    prefs.pop(key, None)
+                else:
+                    prefs[key] = value
+        return resolved
+    
+    def _replace_layer(self, layer: str, values: Dict, keys):
+        """Swap in new contents for a layer inside a batch, recording what changes for keys."""
+        setattr(self, _LAYER_ATTRIBUTES[layer], values)
+        for change in self._refresh_resolved(keys):
+            self._record_change(*change)
+        if layer == "user":
+            self._pending_saves.update(keys)
+    
+    def _record_change(self, category: str, key: str, old_value: Any, new_value: Any):
+        """Remember a change made inside a batch, keeping the value from before the batch."""
+        pending = self._pending_changes.get((category, key))
+        if pending is None:
+            self._pending_changes[(category, key)] = [old_value, new_value]
+        else:
+            pending[1] = new_value
+    
+    def _commit_batch(self, changes: Dict, saves: Set, needs_save: bool):
+        """Save once and send a single round of notifications for a finished batch."""
+        # A reset rewrites the whole profile, otherwise only the touched user keys are saved
+        if needs_save or saves:
+            self._save_preferences(None if needs_save else saves)
+        
+        # Keys that were changed and then changed back are not announced
+        for (category, key), (old_value, new_value) in changes.items():
+            if old_value != new_value:
+                self._notify_change(category, key, old_value, new_value)
     
     def _validate_value(self, value: Any, spec: Dict) -> bool:
         """Validate a value against its specification."""
-        pref_type = spec['type']
+        return self._compiled.validator_for_spec(spec)(value)
+    
+    def validate_many(self, values: Dict[str, Dict[str, Any]]) -> Dict[str, str]:
+        """Validate many preferences at once and return every error as {"category.key": message}."""
+        with self.metrics.timer("validate_seconds"):
+            errors = self._compiled.validate_many(values)
+        if errors:
+            self.metrics.increment("validation_errors_total", len(errors))
+        return errors
+    
+    def _save_preferences(self, changed=None):
+        """Save preferences to storage, or schedule a save in write-behind mode.
         
-        # Ensures it accepts only True/False values
-        if pref_type == 'boolean':
-            return isinstance(value, bool)
+        changed lists the (category, key) pairs that were modified; None means
+        the whole profile has to be written.
+        """
+        self.metrics.increment("save_requests_total")
+        with self._lock:
+            was_dirty = self._dirty
+            self._mark_dirty(changed)
+            if not self.autoflush:
+                return
+            if not self.write_behind or self._closed:
+                background = False
+            else:
+                background = True
+                if self._flusher is None:
+                    self._flusher = threading.Thread(
+                        target=self._flush_loop,
+                        name="PreferenceFlusher",
+                        daemon=True
+                    )
+                    self._flusher.start()
+                    atexit.register(self.close)
+                if not was_dirty:
+                    # Only the first change of a burst needs to wake the flusher
+                    self._flush_condition.notify()
         
-        # Ensures the value is an integer and within the min/max values set
-        elif pref_type == 'integer':
-            if not isinstance(value, int):
-                return False
-            if 'min' in spec and value < spec['min']:
-                return False
-            if 'max' in spec and value > spec['max']:
-                return False
-            return True
+        if not background:
+            self.flush()
+    
+    def _mark_dirty(self, changed):
+        """Record which keys need to be written on the next flush."""
+        self._dirty = True
+        if changed is None:
+            self._full_save = True
+        else:
+            self._dirty_keys.update(changed)
+    
+    def _flush_loop(self):
+        """Background thread that writes dirty preferences once per flush window."""
+        while True:
+            with self._lock:
+                while not self._dirty and not self._closed:
+                    self._flush_condition.wait()
+                if self._closed:
+                    return
+                # Let a burst of set() calls pile up before writing. Waking up
+                # early does not end the window; only the deadline or close() does
+                deadline = time.monotonic() + self.flush_delay
+                remaining = self.flush_delay
+                while remaining > 0 and not self._closed:
+                    self._flush_condition.wait(remaining)
+                    remaining = deadline - time.monotonic()
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except Exception as e:
+                # Keep the thread alive; the changes stay dirty and are retried
+                print(f"Error saving preferences: {e}")
+    
+    def flush(self) -> bool:
+        """Write pending changes to storage now.
         
-        # Checks that the value is a string
-        elif pref_type == 'string':
-            return isinstance(value, str)
+        Returns False if they could not be written; they stay pending for
+        the next flush.
+        """
+        external_changes = []
+        # The write lock keeps two flushes from racing each other to storage,
+        # and the storage lock keeps other processes out until we are done
+        with self._write_lock:
+            if not self._dirty:
+                return True
+            metrics = self.metrics
+            taken = False
+            saved = False
+            try:
+                with self.storage.lock(self.profile):
+                    # Fold in anything another process wrote so we don't clobber it
+                    signature = self.storage.signature(self.profile)
+                    if signature is not None and signature != self._signature:
+                        external_changes = self._merge_stored(self._load_preferences())
+                    
+                    with self._lock:
+                        changed = None if self._full_save else self._dirty_keys
+                        # The published overrides are never modified, so no copy is needed
+                        preferences = self._overrides
+                        self._dirty = False
+                        self._dirty_keys = set()
+                        self._full_save = False
+                        taken = True
+                    
+                    with metrics.timer("save_seconds"):
+                        saved = self.storage.save(self.profile, preferences, changed)
+                    if saved:
+                        self._signature = self.storage.signature(self.profile)
+            except OSError as e:
+                # Such as a lock file in a directory we cannot write to
+                print(f"Error saving preferences: {e}")
+            finally:
+                # Keep unsaved changes pending so the next flush tries again
+                if taken and not saved:
+                    with self._lock:
+                        self._mark_dirty(changed)
+            
+            if saved:
+                metrics.increment("saves_total", mode="full" if changed is None else "partial")
+                if changed is not None:
+                    metrics.increment("saved_keys_total", len(changed))
+                if metrics.enabled:
+                    size = self.storage.size(self.profile)
+                    if size is not None:
+                        metrics.gauge("storage_bytes", size)
+            else:
+                metrics.increment("save_failures_total")
+        
+        for category, key, old_value, new_value in external_changes:
+            self._notify_change(category, key, old_value, new_value)
+        return saved
+    
+    def check_for_changes(self) -> bool:
+        """Reload if another process changed the stored preferences.
+        
+        Only a cheap stat-style check is made unless the storage actually
+        changed. Listeners hear about keys whose value differs after the
+        reload; local changes that have not been written yet are kept.
+        """
+        with self._write_lock:
+            signature = self.storage.signature(self.profile)
+            if signature is None or signature == self._signature:
+                return False
+            self._signature = signature
+            changes = self._merge_stored(self._load_preferences())
         
-        # Ensures the value is one of the allowed options (such as light, dark, or auto for theme setting)
-        elif pref_type == 'choice':
-            return value in spec['options']
+        for category, key, old_value, new_value in changes:
+            self._notify_change(category, key, old_value, new_value)
+        return True
+    
+    def _merge_stored(self, stored: Dict) -> List:
+        """Adopt freshly loaded preferences, keeping keys with unsaved local changes.
         
-        return False
+        Returns (category, key, old_value, new_value) for every key whose value changed.
+        """
+        self.metrics.increment("external_reloads_total")
+        stored, _ = self._prepare_stored(stored)
+        with self._lock:
+            current = self._overrides
+            if self._full_save:
+                # A pending reset replaces the stored profile wholesale
+                return []
+            
+            merged = {category: dict(prefs) for category, prefs in stored.items()}
+            for category, key in self._dirty_keys:
+                if key in current.get(category, {}):
+                    merged.setdefault(category, {})[key] = current[category][key]
+                elif key in merged.get(category, {}):
+                    del merged[category][key]
+            merged = {category: prefs for category, prefs in merged.items() if prefs}
+            
+            keys = {
+                (category, key)
+                for values in (current, merged)
+                for category, prefs in values.items()
+                for key in prefs
+            }
+            self._overrides = merged
+            return self._refresh_resolved(keys)
     
-    def _save_preferences(self):
-        """Save preferences to storage."""
-        try:
-            with open(self.storage_path, 'w') as f:
-                json.dump(self.preferences, f, indent=2)
-        except IOError as e:
-            print(f"Error saving preferences: {e}")
+    def watch(self, interval: float = 1.0):
+        """Poll storage in a background thread and hot-reload external changes."""
+        with self._lock:
+            if self._watcher is not None:
+                return
+            self._watch_stop.clear()
+            self._watcher = threading.Thread(
+                target=self._watch_loop,
+                args=(interval,),
+                name="PreferenceWatcher",
+                daemon=True
+            )
+            self._watcher.start()
+    
+    def unwatch(self):
+        """Stop the background watcher started by watch()."""
+        with self._lock:
+            watcher = self._watcher
+            self._watcher = None
+        if watcher is not None:
+            self._watch_stop.set()
+            watcher.join()
+    
+    def _watch_loop(self, interval: float):
+        """Background thread that checks for external changes every interval seconds."""
+        while not self._watch_stop.wait(interval):
+            try:
+                self.check_for_changes()
+            except Exception as e:
+                print(f"Error reloading preferences: {e}")
+    
+    def close(self):
+        """Stop the background threads and write any pending changes."""
+        self.unwatch()
+        with self._lock:
+            self._closed = True
+            self._flush_condition.notify_all()
+            flusher = self._flusher
+            self._flusher = None
+        if flusher is not None:
+            flusher.join()
+            atexit.unregister(self.close)
+        self.flush()
+        if self._owns_storage:
+            self.storage.close()
     
-
-
     # These 3 functions allow our application to respond dynamically to preference changes
     # Allows the app to react in real time to user changes such as updating the theme or refreshing data without restarting the application
-    def add_change_listener(self, callback: Callable):
-        """Add a listener for preference changes."""
-        self._change_listeners.append(callback)
+    def add_change_listener(self, callback: Callable, category: str = None, key: str = None,
+                            weak: bool = False):
+        """Add a listener for preference changes.
+        
+        Only changes matching category and key are delivered; leaving either as
+        None matches any value. With weak=True only a weak reference is kept, so
+        the listener goes away when its owner (such as a widget) is collected.
+        """
+        subscription = (category, key)
+        token = _listener_token(callback)
+        if weak:
+            def _drop(_ref, subscription=subscription, token=token):
+                self._discard_listener(subscription, token)
+            if inspect.ismethod(callback):
+                entry = (weakref.WeakMethod(callback, _drop), True)
+            else:
+                entry = (weakref.ref(callback, _drop), True)
+        else:
+            entry = (callback, False)
+        
+        with self._lock:
+            self._listeners.setdefault(subscription, {})[token] = entry
+    
+    def remove_change_listener(self, callback: Callable, category: str = None, key: str = None):
+        """Remove a change listener added with the same category and key."""
+        self._discard_listener((category, key), _listener_token(callback))
     
-    def remove_change_listener(self, callback: Callable):
-        """Remove a change listener."""
-        if callback in self._change_listeners:
-            self._change_listeners.remove(callback)
+    def _discard_listener(self, subscription, token):
+        """Drop one listener entry, and its bucket once the bucket is empty."""
+        with self._lock:
+            bucket = self._listeners.get(subscription)
+            if bucket is not None:
+                bucket.pop(token, None)
+                if not bucket:
+                    del self._listeners[subscription]
+    
+    def _matching_listeners(self, category: str, key: str) -> List[Callable]:
+        """Return the live listeners subscribed to a change of category.key."""
+        listeners = []
+        index = self._listeners
+        for subscription in ((category, key), (category, None), (None, key), (None, None)):
+            bucket = index.get(subscription)
+            if bucket:
+                for entry, weak in list(bucket.values()):
+                    listener = entry() if weak else entry
+                    if listener is not None:
+                        listeners.append(listener)
+        return listeners
     
     def _notify_change(self, category: str, key: str, old_value: Any, new_value: Any):
-        """Notify all listeners of a preference change."""
-        for listener in self._change_listeners:
-            try:
-                listener(category, key, old_value, new_value)
-            except Exception as e:
-                print(f"Error in preference change listener: {e}")
+        """Notify the listeners subscribed to this preference of a change."""
+        listeners = self._matching_listeners(category, key)
+        if not listeners:
+            return
+        metrics = self.metrics
+        if metrics.enabled:
+            # Covers handing the change to the dispatcher; the dispatcher times
+            # each listener itself, wherever it runs
+            start = time.perf_counter()
+            self.dispatcher.dispatch(listeners, category, key, old_value, new_value)
+            metrics.observe("notify_seconds", time.perf_counter() - start)
+            metrics.increment("notifications_total", len(listeners))
+        else:
+            self.dispatcher.dispatch(listeners, category, key, old_value, new_value)
+    
+    def drain(self, timeout: float = None) -> bool:
+        """Wait until every change notification has been delivered to its listeners."""
+        return self.dispatcher.drain(timeout)
+    
+    def _on_advanced_change(self, category: str, key: str, old_value: Any, new_value: Any):
+        """Listener that follows changes to the debug settings."""
+        if key in ("debug_mode", "log_api_calls"):
+            self._sync_metrics()
+    
+    def _sync_metrics(self):
+        """Switch instrumentation on or off to match the advanced debug settings.
+        
+        debug_mode records metrics in memory; log_api_calls also logs every
+        metric event. The dispatcher is given the same recorder so it can
+        time each listener.
+        """
+        debug_mode = self.get("advanced", "debug_mode", False)
+        log_api_calls = self.get("advanced", "log_api_calls", False)
+        with self._lock:
+            recorder = self._metrics_recorder
+            if recorder is None and (debug_mode or log_api_calls):
+                recorder = self._metrics_recorder = Metrics()
+            if recorder is not None:
+                if log_api_calls and self._metrics_log_sink is None:
+                    self._metrics_log_sink = LoggingSink()
+                    recorder.add_sink(self._metrics_log_sink)
+                elif not log_api_calls and self._metrics_log_sink is not None:
+                    recorder.remove_sink(self._metrics_log_sink)
+                    self._metrics_log_sink = None
+            if self._metrics_forced or debug_mode or log_api_calls:
+                self.metrics = recorder
+            else:
+                self.metrics = NULL_METRICS
+            self.dispatcher.metrics = self.metrics
     
     def reset_to_defaults(self, category: str = None):
-        """Reset preferences to defaults."""
-        if category:
-            # Reset specific category
-            if category in self.schema:
-                for key, spec in self.schema[category].items():
-                    old_value = self.preferences.get(category, {}).get(key)
-                    self.preferences[category][key] = spec['default']
-                    if old_value != spec['default']:
-                        self._notify_change(category, key, old_value, spec['default'])
+        """Reset preferences to defaults.
+        
+        Only the user layer is cleared; system values and session overrides
+        still apply afterwards.
+        """
+        with self.batch():
+            overrides = self._overrides
+            if category:
+                # Reset specific category
+                if category not in self.schema:
+                    return
+                removed = [(category, key) for key in overrides.get(category, {})]
+                overrides = {c: prefs for c, prefs in overrides.items() if c != category}
+            else:
+                # Reset all preferences; whatever is not part of the schema is
+                # dropped too, apart from internal categories such as the
+                # schema version
+                removed = [
+                    (c, key) for c, prefs in overrides.items() if not _is_internal(c) for key in prefs
+                ]
+                overrides = {c: prefs for c, prefs in overrides.items() if _is_internal(c)}
+                
+                # Reset always rewrites storage, even when no value changed
+                self._batch_needs_save = True
+            self._replace_layer("user", overrides, removed)
+    
+    def clear(self, category: str, key: str, layer: str = "session"):
+        """Remove a value from one layer so the layers below show through."""
+        if layer not in _LAYER_ATTRIBUTES:
+            raise ValueError(f"Unknown preference layer: {layer}")
+        with self.batch():
+            values = getattr(self, _LAYER_ATTRIBUTES[layer])
+            if key not in values.get(category, {}):
+                return
+            prefs = {k: v for k, v in values[category].items() if k != key}
+            values = dict(values)
+            if prefs:
+                values[category] = prefs
+            else:
+                del values[category]
+            self._replace_layer(layer, values, [(category, key)])
+    
+    def clear_session(self):
+        """Drop every session override, for example when the session ends."""
+        with self.batch():
+            keys = [(category, key) for category, prefs in self._session.items() for key in prefs]
+            self._replace_layer("session", {}, keys)
+    
+    def set_system_defaults(self, values: Dict[str, Dict[str, Any]], locked=None):
+        """Replace the system layer, and the locked keys if locked is given.
+        
+        System values take the place of the schema defaults but give way to
+        user and session values, except for locked (category, key) pairs:
+        those always show the system value (or the default) and can no
+        longer be set in the user or session layers.
+        """
+        errors = self.validate_many(values)
+        if errors:
+            raise ValueError("; ".join(errors.values()))
+        system = {category: dict(prefs) for category, prefs in values.items() if prefs}
+        with self.batch():
+            keys = {
+                (category, key)
+                for layer in (self._system, system)
+                for category, prefs in layer.items()
+                for key in prefs
+            }
+            if locked is not None:
+                locked = frozenset(locked)
+                keys |= self._locked ^ locked
+                self._locked = locked
+            self._replace_layer("system", system, keys)
+    
+    def is_locked(self, category: str, key: str) -> bool:
+        """True if the preference is locked to its system value."""
+        return (category, key) in self._locked
+    
+    def value_source(self, category: str, key: str) -> str:
+        """Name the layer the effective value comes from: "session", "user", "system" or "default"."""
+        # Layers change ahead of the published values inside a batch, so
+        # wait for any open batch to end
+        with self._lock:
+            if (category, key) not in self._locked:
+                if key in self._session.get(category, {}):
+                    return "session"
+                if key in self._overrides.get(category, {}):
+                    return "user"
+            if key in self._system.get(category, {}):
+                return "system"
+            return "default"
+    
+    @property
+    def recent_locations(self) -> RecentLocations:
+        """This profile's recently searched locations."""
+        with self._lock:
+            if self._recent_locations is None:
+                self._recent_locations = RecentLocations(self)
+            return self._recent_locations
+    
+    def internal_values(self, category: str) -> Dict:
+        """Return the bookkeeping values stored in an internal category."""
+        with self._lock:
+            return dict(self._overrides.get(category, {}))
+    
+    def set_internal(self, category: str, values: Dict[str, Any]):
+        """Store bookkeeping values in an internal ("_"-prefixed) category.
+        
+        Internal values are saved with the profile, but skip validation and
+        change listeners and survive reset_to_defaults(). Only the given keys
+        are written; a value of None deletes the key.
+        """
+        if not _is_internal(category):
+            raise ValueError(f"Internal categories must start with '_': {category}")
+        keys = [(category, key) for key in values]
+        with self.batch():
+            prefs = dict(self._overrides.get(category, {}))
+            for key, value in values.items():
+                if value is None:
+                    prefs.pop(key, None)
+                else:
+                    prefs[key] = value
+            overrides = dict(self._overrides)
+            if prefs:
+                overrides[category] = prefs
+            else:
+                overrides.pop(category, None)
+            self._overrides = overrides
+            self._refresh_resolved(keys)
+            self._pending_saves.update(keys)
+    
+    def export_preferences(self, filepath: str, materialize: bool = True):
+        """Export preferences to a file.
+        
+        With materialize=False only the values that differ from the defaults
+        are written.
+        """
+        if materialize:
+            data = self.preferences
         else:
-            # Reset all preferences
-            old_preferences = self.preferences.copy()
-            self.preferences = {}
-            self._ensure_defaults()
-            
-            # Notify changes
-            for category in self.schema:
-                for key in self.schema[category]:
-                    old_value = old_preferences.get(category, {}).get(key)
-                    new_value = self.preferences[category][key]
-                    if old_value != new_value:
-                        self._notify_change(category, key, old_value, new_value)
-        
-        self._save_preferences()
-    
-    def export_preferences(self, filepath: str):
-        """Export preferences to a file."""
+            with self._lock:
+                data = self._overrides
         with open(filepath, 'w') as f:
-            json.dump(self.preferences, f, indent=2)
+            json.dump(data, f, indent=2)
     
     def import_preferences(self, filepath: str):
         """Import preferences from a file."""
         try:
             with open(filepath, 'r') as f:
                 imported = json.load(f)
+        except Exception as e:
+            print(f"Error importing preferences: {e}")
+            self.metrics.increment("import_errors_total")
+            return False
+        return self.import_data(imported)
+    
+    def import_data(self, imported: Dict) -> bool:
+        """Import preferences from an already parsed export, as import_preferences() does."""
+        try:
+            # Bring files exported under an older schema up to date first
+            self.migrations.migrate(imported)
             
-            # Validate imported preferences
+            # Keep only known preferences, then apply them all in one batch
+            known = {}
             for category, prefs in imported.items():
                 if category in self.schema:
                     for key, value in prefs.items():
-                        if key in self.schema[category]:
-                            self.set(category, key, value)
+                        # Locked preferences keep their system value
+                        if key in self.schema[category] and (category, key) not in self._locked:
+                            known.setdefault(category, {})[key] = value
+            
+            self.set_many(known)
             
             return True
         except Exception as e:
             print(f"Error importing preferences: {e}")
+            self.metrics.increment("import_errors_total")
             return False
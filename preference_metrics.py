@@ -0,0 +1,266 @@
+from typing import Dict, Iterable, Optional, Tuple
+import bisect
+import logging
+import threading
+import time
+
+
+# Upper bounds, in seconds, of the latency histogram buckets
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+# Labels are passed to sinks as a sorted tuple of (name, value) pairs
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class _NullTimer:
+    """Context manager that times nothing."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class NullMetrics:
+    """Recorder used while instrumentation is off; every call does nothing.
+
+    Hot paths check the enabled flag before doing any timing work, so a
+    manager with metrics off pays for one attribute lookup per operation.
+    """
+    enabled = False
+    memory = None
+
+    def increment(self, name: str, value: float = 1, **labels):
+        pass
+
+    def gauge(self, name: str, value: float, **labels):
+        pass
+
+    def observe(self, name: str, value: float, **labels):
+        pass
+
+    def timer(self, name: str, **labels):
+        return _NULL_TIMER
+
+
+# Shared recorder for everything that has metrics switched off
+NULL_METRICS = NullMetrics()
+
+
+class _Timer:
+    """Context manager that observes the seconds spent inside it."""
+    __slots__ = ('metrics', 'name', 'labels', 'start')
+
+    def __init__(self, metrics, name: str, labels: Dict):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class Histogram:
+    """Counts of observed values per bucket, plus their total and sum."""
+    __slots__ = ('buckets', 'counts', 'count', 'sum')
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        # One slot per bucket plus one for values above the last bound
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+
+def _format_name(name: str, labels: Labels) -> str:
+    """Readable series name such as listener_seconds{listener="App.refresh"}."""
+    if not labels:
+        return name
+    return name + "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+class InMemorySink:
+    """Keep running totals of every metric so they can be inspected or exported."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self.counters = {}    # (name, labels) -> total
+        self.gauges = {}      # (name, labels) -> last value
+        self.histograms = {}  # (name, labels) -> Histogram
+
+    def count(self, name: str, value: float, labels: Labels):
+        with self._lock:
+            key = (name, labels)
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, labels: Labels):
+        with self._lock:
+            self.gauges[(name, labels)] = value
+
+    def observe(self, name: str, value: float, labels: Labels):
+        with self._lock:
+            histogram = self.histograms.get((name, labels))
+            if histogram is None:
+                histogram = self.histograms[(name, labels)] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def snapshot(self) -> Dict:
+        """All metrics as plain data, keyed by readable series name."""
+        with self._lock:
+            return {
+                "counters": {_format_name(n, l): v for (n, l), v in self.counters.items()},
+                "gauges": {_format_name(n, l): v for (n, l), v in self.gauges.items()},
+                "histograms": {
+                    _format_name(n, l): {"count": h.count, "sum": h.sum, "mean": h.mean}
+                    for (n, l), h in self.histograms.items()
+                },
+            }
+
+    def reset(self):
+        """Forget everything recorded so far."""
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+
+
+class LoggingSink:
+    """Write every metric event to a logger as it happens."""
+
+    def __init__(self, logger: logging.Logger = None, level: int = logging.DEBUG):
+        self.logger = logger if logger is not None else logging.getLogger("preferences.metrics")
+        self.level = level
+
+    def count(self, name: str, value: float, labels: Labels):
+        self.logger.log(self.level, "%s += %s", _format_name(name, labels), value)
+
+    def set_gauge(self, name: str, value: float, labels: Labels):
+        self.logger.log(self.level, "%s = %s", _format_name(name, labels), value)
+
+    def observe(self, name: str, value: float, labels: Labels):
+        self.logger.log(self.level, "%s observed %.6f", _format_name(name, labels), value)
+
+
+def _escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _prometheus_series(name: str, labels: Labels, extra: Labels = ()) -> str:
+    labels = labels + extra
+    if not labels:
+        return name
+    return name + "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in labels) + "}"
+
+
+class PrometheusSink(InMemorySink):
+    """In-memory totals that render as Prometheus text exposition format."""
+
+    def __init__(self, namespace: str = "preferences", buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(buckets)
+        self.namespace = namespace
+
+    def render(self) -> str:
+        """Return every metric in the text format scraped by Prometheus."""
+        prefix = f"{self.namespace}_" if self.namespace else ""
+        lines = []
+        with self._lock:
+            for kind, series in (("counter", self.counters), ("gauge", self.gauges)):
+                typed = set()
+                for (name, labels), value in sorted(series.items()):
+                    if name not in typed:
+                        lines.append(f"# TYPE {prefix}{name} {kind}")
+                        typed.add(name)
+                    lines.append(f"{_prometheus_series(prefix + name, labels)} {value}")
+
+            typed = set()
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                full_name = prefix + name
+                if name not in typed:
+                    lines.append(f"# TYPE {full_name} histogram")
+                    typed.add(name)
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f"{_prometheus_series(full_name + '_bucket', labels, (('le', repr(bound)),))} "
+                                 f"{cumulative}")
+                lines.append(f"{_prometheus_series(full_name + '_bucket', labels, (('le', '+Inf'),))} "
+                             f"{histogram.count}")
+                lines.append(f"{_prometheus_series(full_name + '_sum', labels)} {histogram.sum}")
+                lines.append(f"{_prometheus_series(full_name + '_count', labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+class Metrics:
+    """Record counters, gauges and latency histograms and pass them to sinks.
+
+    Sinks are any objects with count(), set_gauge() and observe() methods
+    taking (name, value, labels); by default everything is kept in memory.
+    """
+    enabled = True
+
+    def __init__(self, sinks: Iterable = None):
+        # Replaced rather than modified, so recording never needs a lock
+        self._sinks = tuple(sinks) if sinks is not None else (InMemorySink(),)
+
+    @property
+    def sinks(self) -> Tuple:
+        return self._sinks
+
+    def add_sink(self, sink):
+        if sink not in self._sinks:
+            self._sinks = self._sinks + (sink,)
+
+    def remove_sink(self, sink):
+        self._sinks = tuple(s for s in self._sinks if s is not sink)
+
+    @property
+    def memory(self) -> Optional[InMemorySink]:
+        """The first in-memory sink, if there is one."""
+        for sink in self._sinks:
+            if isinstance(sink, InMemorySink):
+                return sink
+        return None
+
+    def increment(self, name: str, value: float = 1, **labels):
+        labels = tuple(sorted(labels.items()))
+        for sink in self._sinks:
+            sink.count(name, value, labels)
+
+    def gauge(self, name: str, value: float, **labels):
+        labels = tuple(sorted(labels.items()))
+        for sink in self._sinks:
+            sink.set_gauge(name, value, labels)
+
+    def observe(self, name: str, value: float, **labels):
+        labels = tuple(sorted(labels.items()))
+        for sink in self._sinks:
+            sink.observe(name, value, labels)
+
+    def timer(self, name: str, **labels) -> _Timer:
+        """Context manager that observes how many seconds its block takes."""
+        return _Timer(self, name, labels)
+
+
+def listener_name(listener) -> str:
+    """Label used for a listener in per-listener metrics."""
+    return getattr(listener, '__qualname__', None) or repr(listener)
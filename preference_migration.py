@@ -0,0 +1,252 @@
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+from concurrent.futures import ProcessPoolExecutor
+import glob
+import json
+import os
+import time
+
+from preference_storage import PreferenceStorage, _write_atomic
+
+
+# Stored preferences carry their schema version in this pseudo-category
+META_CATEGORY = "_meta"
+SCHEMA_VERSION_KEY = "schema_version"
+
+# Version of PREFERENCE_SCHEMA as first shipped; stored files without a
+# version are assumed to be at this version
+BASE_SCHEMA_VERSION = 1
+
+
+def stored_version(preferences: Dict, default: int = BASE_SCHEMA_VERSION) -> int:
+    """Return the schema version recorded in stored preferences."""
+    return preferences.get(META_CATEGORY, {}).get(SCHEMA_VERSION_KEY, default)
+
+
+class RenameKey:
+    """Migration step: move a value to a new category and/or key."""
+
+    def __init__(self, category: str, key: str, new_category: str, new_key: str):
+        self.category = category
+        self.key = key
+        self.new_category = new_category
+        self.new_key = new_key
+
+    def __call__(self, preferences: Dict):
+        prefs = preferences.get(self.category, {})
+        if self.key in prefs:
+            value = prefs.pop(self.key)
+            preferences.setdefault(self.new_category, {})[self.new_key] = value
+
+
+class RemoveKey:
+    """Migration step: drop a preference that no longer exists."""
+
+    def __init__(self, category: str, key: str):
+        self.category = category
+        self.key = key
+
+    def __call__(self, preferences: Dict):
+        preferences.get(self.category, {}).pop(self.key, None)
+
+
+class _RemoveValue:
+    """Sentinel type for REMOVE that stays a singleton across pickling."""
+
+    def __reduce__(self):
+        return "REMOVE"
+
+    def __repr__(self):
+        return "REMOVE"
+
+
+# Returned by a MapValue mapping to drop the stored value so the default applies
+REMOVE = _RemoveValue()
+
+
+class MapValue:
+    """Migration step: convert stored values of one preference.
+
+    mapping is either a dict of old -> new values (values not in it are kept)
+    or a function taking the old value and returning the new one. Mapping to
+    REMOVE drops the stored value so the default applies.
+    """
+
+    REMOVE = REMOVE
+
+    def __init__(self, category: str, key: str, mapping):
+        self.category = category
+        self.key = key
+        self.mapping = mapping
+
+    def __call__(self, preferences: Dict):
+        prefs = preferences.get(self.category, {})
+        if self.key not in prefs:
+            return
+        old_value = prefs[self.key]
+        if callable(self.mapping):
+            new_value = self.mapping(old_value)
+        else:
+            try:
+                new_value = self.mapping.get(old_value, old_value)
+            except TypeError:
+                new_value = old_value
+        if new_value is REMOVE:
+            del prefs[self.key]
+        else:
+            prefs[self.key] = new_value
+
+
+class MigrationRegistry:
+    """Ordered migration steps that bring stored preferences up to date.
+
+    Steps registered for version N turn version N-1 preferences into version N.
+    Steps must be picklable (module-level functions or the step classes above)
+    so bulk migrations can run them in worker processes.
+    """
+
+    def __init__(self, base_version: int = BASE_SCHEMA_VERSION):
+        self.base_version = base_version
+        self._steps = {}  # version -> list of steps
+
+    @property
+    def target_version(self) -> int:
+        """The schema version preferences are migrated to."""
+        return max([self.base_version, *self._steps])
+
+    def add(self, version: int, *steps: Callable[[Dict], Any]):
+        """Register steps that upgrade version - 1 to version."""
+        if version <= self.base_version:
+            raise ValueError(f"Migration version must be above {self.base_version}")
+        self._steps.setdefault(version, []).extend(steps)
+
+    def register(self, version: int):
+        """Decorator form of add() for a single function step."""
+        def decorator(step):
+            self.add(version, step)
+            return step
+        return decorator
+
+    def migrate(self, preferences: Dict) -> bool:
+        """Upgrade preferences in place; return True if anything was migrated."""
+        version = stored_version(preferences, self.base_version)
+        target = self.target_version
+        if version >= target:
+            return False
+        for step_version in range(version + 1, target + 1):
+            for step in self._steps.get(step_version, []):
+                step(preferences)
+        # Steps may leave categories empty
+        for category in [c for c, prefs in preferences.items() if not prefs]:
+            del preferences[category]
+        preferences.setdefault(META_CATEGORY, {})[SCHEMA_VERSION_KEY] = target
+        return True
+
+
+# Migrations applied to every PreferenceManager unless another registry is passed
+DEFAULT_MIGRATIONS = MigrationRegistry()
+
+
+class MigrationReport:
+    """Outcome of a bulk migration run."""
+
+    def __init__(self):
+        self.total = 0
+        self.migrated = 0
+        self.unchanged = 0
+        self.failed = 0
+        self.errors = []  # (profile or path, message)
+        self.elapsed = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Profiles processed per second."""
+        return self.total / self.elapsed if self.elapsed else 0.0
+
+    def _record(self, name: str, status: str, error: str = None):
+        self.total += 1
+        if status == "migrated":
+            self.migrated += 1
+        elif status == "unchanged":
+            self.unchanged += 1
+        else:
+            self.failed += 1
+            self.errors.append((name, error))
+
+    def __str__(self):
+        return (f"{self.total} profiles in {self.elapsed:.2f}s "
+                f"({self.throughput:.0f}/s): {self.migrated} migrated, "
+                f"{self.unchanged} unchanged, {self.failed} failed")
+
+
+def _migrate_file(path: str, registry: MigrationRegistry) -> Tuple[str, str, str]:
+    """Worker: migrate one JSON preferences file in place."""
+    try:
+        with open(path, 'r') as f:
+            preferences = json.load(f)
+        if not registry.migrate(preferences):
+            return path, "unchanged", None
+        if not _write_atomic(path, json.dumps(preferences, indent=2)):
+            return path, "failed", "could not write file"
+        return path, "migrated", None
+    except Exception as e:
+        return path, "failed", str(e)
+
+
+def _migrate_document(item: Tuple[str, Dict], registry: MigrationRegistry):
+    """Worker: migrate one loaded profile and hand it back."""
+    profile, preferences = item
+    try:
+        if registry.migrate(preferences):
+            return profile, "migrated", preferences, None
+        return profile, "unchanged", None, None
+    except Exception as e:
+        return profile, "failed", None, str(e)
+
+
+def _chunks(items: Iterable, size: int) -> Iterator[List]:
+    """Yield lists of up to size items, so huge inputs are never held in memory at once."""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def migrate_directory(directory: str, registry: MigrationRegistry = DEFAULT_MIGRATIONS,
+                      pattern: str = "*.json", workers: int = None,
+                      chunk_size: int = 10000) -> MigrationReport:
+    """Migrate every JSON preferences file in a directory across worker processes."""
+    report = MigrationReport()
+    start = time.perf_counter()
+    paths = glob.iglob(os.path.join(directory, pattern))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for chunk in _chunks(paths, chunk_size):
+            results = pool.map(_migrate_file, chunk, [registry] * len(chunk), chunksize=64)
+            for path, status, error in results:
+                report._record(path, status, error)
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def migrate_storage(storage: PreferenceStorage, registry: MigrationRegistry = DEFAULT_MIGRATIONS,
+                    workers: int = None, chunk_size: int = 1000) -> MigrationReport:
+    """Migrate every profile in a storage backend.
+
+    Profiles are read with a single storage.iter_all() pass and saved on this
+    process, which owns the storage, while the migration steps themselves
+    run in worker processes.
+    """
+    report = MigrationReport()
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for documents in _chunks(storage.iter_all(), chunk_size):
+            results = pool.map(_migrate_document, documents, [registry] * len(documents), chunksize=64)
+            for profile, status, preferences, error in results:
+                if status == "migrated" and not storage.save(profile, preferences):
+                    status, error = "failed", "could not save profile"
+                report._record(profile, status, error)
+    report.elapsed = time.perf_counter() - start
+    return report
@@ -0,0 +1,764 @@
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from contextlib import contextmanager
+import json
+import marshal
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; locking is skipped there
+    fcntl = None
+
+
+# A changed key is identified by its (category, key) pair
+ChangedKeys = Optional[Iterable[Tuple[str, str]]]
+
+
+def _write_atomic(path: str, data: str, what: str = "preferences") -> bool:
+    """Write data to a temp file and move it over path; what names the data in error messages."""
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        fd, tmp_path = tempfile.mkstemp(
+            dir=directory,
+            prefix=os.path.basename(path) + ".",
+            suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            # A crash before this line leaves the old file untouched
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return True
+    except (IOError, OSError) as e:
+        print(f"Error saving {what}: {e}")
+        return False
+
+
+@contextmanager
+def _file_lock(lock_path: str):
+    """Hold an exclusive advisory lock on lock_path (a no-op without fcntl)."""
+    if fcntl is None:
+        yield
+        return
+    with open(lock_path, 'a') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _file_signature(path: str) -> Any:
+    """Identify a file version by inode, size and modification time, or None if missing."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class PreferenceStorage:
+    """Base class for the places a PreferenceManager can keep its preferences.
+
+    A storage holds one preferences dictionary ({category: {key: value}}) per
+    profile. Backends that cannot tell profiles apart simply ignore the profile.
+    """
+
+    def load(self, profile: str) -> Dict:
+        """Return the stored preferences for a profile, or {} if there are none."""
+        raise NotImplementedError
+
+    def save(self, profile: str, preferences: Dict, changed: ChangedKeys = None) -> bool:
+        """Persist a profile's preferences and return True on success.
+
+        When changed is given only those (category, key) pairs differ from what
+        is stored; a pair missing from preferences means the key was removed.
+        When changed is None the whole profile is replaced.
+        """
+        raise NotImplementedError
+
+    def profiles(self) -> List[str]:
+        """Return the names of all stored profiles."""
+        return []
+
+    def iter_all(self) -> Iterator[Tuple[str, Dict]]:
+        """Yield (profile, preferences) for every stored profile, one at a time."""
+        for profile in self.profiles():
+            yield profile, self.load(profile)
+
+    def save_many(self, items: Iterable[Tuple[str, Dict]]) -> int:
+        """Replace many profiles from an iterable of (profile, preferences).
+
+        items may be a generator; it is consumed lazily. Returns how many
+        profiles were saved. Backends override this to write in one go.
+        """
+        saved = 0
+        for profile, preferences in items:
+            if self.save(profile, preferences):
+                saved += 1
+        return saved
+
+    @contextmanager
+    def lock(self, profile: str):
+        """Hold an inter-process lock around a read-modify-write of a profile."""
+        yield
+
+    def signature(self, profile: str) -> Any:
+        """Return a cheap token that changes when the stored profile changes.
+
+        Comparing tokens tells a manager whether another process has written
+        since it last looked, without loading anything. None means the backend
+        cannot tell.
+        """
+        return None
+
+    def size(self, profile: str) -> Optional[int]:
+        """Return roughly how many bytes the stored profile takes up, or None if unknown."""
+        return None
+
+    def close(self):
+        """Release any resources held by the storage."""
+        pass
+
+
+# Bump when the layout of the snapshot cache changes
+_SNAPSHOT_CACHE_VERSION = 1
+
+
+class JSONStorage(PreferenceStorage):
+    """Keep a single profile in a pretty-printed JSON file.
+
+    With snapshot_cache=True a marshal copy of the parsed file is kept next to
+    it (path + ".cache"), tagged with the JSON file's inode, size and mtime.
+    While the tag still matches, loading skips the JSON parse entirely; the
+    whole stored document is still unmarshalled, which is cheap because it
+    only holds overrides. The cache is written by the first load after the
+    file changes, not by every save, so saving costs the same with or
+    without it.
+    """
+
+    def __init__(self, path: str = "preferences.json", snapshot_cache: bool = False):
+        self.path = path
+        self.snapshot_cache = snapshot_cache
+        self.cache_path = path + ".cache"
+
+    def load(self, profile: str) -> Dict:
+        """Load preferences from the snapshot cache or the JSON file."""
+        if self.snapshot_cache:
+            signature = _file_signature(self.path)
+            cached = self._read_cache(signature)
+            if cached is not None:
+                return cached
+
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    preferences = json.load(f)
+            except (json.JSONDecodeError, IOError):
+                print(f"Error loading preferences, using defaults")
+                return {}
+            if self.snapshot_cache:
+                self._write_cache(signature, preferences)
+            return preferences
+        return {}
+
+    def save(self, profile: str, preferences: Dict, changed: ChangedKeys = None) -> bool:
+        """Rewrite the whole JSON file; the file format has no cheaper update."""
+        # A cache left over from before no longer matches the file's signature
+        return _write_atomic(self.path, json.dumps(preferences, indent=2))
+
+    def _read_cache(self, signature) -> Optional[Dict]:
+        """Return the cached preferences if the cache matches the file version."""
+        if signature is None:
+            return None
+        try:
+            # One read and loads() is several times faster than load() on the file
+            with open(self.cache_path, 'rb') as f:
+                version, cached_signature, preferences = marshal.loads(f.read())
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        if version != _SNAPSHOT_CACHE_VERSION or tuple(cached_signature) != signature:
+            return None
+        return preferences
+
+    def _write_cache(self, signature, preferences: Dict):
+        """Store a marshal snapshot of preferences; failures only cost a slower next start."""
+        if signature is None:
+            return
+        try:
+            data = marshal.dumps((_SNAPSHOT_CACHE_VERSION, signature, preferences))
+            fd, tmp_path = tempfile.mkstemp(
+                dir=os.path.dirname(os.path.abspath(self.cache_path)),
+                prefix=os.path.basename(self.cache_path) + ".",
+                suffix=".tmp"
+            )
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self.cache_path)
+        except (OSError, ValueError):
+            pass
+
+    def profiles(self) -> List[str]:
+        """The file holds a single profile, reported under the default name."""
+        return ["default"] if os.path.exists(self.path) else []
+
+    def lock(self, profile: str):
+        """Take an advisory lock on a sidecar .lock file.
+
+        The lock lives in its own file because saving replaces the preferences
+        file, which would leave a lock on the old file useless.
+        """
+        return _file_lock(self.path + ".lock")
+
+    def signature(self, profile: str) -> Any:
+        """Identify the file version by inode, size and modification time."""
+        return _file_signature(self.path)
+
+    def size(self, profile: str) -> Optional[int]:
+        """Size of the JSON file in bytes."""
+        signature = _file_signature(self.path)
+        return signature[1] if signature is not None else None
+
+
+class SQLiteStorage(PreferenceStorage):
+    """Keep many profiles in one SQLite database, one row per preference.
+
+    Values are stored JSON-encoded so booleans and integers round-trip. The
+    (profile, category, key) primary key doubles as the index used to load a
+    single profile.
+    """
+
+    def __init__(self, path: str = "preferences.db"):
+        self.path = path
+        # One connection shared by the caller and the write-behind thread
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS preferences (
+                    profile TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    PRIMARY KEY (profile, category, key)
+                ) WITHOUT ROWID
+                """
+            )
+            self._connection.commit()
+
+    def load(self, profile: str) -> Dict:
+        """Load one profile's rows into a nested preferences dictionary."""
+        preferences = {}
+        try:
+            with self._lock:
+                rows = self._connection.execute(
+                    "SELECT category, key, value FROM preferences WHERE profile = ?",
+                    (profile,)
+                ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Error loading preferences, using defaults: {e}")
+            return {}
+
+        for category, key, value in rows:
+            preferences.setdefault(category, {})[key] = json.loads(value)
+        return preferences
+
+    def save(self, profile: str, preferences: Dict, changed: ChangedKeys = None) -> bool:
+        """Upsert changed rows, or replace the whole profile when changed is None."""
+        upserts = []
+        deletes = []
+        if changed is None:
+            for category, prefs in preferences.items():
+                for key, value in prefs.items():
+                    upserts.append((profile, category, key, json.dumps(value)))
+        else:
+            for category, key in changed:
+                if key in preferences.get(category, {}):
+                    upserts.append((profile, category, key, json.dumps(preferences[category][key])))
+                else:
+                    deletes.append((profile, category, key))
+
+        try:
+            with self._lock, self._connection:
+                if changed is None:
+                    self._connection.execute(
+                        "DELETE FROM preferences WHERE profile = ?",
+                        (profile,)
+                    )
+                self._connection.executemany(
+                    """
+                    INSERT INTO preferences (profile, category, key, value)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT (profile, category, key) DO UPDATE SET value = excluded.value
+                    """,
+                    upserts
+                )
+                self._connection.executemany(
+                    "DELETE FROM preferences WHERE profile = ? AND category = ? AND key = ?",
+                    deletes
+                )
+            return True
+        except sqlite3.Error as e:
+            print(f"Error saving preferences: {e}")
+            return False
+
+    def signature(self, profile: str) -> Any:
+        """Return SQLite's data_version, which changes when another connection commits."""
+        with self._lock:
+            return self._connection.execute("PRAGMA data_version").fetchone()[0]
+
+    def size(self, profile: str) -> Optional[int]:
+        """Size of the database file in bytes; it holds every profile."""
+        signature = _file_signature(self.path)
+        return signature[1] if signature is not None else None
+
+    def profiles(self) -> List[str]:
+        """Return the names of all stored profiles."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT DISTINCT profile FROM preferences ORDER BY profile"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def iter_all(self) -> Iterator[Tuple[str, Dict]]:
+        """Stream every profile with a single ordered query on its own connection.
+
+        A separate read connection lets callers keep writing through this
+        storage while the export runs; WAL mode keeps the two out of each other's way.
+        """
+        query = "SELECT profile, category, key, value FROM preferences ORDER BY profile"
+        if self.path == ":memory:":
+            # A second connection would open a new, empty database; read
+            # everything up front so the lock is not held between profiles
+            with self._lock:
+                rows = self._connection.execute(query).fetchall()
+            yield from _group_profiles(rows)
+            return
+
+        connection = sqlite3.connect(self.path)
+        try:
+            yield from _group_profiles(connection.execute(query))
+        finally:
+            connection.close()
+
+    def save_many(self, items: Iterable[Tuple[str, Dict]]) -> int:
+        """Replace many profiles inside one transaction."""
+        saved = 0
+        try:
+            with self._lock, self._connection:
+                for profile, preferences in items:
+                    self._connection.execute(
+                        "DELETE FROM preferences WHERE profile = ?",
+                        (profile,)
+                    )
+                    self._connection.executemany(
+                        "INSERT INTO preferences (profile, category, key, value) VALUES (?, ?, ?, ?)",
+                        [
+                            (profile, category, key, json.dumps(value))
+                            for category, prefs in preferences.items()
+                            for key, value in prefs.items()
+                        ]
+                    )
+                    saved += 1
+            return saved
+        except sqlite3.Error as e:
+            print(f"Error saving preferences: {e}")
+            return 0
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._connection.close()
+
+
+class JournalStorage(PreferenceStorage):
+    """Keep profiles in a checkpoint file plus an append-only change journal.
+
+    Every save appends one compact JSON line per changed key, so writes cost
+    the same no matter how big the schema is. Loading reads the checkpoint
+    ({profile: preferences}) and replays the journal on top of it. Once the
+    journal grows past compact_threshold bytes, a background thread folds it
+    into a new checkpoint.
+
+    Appends are flushed to the OS right away but only fsynced every
+    fsync_every records or fsync_interval seconds, and on sync()/close().
+    The journal doubles as an audit trail, see history(). Only one process
+    should write to a given journal, since compaction swaps the file out from
+    under other writers.
+    """
+
+    def __init__(self, path: str = "preferences.checkpoint.json",
+                 compact_threshold: int = 256 * 1024,
+                 fsync_every: int = 64, fsync_interval: float = 1.0,
+                 history_path: str = None):
+        self.path = path
+        self.journal_path = path + ".journal"
+        # A journal being compacted is renamed here so new appends can continue
+        self.compacting_path = path + ".journal.compacting"
+        # When set, compacted journal segments are appended here instead of being discarded
+        self.history_path = history_path
+        self.compact_threshold = compact_threshold
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._lock = threading.RLock()
+        # A crash mid-append leaves a partial last line; appending onto it
+        # would make the next record unreadable too
+        _trim_torn_tail(self.journal_path)
+        self._journal = open(self.journal_path, 'a')
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._compactor = None
+        # Change tokens: a per-profile count of our own writes, plus a count of
+        # the times the files changed in ways we did not cause ourselves
+        self._versions = {}
+        self._foreign_changes = 0
+        self._files = self._file_versions()
+        # Set while a compaction rewrites the checkpoint outside the lock
+        self._writing_checkpoint = False
+
+    def load(self, profile: str) -> Dict:
+        """Load a profile from the checkpoint and replay the journal on top."""
+        with self._lock:
+            checkpoint = self._read_checkpoint()
+            preferences = {
+                category: dict(prefs)
+                for category, prefs in checkpoint.get(profile, {}).items()
+            }
+            for record in self._records():
+                if record['p'] == profile:
+                    _apply_record(preferences, record)
+        return preferences
+
+    def save(self, profile: str, preferences: Dict, changed: ChangedKeys = None) -> bool:
+        """Append the changed keys (or the whole profile) to the journal."""
+        now = time.time()
+        lines = []
+        if changed is None:
+            lines.append({'t': now, 'p': profile, 'r': preferences})
+        else:
+            for category, key in changed:
+                if key in preferences.get(category, {}):
+                    lines.append({'t': now, 'p': profile, 'c': category, 'k': key,
+                                  'v': preferences[category][key]})
+                else:
+                    lines.append({'t': now, 'p': profile, 'c': category, 'k': key, 'd': 1})
+        if not lines:
+            return True
+
+        data = "".join(json.dumps(line, separators=(',', ':')) + "\n" for line in lines)
+        try:
+            with self._lock:
+                self._note_foreign_changes()
+                self._journal.write(data)
+                self._journal.flush()
+                self._note_own_write(profile)
+                self._unsynced += len(lines)
+                if (self._unsynced >= self.fsync_every
+                        or time.monotonic() - self._last_sync >= self.fsync_interval):
+                    self._sync_locked()
+                if self._journal.tell() >= self.compact_threshold:
+                    self._start_compaction()
+            return True
+        except (IOError, OSError) as e:
+            print(f"Error saving preferences: {e}")
+            return False
+
+    def save_many(self, items: Iterable[Tuple[str, Dict]]) -> int:
+        """Append a whole-profile record per item and fsync once at the end."""
+        saved = 0
+        try:
+            with self._lock:
+                self._note_foreign_changes()
+                profiles = []
+                for profile, preferences in items:
+                    record = {'t': time.time(), 'p': profile, 'r': preferences}
+                    self._journal.write(json.dumps(record, separators=(',', ':')) + "\n")
+                    profiles.append(profile)
+                    saved += 1
+                self._unsynced += saved
+                self._sync_locked()
+                self._note_own_write(*profiles)
+                if self._journal.tell() >= self.compact_threshold:
+                    self._start_compaction()
+            return saved
+        except (IOError, OSError) as e:
+            print(f"Error saving preferences: {e}")
+            return 0
+
+    def profiles(self) -> List[str]:
+        """Return the names of all profiles in the checkpoint or the journal."""
+        with self._lock:
+            names = set(self._read_checkpoint())
+            names.update(record['p'] for record in self._records())
+        return sorted(names)
+
+    def iter_all(self) -> Iterator[Tuple[str, Dict]]:
+        """Fold the checkpoint and the journal in one pass, then yield every profile.
+
+        Loading profiles one at a time would replay the whole journal for each
+        of them. Records are streamed, so memory follows the size of the
+        profiles rather than the length of the journal.
+        """
+        with self._lock:
+            self._journal.flush()
+            profiles = self._read_checkpoint()
+            for path in (self.compacting_path, self.journal_path):
+                for record in _iter_journal(path):
+                    _apply_record(profiles.setdefault(record['p'], {}), record)
+        for profile in sorted(profiles):
+            yield profile, profiles[profile]
+
+    def lock(self, profile: str):
+        """Take an advisory lock shared with other processes using the same files."""
+        return _file_lock(self.path + ".lock")
+
+    def signature(self, profile: str) -> Any:
+        """Change token for one profile.
+
+        The journal holds every profile, so its file versions alone would make
+        each append look like a change to all of them. Appends and compactions
+        made through this storage only change the token of the profiles they
+        wrote; any change to the files made elsewhere changes every token.
+        Writes from elsewhere are told apart from our own by checking the
+        files before each write, which is reliable as long as every writer
+        holds lock() while it saves, as PreferenceManager does.
+        """
+        with self._lock:
+            self._note_foreign_changes()
+            return (self._foreign_changes, self._versions.get(profile, 0))
+
+    def size(self, profile: str) -> Optional[int]:
+        """Combined size of the checkpoint and journal files in bytes."""
+        return sum(
+            signature[1] for signature in self._file_versions() if signature is not None
+        )
+
+    def _file_versions(self) -> Tuple:
+        """Versions of the checkpoint and journal files."""
+        return (_file_signature(self.path), _file_signature(self.journal_path))
+
+    def _note_foreign_changes(self):
+        """Count a change to the files made elsewhere since we last looked; the caller holds the lock."""
+        files = self._file_versions()
+        if self._writing_checkpoint:
+            # Our own compaction is rewriting the checkpoint
+            files = (self._files[0], files[1])
+        if files != self._files:
+            self._files = files
+            self._foreign_changes += 1
+
+    def _note_own_write(self, *profiles: str):
+        """Record a write made through this storage; the caller holds the lock."""
+        for profile in profiles:
+            self._versions[profile] = self._versions.get(profile, 0) + 1
+        self._files = self._file_versions()
+
+    def history(self, profile: str = None):
+        """Yield journal records, oldest first, optionally for a single profile.
+
+        Each record is a dict with 't' (timestamp), 'p' (profile) and either
+        'c'/'k' with 'v' (set) or 'd' (removed), or 'r' (whole profile replaced).
+        Without a history_path, records older than the last compaction are gone.
+        """
+        paths = [self.compacting_path, self.journal_path]
+        if self.history_path:
+            paths.insert(0, self.history_path)
+        with self._lock:
+            self._journal.flush()
+            records = [record for path in paths for record in _read_journal(path)]
+        for record in records:
+            if profile is None or record['p'] == profile:
+                yield record
+
+    def sync(self):
+        """fsync every appended record now."""
+        with self._lock:
+            self._sync_locked()
+
+    def compact(self):
+        """Fold the journal into a new checkpoint now, on the calling thread."""
+        with self._lock:
+            compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+        with self._lock:
+            self._rotate_journal()
+        self._compact_rotated()
+
+    def close(self):
+        """Wait for any compaction, then fsync and close the journal."""
+        with self._lock:
+            compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+        with self._lock:
+            self._sync_locked()
+            self._journal.close()
+
+    def _sync_locked(self):
+        """fsync the journal; the caller holds the lock."""
+        if self._unsynced:
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _read_checkpoint(self) -> Dict:
+        """Read the checkpoint file, or {} if there is none."""
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (json.JSONDecodeError, IOError):
+            print(f"Error loading preferences checkpoint, ignoring it")
+            return {}
+
+    def _records(self):
+        """Read every journal record not yet folded into the checkpoint."""
+        self._journal.flush()
+        return _read_journal(self.compacting_path) + _read_journal(self.journal_path)
+
+    def _start_compaction(self):
+        """Rotate the journal and fold it into the checkpoint on a background thread."""
+        if self._compactor is not None or os.path.exists(self.compacting_path):
+            return
+        self._rotate_journal()
+        self._compactor = threading.Thread(
+            target=self._compact_rotated,
+            name="PreferenceJournalCompactor",
+            daemon=True
+        )
+        self._compactor.start()
+
+    def _rotate_journal(self):
+        """Move the current journal aside and start a fresh one; the caller holds the lock."""
+        self._note_foreign_changes()
+        self._sync_locked()
+        self._journal.close()
+        if not os.path.exists(self.compacting_path):
+            os.replace(self.journal_path, self.compacting_path)
+        else:
+            # An earlier compaction was interrupted; add to its segment
+            _trim_torn_tail(self.compacting_path)
+            with open(self.journal_path, 'r') as src, open(self.compacting_path, 'a') as dst:
+                dst.write(src.read())
+            os.remove(self.journal_path)
+        self._journal = open(self.journal_path, 'a')
+        self._note_own_write()
+
+    def _compact_rotated(self):
+        """Write checkpoint + rotated journal as a new checkpoint, then drop the rotated journal.
+
+        Records hold absolute values, so replaying a segment twice after a crash
+        between the two steps gives the same result.
+        """
+        try:
+            with self._lock:
+                self._note_foreign_changes()
+                self._writing_checkpoint = True
+            checkpoint = self._read_checkpoint()
+            records = _read_journal(self.compacting_path)
+            for record in records:
+                _apply_record(checkpoint.setdefault(record['p'], {}), record)
+            checkpoint = {profile: prefs for profile, prefs in checkpoint.items() if prefs}
+            if _write_atomic(self.path, json.dumps(checkpoint, separators=(',', ':'))):
+                if self.history_path:
+                    _trim_torn_tail(self.history_path)
+                    with open(self.compacting_path, 'r') as src, open(self.history_path, 'a') as dst:
+                        dst.write(src.read())
+                with self._lock:
+                    os.remove(self.compacting_path)
+                    self._writing_checkpoint = False
+                    self._note_own_write()
+        except (IOError, OSError) as e:
+            print(f"Error compacting preferences journal: {e}")
+        finally:
+            with self._lock:
+                self._writing_checkpoint = False
+                if self._compactor is threading.current_thread():
+                    self._compactor = None
+
+
+def _group_profiles(rows: Iterable[Tuple[str, str, str, str]]) -> Iterator[Tuple[str, Dict]]:
+    """Turn (profile, category, key, value) rows ordered by profile into (profile, preferences)."""
+    current, preferences = None, {}
+    for profile, category, key, value in rows:
+        if profile != current:
+            if current is not None:
+                yield current, preferences
+            current, preferences = profile, {}
+        preferences.setdefault(category, {})[key] = json.loads(value)
+    if current is not None:
+        yield current, preferences
+
+
+def _read_journal(path: str) -> List[Dict]:
+    """Read journal records from path, skipping a torn last line."""
+    return list(_iter_journal(path))
+
+
+def _iter_journal(path: str) -> Iterator[Dict]:
+    """Yield journal records from path one at a time, skipping a torn last line."""
+    try:
+        with open(path, 'r') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # Only the last line can be torn by a crash mid-append
+                    continue
+    except FileNotFoundError:
+        pass
+
+
+def _trim_torn_tail(path: str):
+    """Cut a partial last line left by a crash off a journal file, so appends start on a new line."""
+    try:
+        with open(path, 'rb+') as f:
+            end = f.seek(0, os.SEEK_END)
+            if end == 0:
+                return
+            f.seek(end - 1)
+            if f.read(1) == b"\n":
+                return
+            # Look back for the end of the last complete record
+            position = end
+            while position > 0:
+                step = min(4096, position)
+                position -= step
+                f.seek(position)
+                newline = f.read(step).rfind(b"\n")
+                if newline != -1:
+                    f.truncate(position + newline + 1)
+                    return
+            f.truncate(0)
+    except FileNotFoundError:
+        pass
+
+
+def _apply_record(preferences: Dict, record: Dict):
+    """Apply one journal record to a profile's preferences dict in place."""
+    if 'r' in record:
+        preferences.clear()
+        preferences.update({category: dict(prefs) for category, prefs in record['r'].items()})
+    elif 'd' in record:
+        prefs = preferences.get(record['c'])
+        if prefs is not None:
+            prefs.pop(record['k'], None)
+            if not prefs:
+                del preferences[record['c']]
+    else:
+        preferences.setdefault(record['c'], {})[record['k']] = record['v']
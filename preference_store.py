@@ -0,0 +1,137 @@
+from typing import Any, Dict
+from collections import OrderedDict
+import threading
+
+from preference_manager import PREFERENCE_SCHEMA, PreferenceManager
+from preference_storage import PreferenceStorage
+
+
+class PreferenceStore:
+    """Serve preferences for many profiles from one storage backend.
+
+    Only the most recently used profiles are kept in memory. Each cached profile
+    is a PreferenceManager that does not write on every set(); its changes are
+    written when it is evicted, or when flush() or close() is called. A profile
+    whose changes cannot be written on eviction is set aside rather than
+    dropped; flush() tries again and profile() brings it back.
+    """
+
+    def __init__(self, storage: PreferenceStorage, schema=PREFERENCE_SCHEMA, max_profiles: int = 1024):
+        if max_profiles < 1:
+            raise ValueError("max_profiles must be at least 1")
+        self.storage = storage
+        self.schema = schema
+        self.max_profiles = max_profiles
+        self._profiles = OrderedDict()  # profile id -> PreferenceManager, oldest first
+        self._unsaved = {}  # profile id -> evicted PreferenceManager that failed to save
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.save_failures = 0
+
+    def profile(self, profile_id: str) -> PreferenceManager:
+        """Return the manager for a profile, loading it if it is not cached.
+
+        Do not hold on to the returned manager for long: once it is evicted,
+        later changes made through it are written straight to storage.
+        """
+        with self._lock:
+            manager = self._profiles.get(profile_id)
+            if manager is not None:
+                self.hits += 1
+                self._profiles.move_to_end(profile_id)
+                return manager
+
+            manager = self._unsaved.pop(profile_id, None)
+            if manager is not None:
+                # Its changes never reached storage, so loading would lose them
+                self.hits += 1
+                self._profiles[profile_id] = manager
+                while len(self._profiles) > self.max_profiles:
+                    self._evict_oldest()
+                return manager
+
+            self.misses += 1
+            manager = PreferenceManager(
+                schema=self.schema,
+                storage=self.storage,
+                profile=profile_id,
+                autoflush=False
+            )
+            self._profiles[profile_id] = manager
+            while len(self._profiles) > self.max_profiles:
+                self._evict_oldest()
+            return manager
+
+    def get(self, profile_id: str, category: str, key: str, default=None) -> Any:
+        """Get a preference value for a profile."""
+        return self.profile(profile_id).get(category, key, default)
+
+    def set(self, profile_id: str, category: str, key: str, value: Any) -> bool:
+        """Set a preference value for a profile."""
+        return self.profile(profile_id).set(category, key, value)
+
+    def set_many(self, profile_id: str, values: Dict[str, Dict[str, Any]]) -> bool:
+        """Set several preferences for a profile, applying all of them or none."""
+        return self.profile(profile_id).set_many(values)
+
+    def _evict_oldest(self):
+        """Drop the least recently used profile, writing it first if it is dirty."""
+        profile_id, manager = self._profiles.popitem(last=False)
+        self.evictions += 1
+        if manager.flush():
+            # Anyone still holding the manager now writes through to storage
+            manager.autoflush = True
+        else:
+            print(f"Could not save preferences for profile {profile_id}; keeping them for a retry")
+            self.save_failures += 1
+            self._unsaved[profile_id] = manager
+
+    def flush(self) -> bool:
+        """Write every cached or set-aside profile that has unsaved changes.
+
+        Returns True if everything was saved.
+        """
+        with self._lock:
+            managers = list(self._profiles.values())
+            unsaved = list(self._unsaved.items())
+        saved = True
+        for manager in managers:
+            saved = manager.flush() and saved
+        for profile_id, manager in unsaved:
+            if not manager.flush():
+                saved = False
+                continue
+            with self._lock:
+                if self._unsaved.get(profile_id) is manager:
+                    del self._unsaved[profile_id]
+                    manager.autoflush = True
+        return saved
+
+    def close(self):
+        """Write all pending changes, empty the cache and close the storage."""
+        with self._lock:
+            self.flush()
+            self._profiles.clear()
+            self._unsaved.clear()
+            self.storage.close()
+
+    def stats(self) -> Dict[str, int]:
+        """Return cache counters."""
+        with self._lock:
+            return {
+                "size": len(self._profiles),
+                "max_profiles": self.max_profiles,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "save_failures": self.save_failures,
+                "unsaved": len(self._unsaved),
+            }
+
+    def __len__(self):
+        return len(self._profiles)
+
+    def __contains__(self, profile_id):
+        return profile_id in self._profiles
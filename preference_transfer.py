@@ -0,0 +1,140 @@
+from typing import Dict, IO, Iterable, Iterator
+import json
+
+from compiled_schema import compile_schema
+from preference_manager import PREFERENCE_SCHEMA, PreferenceSnapshot, _is_internal
+from preference_migration import DEFAULT_MIGRATIONS, META_CATEGORY, SCHEMA_VERSION_KEY, MigrationRegistry
+from preference_storage import PreferenceStorage
+
+
+class ImportReport:
+    """Outcome of a bulk import, with the problems found in each rejected record."""
+
+    def __init__(self):
+        self.total = 0
+        self.imported = 0
+        self.failed = 0
+        self.saved = 0
+        # (line number, profile or None, {"category.key" or "record": message})
+        self.errors = []
+
+    @property
+    def ok(self) -> bool:
+        """True if every record was imported and saved."""
+        return self.failed == 0 and self.saved == self.imported
+
+    def _reject(self, line_number: int, profile, problems: Dict[str, str]):
+        self.failed += 1
+        self.errors.append((line_number, profile, problems))
+
+    def __str__(self):
+        return (f"{self.total} records: {self.imported} imported, "
+                f"{self.saved} saved, {self.failed} rejected")
+
+
+def iter_profile_records(storage: PreferenceStorage, schema=PREFERENCE_SCHEMA,
+                         materialize: bool = False) -> Iterator[Dict]:
+    """Yield one {"profile": ..., "preferences": ...} record per stored profile."""
+    defaults = compile_schema(schema).defaults
+    for profile, preferences in storage.iter_all():
+        if materialize:
+            preferences = PreferenceSnapshot(preferences, defaults).as_dict()
+        yield {"profile": profile, "preferences": preferences}
+
+
+def export_profiles(storage: PreferenceStorage, fileobj: IO[str], schema=PREFERENCE_SCHEMA,
+                    materialize: bool = False) -> int:
+    """Write every stored profile to fileobj as newline-delimited JSON.
+
+    Profiles are streamed one at a time, so memory use does not grow with
+    the number of profiles. Returns the number of records written.
+    """
+    count = 0
+    for record in iter_profile_records(storage, schema, materialize):
+        fileobj.write(json.dumps(record, separators=(',', ':')) + "\n")
+        count += 1
+    return count
+
+
+def iter_ndjson(fileobj: IO[str]) -> Iterator:
+    """Yield (line number, record or None, error or None) for each non-blank line."""
+    for line_number, line in enumerate(fileobj, 1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line), None
+        except json.JSONDecodeError as e:
+            yield line_number, None, f"Invalid JSON: {e}"
+
+
+def import_profiles(storage: PreferenceStorage, fileobj: IO[str], schema=PREFERENCE_SCHEMA,
+                    migrations: MigrationRegistry = DEFAULT_MIGRATIONS,
+                    drop_unknown: bool = True) -> ImportReport:
+    """Restore profiles from newline-delimited JSON written by export_profiles().
+
+    Each record is migrated and validated on its own; a record with any
+    invalid value is rejected as a whole and listed in the report, while the
+    valid ones are streamed into a single storage.save_many() call. Unknown
+    preferences are dropped unless drop_unknown is False, in which case they
+    reject the record too. Internal categories such as _recent_locations are
+    restored unchanged.
+    """
+    report = ImportReport()
+    compiled = compile_schema(schema)
+    report.saved = storage.save_many(
+        _valid_profiles(iter_ndjson(fileobj), compiled, migrations, drop_unknown, report)
+    )
+    return report
+
+
+def _valid_profiles(records: Iterable, compiled, migrations: MigrationRegistry,
+                    drop_unknown: bool, report: ImportReport) -> Iterator:
+    """Check records one by one, recording rejects and yielding (profile, overrides)."""
+    defaults = compiled.defaults
+    for line_number, record, error in records:
+        report.total += 1
+        if error is not None:
+            report._reject(line_number, None, {"record": error})
+            continue
+
+        profile = record.get("profile") if isinstance(record, dict) else None
+        preferences = record.get("preferences") if isinstance(record, dict) else None
+        if not isinstance(profile, str) or not isinstance(preferences, dict) \
+                or not all(isinstance(prefs, dict) for prefs in preferences.values()):
+            report._reject(line_number, profile if isinstance(profile, str) else None,
+                           {"record": "Expected {\"profile\": str, \"preferences\": {category: {key: value}}}"})
+            continue
+
+        try:
+            migrations.migrate(preferences)
+        except Exception as e:
+            report._reject(line_number, profile, {"record": f"Migration failed: {e}"})
+            continue
+
+        # Internal categories other than _meta, such as the recent locations,
+        # are the manager's own bookkeeping; they are restored as they are
+        internal = {
+            c: prefs for c, prefs in preferences.items() if _is_internal(c) and c != META_CATEGORY
+        }
+        values = {c: prefs for c, prefs in preferences.items() if not _is_internal(c)}
+        if drop_unknown:
+            values = {
+                category: {key: value for key, value in prefs.items() if key in defaults[category]}
+                for category, prefs in values.items()
+                if category in defaults
+            }
+        problems = compiled.validate_many(values)
+        if problems:
+            report._reject(line_number, profile, problems)
+            continue
+
+        # Store overrides only, like PreferenceManager does
+        overrides = {}
+        for category, prefs in values.items():
+            kept = {key: value for key, value in prefs.items() if defaults[category][key] != value}
+            if kept:
+                overrides[category] = kept
+        overrides.update(internal)
+        overrides[META_CATEGORY] = {SCHEMA_VERSION_KEY: migrations.target_version}
+        report.imported += 1
+        yield profile, overrides
@@ -0,0 +1,217 @@
+from typing import Any, Dict, Iterator, List, Optional
+from collections import OrderedDict
+import threading
+
+
+# Internal preferences category holding {location: use sequence number}
+RECENT_LOCATIONS_CATEGORY = "_recent_locations"
+
+
+def _normalize(location: str) -> str:
+    return " ".join(location.split()).casefold()
+
+
+class _TrieNode:
+    """Trie node; locations holds the locations whose indexed text ends here."""
+    __slots__ = ('children', 'locations')
+
+    def __init__(self):
+        self.children = {}
+        self.locations = set()
+
+
+class PrefixIndex:
+    """Trie over normalized location names for as-you-type lookup.
+
+    Every word start is indexed, so "york" finds "New York, NY" as well as
+    "Yorkshire". Lookups cost the length of the prefix plus the number of
+    matches, not the number of locations.
+    """
+
+    def __init__(self):
+        self._root = _TrieNode()
+
+    @staticmethod
+    def _suffixes(normalized: str) -> Iterator[str]:
+        """The text from each word start to the end."""
+        start = 0
+        for word in normalized.split(" "):
+            yield normalized[start:]
+            start += len(word) + 1
+
+    def add(self, normalized: str):
+        for text in self._suffixes(normalized):
+            node = self._root
+            for char in text:
+                child = node.children.get(char)
+                if child is None:
+                    child = node.children[char] = _TrieNode()
+                node = child
+            node.locations.add(normalized)
+
+    def remove(self, normalized: str):
+        for text in self._suffixes(normalized):
+            path = [self._root]
+            for char in text:
+                node = path[-1].children.get(char)
+                if node is None:
+                    break
+                path.append(node)
+            else:
+                path[-1].locations.discard(normalized)
+                # Prune nodes that no longer lead anywhere
+                for depth in range(len(text), 0, -1):
+                    node = path[depth]
+                    if node.locations or node.children:
+                        break
+                    del path[depth - 1].children[text[depth - 1]]
+
+    def search(self, prefix: str) -> set:
+        """Normalized names with a word starting with prefix."""
+        node = self._root
+        for char in _normalize(prefix):
+            node = node.children.get(char)
+            if node is None:
+                return set()
+        found = set()
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            found.update(node.locations)
+            stack.extend(node.children.values())
+        return found
+
+    def clear(self):
+        self._root = _TrieNode()
+
+
+class RecentLocations:
+    """Bounded most-recently-used list of searched locations.
+
+    Backed by an OrderedDict, so recording a location is an O(1) move to the
+    front. The list follows location.save_recent_locations and is trimmed
+    as soon as location.max_recent_locations shrinks. Changes are saved
+    through the manager's storage one key at a time, in an internal
+    category, so only the touched entries are written.
+    """
+
+    def __init__(self, pref_manager, category: str = RECENT_LOCATIONS_CATEGORY):
+        self.pref_manager = pref_manager
+        self.category = category
+        self._lock = threading.RLock()
+        self._entries = OrderedDict()  # normalized name -> location, oldest first
+        self._index = PrefixIndex()
+        self._sequence = 0
+        self._load()
+        pref_manager.add_change_listener(self._on_preference_change, "location", weak=True)
+
+    def _load(self):
+        """Rebuild the list from the stored use sequence numbers."""
+        stored = self.pref_manager.internal_values(self.category)
+        for location, sequence in sorted(stored.items(), key=lambda item: item[1]):
+            normalized = _normalize(location)
+            self._forget(normalized)
+            self._entries[normalized] = location
+            self._index.add(normalized)
+        self._sequence = max(stored.values(), default=0)
+        self._trim()
+
+    @property
+    def enabled(self) -> bool:
+        return self.pref_manager.get("location", "save_recent_locations")
+
+    @property
+    def limit(self) -> int:
+        return self.pref_manager.get("location", "max_recent_locations")
+
+    def add(self, location: str):
+        """Record a search for location, making it the most recent."""
+        location = " ".join(location.split())
+        if not location or not self.enabled:
+            return
+        normalized = _normalize(location)
+        with self._lock:
+            changes = {}
+            previous = self._entries.get(normalized)
+            if previous is None:
+                self._index.add(normalized)
+            elif previous != location:
+                # Same place typed differently: keep the latest spelling
+                changes[previous] = None
+            self._entries[normalized] = location
+            self._entries.move_to_end(normalized)
+            self._sequence += 1
+            changes[location] = self._sequence
+            changes.update(self._evict(self.limit))
+            self.pref_manager.set_internal(self.category, changes)
+
+    def remove(self, location: str) -> bool:
+        """Forget one location; returns False if it was not in the list."""
+        with self._lock:
+            stored = self._forget(_normalize(location))
+            if stored is None:
+                return False
+            self.pref_manager.set_internal(self.category, {stored: None})
+            return True
+
+    def clear(self):
+        """Forget every recent location."""
+        with self._lock:
+            changes = {location: None for location in self._entries.values()}
+            self._entries.clear()
+            self._index.clear()
+            if changes:
+                self.pref_manager.set_internal(self.category, changes)
+
+    def search(self, prefix: str, limit: Optional[int] = None) -> List[str]:
+        """Locations with a word starting with prefix, most recent first."""
+        with self._lock:
+            if not prefix.strip():
+                matches = list(reversed(self._entries.values()))
+            else:
+                found = self._index.search(prefix)
+                matches = [
+                    location for normalized, location in reversed(self._entries.items())
+                    if normalized in found
+                ]
+        return matches[:limit] if limit is not None else matches
+
+    def _forget(self, normalized: str) -> Optional[str]:
+        """Drop a location from memory and the index; returns its stored spelling."""
+        location = self._entries.pop(normalized, None)
+        if location is not None:
+            self._index.remove(normalized)
+        return location
+
+    def _evict(self, limit: int) -> Dict[str, Any]:
+        """Drop the oldest locations beyond limit; returns the deletions to save."""
+        changes = {}
+        while len(self._entries) > limit:
+            normalized, location = self._entries.popitem(last=False)
+            self._index.remove(normalized)
+            changes[location] = None
+        return changes
+
+    def _trim(self):
+        with self._lock:
+            changes = self._evict(self.limit)
+            if changes:
+                self.pref_manager.set_internal(self.category, changes)
+
+    def _on_preference_change(self, category: str, key: str, old_value: Any, new_value: Any):
+        """Trim when the limit shrinks, and forget everything when saving is switched off."""
+        if key == "max_recent_locations":
+            self._trim()
+        elif key == "save_recent_locations" and not new_value:
+            self.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[str]:
+        """Most recent first."""
+        with self._lock:
+            return iter(list(reversed(self._entries.values())))
+
+    def __contains__(self, location: str) -> bool:
+        return _normalize(location) in self._entries
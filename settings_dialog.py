@@ -1,13 +1,24 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from typing import Dict, Any
+import math
+
+
+# Categories with more settings than this reuse a small pool of row widgets
+VIRTUALIZE_THRESHOLD = 30
+# Fixed height of a virtualized row, in pixels
+VIRTUAL_ROW_HEIGHT = 96
+
 
 class SettingsDialog:
     def __init__(self, parent, preference_manager):
         self.parent = parent
         self.pref_manager = preference_manager
-        self.temp_preferences = {}  # Temporary storage for changes
+        self.snapshot = None  # Committed preferences the dialog started from
+        self.dirty = {}  # (category, key) -> edited value not yet applied
         self.widgets = {}  # Keep track of widgets for updates
+        self._frames = {}  # (category, key) -> LabelFrame, for the changed marker
+        self._virtual_lists = {}  # category -> VirtualPreferenceList for long tabs
         
         # Create the dialog window
         self.dialog = tk.Toplevel(parent)
@@ -19,8 +30,8 @@ class SettingsDialog:
         self.dialog.transient(parent)
         self.dialog.grab_set()
         
-        # Copy current preferences to temporary storage
-        self._copy_preferences()
+        # Take a consistent view of the current preferences
+        self._refresh_snapshot()
         
         # Build the interface
         self._build_ui()
@@ -28,10 +39,36 @@ class SettingsDialog:
         # Center the dialog
         self._center_window()
     
-    def _copy_preferences(self):
-        """Copy current preferences to temporary storage."""
-        import copy
-        self.temp_preferences = copy.deepcopy(self.pref_manager.preferences)
+    def _refresh_snapshot(self):
+        """Start over from the manager's current preferences, with no pending edits."""
+        # A snapshot is consistent even if another thread is changing preferences
+        self.snapshot = self.pref_manager.snapshot()
+        self.dirty = {}
+    
+    def _current_value(self, category: str, key: str) -> Any:
+        """The value shown for a preference: the pending edit, else the committed value."""
+        try:
+            return self.dirty[(category, key)]
+        except KeyError:
+            return self.snapshot.get(category, key)
+    
+    def _frame_label(self, category: str, key: str) -> str:
+        """Label for a preference's frame, marked with * while it has an unapplied edit."""
+        label = self.pref_manager.schema[category][key]['label']
+        if self.pref_manager.is_locked(category, key):
+            label = f"{label} (locked)"
+        return f"{label} *" if (category, key) in self.dirty else label
+    
+    def _apply_lock_state(self, control, category: str, key: str):
+        """Disable the control of a preference an administrator has locked."""
+        if control is not None:
+            control.state(['disabled' if self.pref_manager.is_locked(category, key) else '!disabled'])
+    
+    def _update_marker(self, category: str, key: str):
+        """Refresh the changed marker of one preference, if its frame exists."""
+        frame = self._frames.get((category, key))
+        if frame is not None:
+            frame.configure(text=self._frame_label(category, key))
     
     def _center_window(self):
         """Center the dialog on the parent window."""
@@ -54,7 +91,11 @@ class SettingsDialog:
         self.dialog.geometry(f"+{x}+{y}")
     
     def _build_ui(self):
-        """Build the settings dialog UI."""
+        """Build the settings dialog UI.
+        
+        Only the tab frames are created here; each tab's controls are built
+        the first time the tab is selected.
+        """
         # Create main container
         main_frame = ttk.Frame(self.dialog, padding="10")
         main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
@@ -69,40 +110,23 @@ class SettingsDialog:
         self.notebook = ttk.Notebook(main_frame)
         self.notebook.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 10))
         
-        # Create tabs for each category
+        # Create an empty tab for each category
         self.tabs = {}
+        self._tab_categories = {}  # Tk path of a tab frame -> category
+        self._built_tabs = set()
         for category in self.pref_manager.schema:
             # Create frame for tab
             tab_frame = ttk.Frame(self.notebook)
             self.tabs[category] = tab_frame
+            self._tab_categories[str(tab_frame)] = category
             
             # Add tab to notebook with properly formatted name
             tab_label = category.replace('_', ' ').title()
             self.notebook.add(tab_frame, text=tab_label)
-            
-            # Create scrollable frame for tab content
-            canvas = tk.Canvas(tab_frame, highlightthickness=0)
-            scrollbar = ttk.Scrollbar(tab_frame, orient="vertical", command=canvas.yview)
-            scrollable_frame = ttk.Frame(canvas)
-            
-            scrollable_frame.bind(
-                "<Configure>",
-                lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-            )
-            
-            canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-            canvas.configure(yscrollcommand=scrollbar.set)
-            
-            # Grid canvas and scrollbar
-            canvas.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-            scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
-            
-            # Configure grid weights
-            tab_frame.grid_rowconfigure(0, weight=1)
-            tab_frame.grid_columnconfigure(0, weight=1)
-            
-            # Build preference controls for this category
-            self._build_category_controls(scrollable_frame, category)
+        
+        # Build tab contents on first selection, starting with the visible tab
+        self.notebook.bind('<<NotebookTabChanged>>', self._on_tab_changed)
+        self._on_tab_changed()
         
         # Create button frame
         button_frame = ttk.Frame(main_frame)
@@ -133,17 +157,58 @@ class SettingsDialog:
             command=self._on_reset
         ).pack(side=tk.LEFT)
     
+    def _on_tab_changed(self, event=None):
+        """Build the selected tab's controls if this is its first time on screen."""
+        selected = self.notebook.select()
+        category = self._tab_categories.get(str(selected))
+        if category is not None and category not in self._built_tabs:
+            self._built_tabs.add(category)
+            self._build_tab(category)
+    
+    def _build_tab(self, category: str):
+        """Build the scrollable content of one category tab."""
+        tab_frame = self.tabs[category]
+        
+        # Create scrollable canvas for tab content
+        canvas = tk.Canvas(tab_frame, highlightthickness=0)
+        scrollbar = ttk.Scrollbar(tab_frame, orient="vertical", command=canvas.yview)
+        
+        # Grid canvas and scrollbar
+        canvas.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        
+        # Configure grid weights
+        tab_frame.grid_rowconfigure(0, weight=1)
+        tab_frame.grid_columnconfigure(0, weight=1)
+        
+        # Long categories only get enough widgets to fill the visible area
+        if len(self.pref_manager.schema[category]) > VIRTUALIZE_THRESHOLD:
+            self._virtual_lists[category] = VirtualPreferenceList(self, canvas, scrollbar, category)
+            return
+        
+        scrollable_frame = ttk.Frame(canvas)
+        scrollable_frame.bind(
+            "<Configure>",
+            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
+        )
+        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
+        canvas.configure(yscrollcommand=scrollbar.set)
+        
+        # Build preference controls for this category
+        self._build_category_controls(scrollable_frame, category)
+    
     def _build_category_controls(self, parent, category: str):
         """Build controls for a preference category."""
-        prefs = self.pref_manager.schema[category]
-        
-        for row, (key, spec) in enumerate(prefs.items()):
+        for row, entry in enumerate(self.pref_manager.entries(category)):
+            key, spec = entry.key, entry.spec
+            
             # Create frame for this preference
             pref_frame = ttk.LabelFrame(
                 parent,
-                text=spec['label'],
+                text=self._frame_label(category, key),
                 padding="10"
             )
+            self._frames[(category, key)] = pref_frame
             pref_frame.grid(
                 row=row,
                 column=0,
@@ -165,102 +230,127 @@ class SettingsDialog:
             
             # Create appropriate control based on type
             control_row = 1 if spec.get('description') else 0
+            container, var, control = self._create_control(
+                pref_frame,
+                spec,
+                self._current_value(category, key),
+                lambda value, c=category, k=key: self._on_change(c, k, value)
+            )
+            self._apply_lock_state(control, category, key)
+            if container is not None:
+                sticky = (tk.W, tk.E) if spec['type'] == 'string' else tk.W
+                container.grid(row=control_row, column=0, sticky=sticky)
+                self.widgets[entry.name] = var
+    
+    def _create_control(self, parent, spec: Dict, value: Any, on_change):
+        """Create the input control for a preference type.
+        
+        Returns (widget to place, Tk variable, input widget); on_change is
+        called with the new value whenever the user edits the control.
+        """
+        if spec['type'] == 'boolean':
+            var = tk.BooleanVar(value=value)
+            control = ttk.Checkbutton(
+                parent,
+                variable=var,
+                command=lambda: on_change(var.get())
+            )
+            return control, var, control
             
-            if spec['type'] == 'boolean':
-                var = tk.BooleanVar(value=self.temp_preferences[category][key])
-                control = ttk.Checkbutton(
-                    pref_frame,
-                    variable=var,
-                    command=lambda c=category, k=key, v=var: self._on_change(c, k, v.get())
-                )
-                control.grid(row=control_row, column=0, sticky=tk.W)
-                self.widgets[f"{category}.{key}"] = var
-                
-            elif spec['type'] == 'choice':
-                var = tk.StringVar(value=self.temp_preferences[category][key])
-                control = ttk.Combobox(
-                    pref_frame,
-                    textvariable=var,
-                    values=spec['options'],
-                    state='readonly',
-                    width=20
-                )
-                control.bind(
-                    '<<ComboboxSelected>>',
-                    lambda e, c=category, k=key, v=var: self._on_change(c, k, v.get())
-                )
-                control.grid(row=control_row, column=0, sticky=tk.W)
-                self.widgets[f"{category}.{key}"] = var
-                
-            elif spec['type'] == 'integer':
-                frame = ttk.Frame(pref_frame)
-                frame.grid(row=control_row, column=0, sticky=tk.W)
-                
-                var = tk.IntVar(value=self.temp_preferences[category][key])
-                
-                # Create spinbox
-                spinbox = ttk.Spinbox(
-                    frame,
-                    from_=spec.get('min', 0),
-                    to=spec.get('max', 100),
-                    textvariable=var,
-                    width=10,
-                    command=lambda c=category, k=key, v=var: self._on_change(c, k, v.get())
-                )
-                spinbox.pack(side=tk.LEFT)
-                
-                # Add unit label if specified
-                if 'unit' in spec:
-                    ttk.Label(frame, text=spec['unit']).pack(side=tk.LEFT, padx=(5, 0))
-                
-                self.widgets[f"{category}.{key}"] = var
-                
-            elif spec['type'] == 'string':
-                var = tk.StringVar(value=self.temp_preferences[category][key])
-                control = ttk.Entry(
-                    pref_frame,
-                    textvariable=var,
-                    width=30
-                )
-                control.bind(
-                    '<FocusOut>',
-                    lambda e, c=category, k=key, v=var: self._on_change(c, k, v.get())
-                )
-                control.bind(
-                    '<Return>',
-                    lambda e, c=category, k=key, v=var: self._on_change(c, k, v.get())
-                )
-                control.grid(row=control_row, column=0, sticky=(tk.W, tk.E))
-                self.widgets[f"{category}.{key}"] = var
+        elif spec['type'] == 'choice':
+            var = tk.StringVar(value=value)
+            control = ttk.Combobox(
+                parent,
+                textvariable=var,
+                values=spec['options'],
+                state='readonly',
+                width=20
+            )
+            control.bind('<<ComboboxSelected>>', lambda e: on_change(var.get()))
+            return control, var, control
+            
+        elif spec['type'] == 'integer':
+            frame = ttk.Frame(parent)
+            var = tk.IntVar(value=value)
+            
+            # Create spinbox
+            spinbox = ttk.Spinbox(
+                frame,
+                from_=spec.get('min', 0),
+                to=spec.get('max', 100),
+                textvariable=var,
+                width=10,
+                command=lambda: on_change(var.get())
+            )
+            spinbox.pack(side=tk.LEFT)
+            
+            # Add unit label if specified
+            if 'unit' in spec:
+                ttk.Label(frame, text=spec['unit']).pack(side=tk.LEFT, padx=(5, 0))
+            
+            return frame, var, spinbox
+            
+        elif spec['type'] == 'string':
+            var = tk.StringVar(value=value)
+            control = ttk.Entry(
+                parent,
+                textvariable=var,
+                width=30
+            )
+            control.bind('<FocusOut>', lambda e: on_change(var.get()))
+            control.bind('<Return>', lambda e: on_change(var.get()))
+            return control, var, control
+        
+        return None, None, None
     
     def _on_change(self, category: str, key: str, value: Any):
         """Handle preference change."""
-        self.temp_preferences[category][key] = value
+        # Only values that differ from the committed one count as dirty
+        if value == self.snapshot.get(category, key):
+            changed = self.dirty.pop((category, key), None) is not None
+        else:
+            changed = (category, key) not in self.dirty
+            self.dirty[(category, key)] = value
+        if changed:
+            self._update_marker(category, key)
+    
+    def _dirty_values(self) -> Dict[str, Dict[str, Any]]:
+        """Pending edits as a nested {category: {key: value}} dict."""
+        values = {}
+        for (category, key), value in self.dirty.items():
+            values.setdefault(category, {})[key] = value
+        return values
     
     def _validate_all(self) -> bool:
-        """Validate all temporary preferences."""
-        for category, prefs in self.temp_preferences.items():
-            for key, value in prefs.items():
-                spec = self.pref_manager.schema[category][key]
-                if not self.pref_manager._validate_value(value, spec):
-                    messagebox.showerror(
-                        "Validation Error",
-                        f"Invalid value for {spec['label']}: {value}"
-                    )
-                    return False
+        """Validate the edited preferences."""
+        values = self._dirty_values()
+        errors = self.pref_manager.validate_many(values)
+        if errors:
+            # Report every invalid setting at once, by its label
+            lines = []
+            for name in errors:
+                category, key = name.split('.', 1)
+                spec = self.pref_manager.schema[category].get(key)
+                label = spec['label'] if spec else name
+                lines.append(f"Invalid value for {label}: {values[category][key]}")
+            messagebox.showerror("Validation Error", "\n".join(lines))
+            return False
         return True
     
     def _apply_changes(self):
-        """Apply temporary preferences to the preference manager."""
+        """Apply the edited preferences to the preference manager in one batch."""
+        if not self.dirty:
+            return True
         if not self._validate_all():
             return False
         
-        # Apply each preference
-        for category, prefs in self.temp_preferences.items():
-            for key, value in prefs.items():
-                current_value = self.pref_manager.get(category, key)
-                if current_value != value:
-                    self.pref_manager.set(category, key, value)
+        self.pref_manager.set_many(self._dirty_values())
+        
+        # The edits are committed now, so clear their markers
+        applied = list(self.dirty)
+        self._refresh_snapshot()
+        for category, key in applied:
+            self._update_marker(category, key)
         
         return True
     
@@ -277,8 +367,6 @@ class SettingsDialog:
         """Handle Apply button click."""
         if self._apply_changes():
             messagebox.showinfo("Settings", "Settings applied successfully!")
-            # Update temporary preferences with current values
-            self._copy_preferences()
     
     def _on_reset(self):
         """Handle Reset to Defaults button click."""
@@ -288,18 +376,158 @@ class SettingsDialog:
         )
         
         if result:
-            # Reset in preference manager
-            self.pref_manager.reset_to_defaults()
+            # Only preferences that were edited or not at their default can
+            # look different after the reset
+            touched = set(self.dirty) | set(self.snapshot.overridden_keys())
+            shown = {name: self._current_value(*name) for name in touched}
             
-            # Update temporary preferences
-            self._copy_preferences()
+            # Reset in preference manager, dropping any unapplied edits
+            self.pref_manager.reset_to_defaults()
+            self._refresh_snapshot()
             
-            # Update all widgets
-            for category in self.pref_manager.schema:
-                for key in self.pref_manager.schema[category]:
-                    widget_key = f"{category}.{key}"
-                    if widget_key in self.widgets:
-                        value = self.temp_preferences[category][key]
-                        self.widgets[widget_key].set(value)
+            # Update only the widgets whose value actually changed
+            for category, key in touched:
+                self._update_marker(category, key)
+                widget_key = self.pref_manager.entry(category, key).name
+                value = self.snapshot.get(category, key)
+                if widget_key in self.widgets and shown[(category, key)] != value:
+                    self.widgets[widget_key].set(value)
             
             messagebox.showinfo("Settings", "Settings reset to defaults!")
+
+class VirtualPreferenceList:
+    """Show a long category with just enough rows to fill the visible area.
+    
+    Rows are absolutely positioned on the canvas at index * VIRTUAL_ROW_HEIGHT.
+    When the canvas scrolls or resizes, rows that leave the view are rebound
+    to the preferences that come into view, so the widget count stays
+    proportional to the window height rather than to the schema size.
+    """
+    
+    def __init__(self, dialog: SettingsDialog, canvas, scrollbar, category: str):
+        self.dialog = dialog
+        self.canvas = canvas
+        self.scrollbar = scrollbar
+        self.category = category
+        self.entries = dialog.pref_manager.entries(category)
+        self.rows = []
+        
+        canvas.configure(
+            yscrollcommand=self._on_scroll,
+            yscrollincrement=VIRTUAL_ROW_HEIGHT // 4,
+            scrollregion=(0, 0, 0, len(self.entries) * VIRTUAL_ROW_HEIGHT)
+        )
+        canvas.bind('<Configure>', self._on_configure)
+    
+    def _on_configure(self, event):
+        """Grow the row pool to cover the visible height and stretch rows to the width."""
+        needed = math.ceil(event.height / VIRTUAL_ROW_HEIGHT) + 1
+        while len(self.rows) < min(needed, len(self.entries)):
+            self.rows.append(_VirtualRow(self))
+        for row in self.rows:
+            self.canvas.itemconfigure(row.window, width=event.width)
+        self.canvas.configure(scrollregion=(0, 0, event.width, len(self.entries) * VIRTUAL_ROW_HEIGHT))
+        self.refresh()
+    
+    def _on_scroll(self, first, last):
+        """Keep the scrollbar in sync and rebind rows to the newly visible keys."""
+        self.scrollbar.set(first, last)
+        self.refresh()
+    
+    def refresh(self):
+        """Bind each pooled row to the preference at its visible position."""
+        first_index = int(self.canvas.canvasy(0) // VIRTUAL_ROW_HEIGHT)
+        for offset, row in enumerate(self.rows):
+            index = first_index + offset
+            if index < len(self.entries):
+                row.bind(self.entries[index], index * VIRTUAL_ROW_HEIGHT)
+            else:
+                row.hide()
+
+
+class _VirtualRow:
+    """One recyclable row: a LabelFrame, a description and an input control."""
+    
+    def __init__(self, owner: VirtualPreferenceList):
+        self.owner = owner
+        self.dialog = owner.dialog
+        self.entry = None
+        self.spec = None
+        self.var = None
+        self.control = None
+        self.container = None
+        
+        self.frame = ttk.LabelFrame(owner.canvas, padding="10")
+        self.frame.grid_columnconfigure(0, weight=1)
+        self.frame.grid_propagate(False)
+        self.description = ttk.Label(self.frame, wraplength=400, foreground='gray')
+        self.description.grid(row=0, column=0, sticky=(tk.W, tk.E), pady=(0, 5))
+        self.window = owner.canvas.create_window(
+            (0, 0),
+            window=self.frame,
+            anchor="nw",
+            height=VIRTUAL_ROW_HEIGHT
+        )
+    
+    def bind(self, entry, y: int):
+        """Show this row for a preference entry at canvas position y."""
+        canvas = self.owner.canvas
+        canvas.coords(self.window, 0, y)
+        canvas.itemconfigure(self.window, state='normal')
+        if entry is self.entry:
+            return
+        
+        category, key, spec = entry.category, entry.key, entry.spec
+        self._release()
+        self.entry = entry
+        
+        self.frame.configure(text=self.dialog._frame_label(category, key))
+        self.description.configure(text=spec.get('description', ''))
+        self.dialog._frames[(category, key)] = self.frame
+        value = self.dialog._current_value(category, key)
+        
+        if self.spec is not None and self._can_reuse(spec):
+            # Same kind of control: just point it at the new preference
+            if spec['type'] == 'choice':
+                self.control.configure(values=spec['options'])
+            elif spec['type'] == 'integer':
+                self.control.configure(from_=spec.get('min', 0), to=spec.get('max', 100))
+            self.var.set(value)
+        else:
+            if self.container is not None:
+                self.container.destroy()
+            self.container, self.var, self.control = self.dialog._create_control(
+                self.frame, spec, value, self._on_user_change
+            )
+            if self.container is not None:
+                sticky = (tk.W, tk.E) if spec['type'] == 'string' else tk.W
+                self.container.grid(row=1, column=0, sticky=sticky)
+        self.spec = spec
+        self.dialog._apply_lock_state(self.control, category, key)
+        
+        if self.var is not None:
+            self.dialog.widgets[entry.name] = self.var
+    
+    def hide(self):
+        """Hide the row when there is no preference left to show in it."""
+        self._release()
+        self.entry = None
+        self.owner.canvas.itemconfigure(self.window, state='hidden')
+    
+    def _can_reuse(self, spec: Dict) -> bool:
+        """True if the current control can show spec without being rebuilt."""
+        return spec['type'] == self.spec['type'] and spec.get('unit') == self.spec.get('unit')
+    
+    def _release(self):
+        """Detach from the current key, keeping any edit still in an entry field."""
+        if self.entry is None:
+            return
+        if self.spec['type'] == 'string' and self.var is not None:
+            self._on_user_change(self.var.get())
+        self.dialog.widgets.pop(self.entry.name, None)
+        self.dialog._frames.pop((self.entry.category, self.entry.key), None)
+    
+    def _on_user_change(self, value: Any):
+        """Forward an edit to the dialog for whichever key the row shows now."""
+        if self.entry is not None:
+            self.dialog._on_change(self.entry.category, self.entry.key, value)
@@ -0,0 +1,44 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the top of the repository rather than in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from preference_manager import PreferenceManager
+
+
+@pytest.fixture
+def prefs_path(tmp_path):
+    return str(tmp_path / "preferences.json")
+
+
+@pytest.fixture
+def make_manager(prefs_path):
+    """Build PreferenceManagers on a temporary file and close them after the test."""
+    managers = []
+
+    def make(path=prefs_path, **kwargs):
+        manager = PreferenceManager(path, **kwargs)
+        managers.append(manager)
+        return manager
+
+    yield make
+    for manager in managers:
+        manager.close()
+
+
+class Recorder:
+    """Change listener that remembers every change it is told about."""
+
+    def __init__(self):
+        self.changes = []
+
+    def __call__(self, category, key, old_value, new_value):
+        self.changes.append((category, key, old_value, new_value))
+
+
+@pytest.fixture
+def recorder():
+    return Recorder()
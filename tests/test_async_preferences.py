@@ -0,0 +1,70 @@
+import asyncio
+import json
+import threading
+from contextlib import contextmanager
+
+import pytest
+
+import preference_storage
+from async_preferences import AsyncPreferenceManager
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def _stored(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def test_concurrent_sets_are_saved_together(prefs_path):
+    async def main():
+        async with AsyncPreferenceManager(prefs_path) as prefs:
+            await asyncio.gather(
+                prefs.aset("general", "time_format", "24h"),
+                prefs.aset("display", "theme", "dark"),
+                prefs.aset_many({"general": {"temperature_unit": "celsius"}}),
+            )
+            assert prefs.get("display", "theme") == "dark"
+
+    _run(main())
+    stored = _stored(prefs_path)
+    assert stored["general"] == {"time_format": "24h", "temperature_unit": "celsius"}
+    assert stored["display"] == {"theme": "dark"}
+
+
+@contextmanager
+def _unwritable_lock(lock_path):
+    raise PermissionError(13, "Permission denied", lock_path)
+
+
+def test_failed_save_raises(prefs_path, monkeypatch):
+    async def main():
+        async with AsyncPreferenceManager(prefs_path) as prefs:
+            monkeypatch.setattr(preference_storage, "_file_lock", _unwritable_lock)
+            with pytest.raises(OSError):
+                await prefs.aset("general", "time_format", "24h")
+            monkeypatch.undo()
+            await prefs.aflush()
+
+    _run(main())
+    assert _stored(prefs_path)["general"]["time_format"] == "24h"
+
+
+def test_import_is_applied_on_the_loop_thread(prefs_path, tmp_path, recorder):
+    source = tmp_path / "import.json"
+    source.write_text(json.dumps({"display": {"theme": "dark"}}))
+    threads = []
+
+    async def main():
+        async with AsyncPreferenceManager(prefs_path) as prefs:
+            prefs.manager.add_change_listener(lambda *change: threads.append(threading.current_thread()))
+            prefs.manager.add_change_listener(recorder)
+            assert await prefs.aimport_preferences(str(source))
+            assert not await prefs.aimport_preferences(str(tmp_path / "missing.json"))
+
+    _run(main())
+    assert threads == [threading.main_thread()]
+    assert recorder.changes == [("display", "theme", "light", "dark")]
+    assert _stored(prefs_path)["display"]["theme"] == "dark"
@@ -0,0 +1,189 @@
+import json
+import threading
+
+import pytest
+
+
+class CountingStorage:
+    """Wraps a storage and counts the saves that reach it."""
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.saves = []
+
+    def __getattr__(self, name):
+        return getattr(self.storage, name)
+
+    def save(self, profile, preferences, changed=None):
+        self.saves.append(None if changed is None else set(changed))
+        return self.storage.save(profile, preferences, changed)
+
+
+@pytest.fixture
+def counting(prefs_path):
+    from preference_storage import JSONStorage
+    return CountingStorage(JSONStorage(prefs_path))
+
+
+def test_set_many_saves_and_notifies_once(make_manager, counting, recorder):
+    manager = make_manager(storage=counting)
+    manager.add_change_listener(recorder)
+    manager.set_many({
+        "general": {"time_format": "24h", "temperature_unit": "celsius"},
+        "display": {"theme": "dark"},
+    })
+    assert len(counting.saves) == 1
+    assert counting.saves[0] >= {("general", "time_format"), ("general", "temperature_unit"),
+                                 ("display", "theme")}
+    assert sorted(change[:2] for change in recorder.changes) == [
+        ("display", "theme"), ("general", "temperature_unit"), ("general", "time_format")
+    ]
+
+
+def test_set_many_applies_all_or_nothing(make_manager, counting, recorder):
+    manager = make_manager(storage=counting)
+    manager.add_change_listener(recorder)
+    with pytest.raises(ValueError):
+        manager.set_many({
+            "general": {"time_format": "24h"},
+            "display": {"theme": "purple"},
+        })
+    assert manager.get("general", "time_format") == "12h"
+    assert counting.saves == []
+    assert recorder.changes == []
+
+
+def test_batch_rolls_back_on_error(make_manager, counting, recorder, prefs_path):
+    manager = make_manager(storage=counting)
+    manager.add_change_listener(recorder)
+    with pytest.raises(RuntimeError):
+        with manager.batch():
+            manager.set("general", "time_format", "24h")
+            manager.set("display", "theme", "dark", layer="session")
+            raise RuntimeError("abort")
+    assert manager.get("general", "time_format") == "12h"
+    assert manager.get("display.theme") == "light"
+    assert manager.value_source("display", "theme") == "default"
+    assert counting.saves == []
+    assert recorder.changes == []
+
+
+def test_nested_batches_commit_once(make_manager, counting):
+    manager = make_manager(storage=counting)
+    with manager.batch():
+        manager.set("general", "time_format", "24h")
+        with manager.batch():
+            manager.set("display", "theme", "dark")
+        assert counting.saves == []
+    assert len(counting.saves) == 1
+
+
+def test_change_undone_inside_batch_is_not_announced(make_manager, recorder):
+    manager = make_manager()
+    manager.add_change_listener(recorder)
+    with manager.batch():
+        manager.set("display", "theme", "dark")
+        manager.set("display", "theme", "light")
+    assert recorder.changes == []
+
+
+def test_batch_is_published_all_at_once(make_manager):
+    manager = make_manager(autoflush=False)
+    with manager.batch():
+        manager.set("general", "time_format", "24h")
+        # Nothing is visible until the batch ends
+        assert manager.get("general", "time_format") == "12h"
+        assert manager.snapshot().get("general", "time_format") == "12h"
+    assert manager.get("general", "time_format") == "24h"
+    assert manager.get("general.time_format") == "24h"
+
+
+def test_readers_never_see_half_a_batch(make_manager):
+    manager = make_manager(autoflush=False)
+    pairs = [
+        {"general": {"time_format": "24h", "temperature_unit": "celsius"}},
+        {"general": {"time_format": "12h", "temperature_unit": "fahrenheit"}},
+    ]
+    stop = threading.Event()
+    torn = []
+
+    def read():
+        while not stop.is_set():
+            snapshot = manager.snapshot()
+            pair = (snapshot.get("general", "time_format"), snapshot.get("general", "temperature_unit"))
+            if pair not in (("24h", "celsius"), ("12h", "fahrenheit")):
+                torn.append(pair)
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    try:
+        for i in range(500):
+            manager.set_many(pairs[i % 2])
+    finally:
+        stop.set()
+        reader.join()
+    assert torn == []
+
+
+def test_set_many_from_another_thread_during_a_batch_is_saved(make_manager, recorder, prefs_path):
+    manager = make_manager()
+    manager.add_change_listener(recorder)
+    inside = threading.Event()
+
+    def other():
+        inside.wait(5)
+        manager.set_many({"general": {"time_format": "24h"}})
+
+    thread = threading.Thread(target=other)
+    thread.start()
+    with manager.batch():
+        manager.set("display", "theme", "dark")
+        inside.set()
+        thread.join(0.1)
+    thread.join()
+
+    with open(prefs_path) as f:
+        stored = json.load(f)
+    assert stored["general"]["time_format"] == "24h"
+    assert stored["display"]["theme"] == "dark"
+    assert ("general", "time_format", "12h", "24h") in recorder.changes
+
+
+def test_reset_to_defaults_is_one_batch(make_manager, counting, recorder):
+    manager = make_manager(storage=counting)
+    manager.set_many({"general": {"time_format": "24h"}, "display": {"theme": "dark"}})
+    manager.add_change_listener(recorder)
+    counting.saves.clear()
+    manager.reset_to_defaults()
+    assert counting.saves == [None]
+    assert manager.get("general", "time_format") == "12h"
+    assert len(recorder.changes) == 2
+
+
+def test_batch_opened_while_another_commits_keeps_its_changes(make_manager, recorder, prefs_path,
+                                                              monkeypatch):
+    manager = make_manager()
+    manager.add_change_listener(recorder)
+    committing = threading.Event()
+    resume = threading.Event()
+    commit = type(manager)._commit_batch
+
+    def paused_commit(self, *args):
+        # Hold the other thread between releasing the lock and committing
+        if threading.current_thread().name == "committer":
+            committing.set()
+            resume.wait(5)
+        return commit(self, *args)
+
+    monkeypatch.setattr(type(manager), "_commit_batch", paused_commit)
+    thread = threading.Thread(target=manager.set_many, args=({"display": {"theme": "dark"}},),
+                              name="committer")
+    thread.start()
+    assert committing.wait(5)
+    with manager.batch():
+        resume.set()
+    thread.join()
+
+    with open(prefs_path) as f:
+        assert json.load(f)["display"]["theme"] == "dark"
+    assert recorder.changes == [("display", "theme", "light", "dark")]
@@ -0,0 +1,97 @@
+import json
+import time
+from contextlib import contextmanager
+
+import preference_storage
+
+
+def test_flush_merges_changes_from_another_manager(make_manager, prefs_path):
+    first = make_manager()
+    second = make_manager()
+    first.set("general", "time_format", "24h")
+    second.set("display", "theme", "dark")
+
+    with open(prefs_path) as f:
+        stored = json.load(f)
+    assert stored["general"]["time_format"] == "24h"
+    assert stored["display"]["theme"] == "dark"
+    assert second.get("general", "time_format") == "24h"
+
+
+def test_unsaved_local_change_wins_over_external_one(make_manager):
+    local = make_manager(autoflush=False)
+    other = make_manager()
+    local.set("display", "theme", "dark")
+    other.set("display", "theme", "auto")
+    other.set("general", "time_format", "24h")
+
+    local.flush()
+    assert local.get("display", "theme") == "dark"
+    assert local.get("general", "time_format") == "24h"
+
+
+def test_check_for_changes_notifies_only_changed_keys(make_manager, recorder):
+    watcher = make_manager()
+    writer = make_manager()
+    watcher.add_change_listener(recorder)
+    assert not watcher.check_for_changes()
+
+    writer.set_many({"general": {"time_format": "24h"}, "display": {"theme": "light"}})
+    assert watcher.check_for_changes()
+    assert recorder.changes == [("general", "time_format", "12h", "24h")]
+    assert not watcher.check_for_changes()
+
+
+def test_watch_reloads_in_the_background(make_manager, recorder):
+    watcher = make_manager()
+    writer = make_manager()
+    watcher.add_change_listener(recorder)
+    watcher.watch(interval=0.01)
+    writer.set("display", "theme", "dark")
+    deadline = time.monotonic() + 5
+    while not recorder.changes and time.monotonic() < deadline:
+        time.sleep(0.01)
+    watcher.unwatch()
+    assert recorder.changes == [("display", "theme", "light", "dark")]
+
+
+@contextmanager
+def _unwritable_lock(lock_path):
+    raise PermissionError(13, "Permission denied", lock_path)
+
+
+def test_lock_failure_keeps_changes_pending(make_manager, prefs_path, recorder, monkeypatch):
+    manager = make_manager()
+    manager.add_change_listener(recorder)
+    monkeypatch.setattr(preference_storage, "_file_lock", _unwritable_lock)
+
+    assert manager.set("general", "time_format", "24h")
+    assert recorder.changes == [("general", "time_format", "12h", "24h")]
+    assert not manager.flush()
+
+    monkeypatch.undo()
+    assert manager.flush()
+    with open(prefs_path) as f:
+        assert json.load(f)["general"]["time_format"] == "24h"
+
+
+def test_write_behind_flusher_survives_errors(make_manager, prefs_path, monkeypatch):
+    manager = make_manager(write_behind=True, flush_delay=0.01)
+    monkeypatch.setattr(preference_storage, "_file_lock", _unwritable_lock)
+    manager.set("general", "time_format", "24h")
+    time.sleep(0.1)
+    assert manager._flusher.is_alive()
+
+    monkeypatch.undo()
+    deadline = time.monotonic() + 5
+    while _stored(prefs_path).get("general") is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert _stored(prefs_path)["general"]["time_format"] == "24h"
+
+
+def _stored(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
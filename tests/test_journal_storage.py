@@ -0,0 +1,173 @@
+import json
+import os
+
+import pytest
+
+from preference_storage import JournalStorage
+
+
+@pytest.fixture
+def journal_path(tmp_path):
+    return str(tmp_path / "preferences.checkpoint.json")
+
+
+@pytest.fixture
+def storage(journal_path):
+    storage = JournalStorage(journal_path, compact_threshold=10 ** 9)
+    yield storage
+    storage.close()
+
+
+def test_changes_are_appended_one_record_per_key(storage):
+    storage.save("a", {"general": {"time_format": "24h"}}, [("general", "time_format")])
+    storage.save("a", {"display": {"theme": "dark"}}, [("display", "theme")])
+    with open(storage.journal_path) as f:
+        records = [json.loads(line) for line in f]
+    assert [(r["c"], r["k"], r["v"]) for r in records] == [
+        ("general", "time_format", "24h"), ("display", "theme", "dark")
+    ]
+
+
+def test_reopened_journal_replays_every_profile(storage, journal_path):
+    storage.save("a", {"general": {"time_format": "24h"}}, [("general", "time_format")])
+    storage.save("b", {"display": {"theme": "dark"}}, None)
+    storage.save("a", {}, [("general", "time_format")])
+    storage.save("a", {"display": {"theme": "auto"}}, [("display", "theme")])
+    storage.close()
+
+    reopened = JournalStorage(journal_path)
+    try:
+        assert reopened.load("a") == {"display": {"theme": "auto"}}
+        assert reopened.load("b") == {"display": {"theme": "dark"}}
+        assert reopened.profiles() == ["a", "b"]
+    finally:
+        reopened.close()
+
+
+def test_torn_last_record_is_skipped(storage, journal_path):
+    storage.save("a", {"general": {"time_format": "24h"}}, [("general", "time_format")])
+    storage.close()
+    with open(storage.journal_path, "a") as f:
+        f.write('{"t":1,"p":"a","c":"display","k":"th')
+
+    reopened = JournalStorage(journal_path)
+    try:
+        assert reopened.load("a") == {"general": {"time_format": "24h"}}
+    finally:
+        reopened.close()
+
+
+def test_append_after_a_torn_record_is_kept(storage, journal_path):
+    storage.save("a", {"general": {"time_format": "24h"}}, [("general", "time_format")])
+    storage.close()
+    with open(storage.journal_path, "a") as f:
+        f.write('{"t":1,"p":"a","c":"display","k":"th')
+
+    reopened = JournalStorage(journal_path)
+    reopened.save("a", {"display": {"theme": "dark"}}, [("display", "theme")])
+    reopened.close()
+    reopened = JournalStorage(journal_path)
+    try:
+        assert reopened.load("a") == {"general": {"time_format": "24h"}, "display": {"theme": "dark"}}
+    finally:
+        reopened.close()
+
+
+def test_iter_all_folds_checkpoint_and_journal(storage):
+    storage.save("a", {"general": {"time_format": "24h"}}, [("general", "time_format")])
+    storage.save("b", {"display": {"theme": "dark"}}, None)
+    storage.compact()
+    storage.save("a", {"general": {"time_format": "24h"}, "display": {"theme": "auto"}},
+                 [("display", "theme")])
+    storage.save("c", {"data": {"update_interval": 15}}, [("data", "update_interval")])
+    assert list(storage.iter_all()) == [(profile, storage.load(profile)) for profile in ("a", "b", "c")]
+
+
+def test_compaction_folds_the_journal_into_the_checkpoint(storage, journal_path):
+    storage.save("a", {"general": {"time_format": "24h"}}, [("general", "time_format")])
+    storage.save("b", {"display": {"theme": "dark"}}, [("display", "theme")])
+    storage.compact()
+
+    assert os.path.getsize(storage.journal_path) == 0
+    assert not os.path.exists(storage.compacting_path)
+    with open(journal_path) as f:
+        assert json.load(f) == {
+            "a": {"general": {"time_format": "24h"}},
+            "b": {"display": {"theme": "dark"}},
+        }
+    assert storage.load("a") == {"general": {"time_format": "24h"}}
+
+
+def test_background_compaction_past_threshold(journal_path):
+    storage = JournalStorage(journal_path, compact_threshold=512)
+    try:
+        for i in range(50):
+            storage.save("a", {"data": {"update_interval": 5 + i}}, [("data", "update_interval")])
+        compactor = storage._compactor
+        if compactor is not None:
+            compactor.join()
+        # Appends made during a compaction wait in the journal for the next one
+        assert os.path.exists(journal_path)
+        assert storage.load("a") == {"data": {"update_interval": 54}}
+    finally:
+        storage.close()
+
+
+def test_history_keeps_compacted_records(tmp_path):
+    storage = JournalStorage(str(tmp_path / "checkpoint.json"),
+                             history_path=str(tmp_path / "history.jsonl"))
+    try:
+        storage.save("a", {"display": {"theme": "dark"}}, [("display", "theme")])
+        storage.compact()
+        storage.save("a", {}, [("display", "theme")])
+        storage.save("b", {"display": {"theme": "auto"}}, [("display", "theme")])
+        history = list(storage.history("a"))
+        assert [("d" in record, record["k"]) for record in history] == [
+            (False, "theme"), (True, "theme")
+        ]
+    finally:
+        storage.close()
+
+
+def test_other_profiles_writes_do_not_change_a_signature(storage):
+    before = storage.signature("a")
+    storage.save("b", {"display": {"theme": "dark"}}, [("display", "theme")])
+    storage.compact()
+    assert storage.signature("a") == before
+    storage.save("a", {"display": {"theme": "dark"}}, [("display", "theme")])
+    assert storage.signature("a") != before
+
+
+def test_writes_from_elsewhere_change_every_signature(storage, journal_path):
+    before = storage.signature("a")
+    other = JournalStorage(journal_path)
+    try:
+        other.save("b", {"display": {"theme": "dark"}}, [("display", "theme")])
+    finally:
+        other.close()
+    assert storage.signature("a") != before
+
+
+def test_writes_from_elsewhere_are_seen_after_our_own(storage, journal_path):
+    before = storage.signature("b")
+    other = JournalStorage(journal_path)
+    try:
+        other.save("b", {"display": {"theme": "dark"}}, [("display", "theme")])
+    finally:
+        other.close()
+    storage.save("a", {"general": {"time_format": "24h"}}, [("general", "time_format")])
+    assert storage.signature("b") != before
+
+
+def test_managers_for_two_profiles_share_a_journal(make_manager, storage, monkeypatch):
+    first = make_manager(storage=storage, profile="a")
+    second = make_manager(storage=storage, profile="b")
+    merges = []
+    monkeypatch.setattr(type(first), "_merge_stored",
+                        lambda self, stored: merges.append(self.profile) or [])
+    for value in ("24h", "12h", "24h"):
+        first.set("general", "time_format", value)
+        second.set("display", "theme", "dark" if value == "24h" else "light")
+    assert merges == []
+    assert storage.load("a")["general"]["time_format"] == "24h"
+    assert storage.load("b")["display"]["theme"] == "dark"
@@ -0,0 +1,49 @@
+import pytest
+
+
+def test_dotted_names_read_like_category_and_key(make_manager):
+    manager = make_manager(system={"general": {"time_format": "24h"}})
+    manager.set("display", "theme", "dark")
+    assert manager.get("display.theme") == "dark"
+    assert manager.get("general.time_format") == "24h"
+    assert manager.get("display.missing", default="fallback") == "fallback"
+    assert manager.get("nonsense", default=1) == 1
+
+
+def test_entry_lookup(make_manager):
+    manager = make_manager()
+    entry = manager.entry("display.theme")
+    assert entry is manager.entry("display", "theme")
+    assert (entry.category, entry.key, entry.name) == ("display", "theme", "display.theme")
+    assert entry.default == "light"
+    assert entry.validator("dark") and not entry.validator("purple")
+    with pytest.raises(ValueError):
+        manager.entry("display.missing")
+    with pytest.raises(ValueError):
+        manager.entry("display", "missing")
+
+
+def test_slots_follow_schema_order(make_manager):
+    manager = make_manager()
+    entries = manager.entries()
+    assert [entry.slot for entry in entries] == list(range(len(entries)))
+    assert manager.entries("display") == tuple(e for e in entries if e.category == "display")
+    assert [manager.get_slot(entry.slot) for entry in entries] == [entry.default for entry in entries]
+
+
+def test_slot_reads_and_writes_follow_every_layer(make_manager):
+    manager = make_manager()
+    slot = manager.entry("display.theme").slot
+    assert manager.set_slot(slot, "dark")
+    assert manager.get_slot(slot) == "dark"
+    manager.set_slot(slot, "auto", layer="session")
+    assert manager.get_slot(slot) == manager.get("display.theme") == "auto"
+    manager.clear_session()
+    assert manager.get_slot(slot) == "dark"
+    with pytest.raises(ValueError):
+        manager.set_slot(slot, "purple")
+
+    with manager.batch():
+        manager.set_slot(slot, "light")
+        assert manager.get_slot(slot) == "dark"
+    assert manager.get_slot(slot) == "light"
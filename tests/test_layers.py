@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+
+def test_layers_resolve_session_over_user_over_system(make_manager):
+    manager = make_manager(system={"display": {"theme": "auto"}})
+    assert (manager.get("display", "theme"), manager.value_source("display", "theme")) == ("auto", "system")
+    manager.set("display", "theme", "dark")
+    assert (manager.get("display", "theme"), manager.value_source("display", "theme")) == ("dark", "user")
+    manager.set("display", "theme", "light", layer="session")
+    assert (manager.get("display", "theme"), manager.value_source("display", "theme")) == ("light", "session")
+    manager.clear_session()
+    assert manager.get("display", "theme") == "dark"
+
+
+def test_user_choice_survives_a_system_change(make_manager):
+    manager = make_manager(system={"display": {"theme": "dark"}})
+    manager.set("display", "theme", "dark")
+    manager.set_system_defaults({"display": {"theme": "auto"}})
+    assert manager.get("display", "theme") == "dark"
+    assert manager.value_source("display", "theme") == "user"
+
+
+def test_user_choice_of_the_default_beats_the_system_value(make_manager, prefs_path):
+    manager = make_manager(system={"display": {"theme": "dark"}})
+    manager.set("display", "theme", "light")
+    assert manager.get("display", "theme") == "light"
+
+    reloaded = make_manager(system={"display": {"theme": "dark"}})
+    assert reloaded.get("display", "theme") == "light"
+
+
+def test_only_the_user_layer_is_saved(make_manager, prefs_path):
+    manager = make_manager(system={"display": {"theme": "auto"}})
+    manager.set("general", "time_format", "24h")
+    manager.set("general", "temperature_unit", "celsius", layer="session")
+    with open(prefs_path) as f:
+        stored = json.load(f)
+    assert stored["general"] == {"time_format": "24h"}
+    assert "display" not in stored
+
+
+def test_locked_preferences_show_the_system_value(make_manager):
+    manager = make_manager(system={"display": {"theme": "dark"}}, locked=[("display", "theme")])
+    with pytest.raises(ValueError):
+        manager.set("display", "theme", "light")
+    with pytest.raises(ValueError):
+        manager.set("display", "theme", "light", layer="session")
+    assert manager.get("display", "theme") == "dark"
+
+    manager.set_system_defaults({"display": {"theme": "auto"}}, locked=[])
+    manager.set("display", "theme", "light")
+    assert manager.get("display", "theme") == "light"
+
+
+def test_reset_keeps_system_and_session_values(make_manager):
+    manager = make_manager(system={"display": {"theme": "auto"}})
+    manager.set("display", "theme", "dark")
+    manager.set("general", "time_format", "24h", layer="session")
+    manager.reset_to_defaults()
+    assert manager.get("display", "theme") == "auto"
+    assert manager.get("general", "time_format") == "24h"
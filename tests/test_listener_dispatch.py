@@ -0,0 +1,69 @@
+import time
+
+from listener_dispatch import ListenerDispatcher, ThreadPoolDispatcher
+
+
+def _slow(category, key, old_value, new_value):
+    time.sleep(0.02)
+
+
+def test_slow_listeners_are_not_reported_by_default(capsys):
+    dispatcher = ListenerDispatcher()
+    dispatcher.dispatch([_slow], "display", "theme", "light", "dark")
+    assert capsys.readouterr().out == ""
+
+
+def test_slow_listeners_are_reported_past_the_threshold():
+    reports = []
+    dispatcher = ListenerDispatcher(
+        slow_threshold=0.001,
+        on_slow=lambda listener, category, key, elapsed: reports.append((listener, category, key))
+    )
+    dispatcher.dispatch([_slow], "display", "theme", "light", "dark")
+    assert reports == [(_slow, "display", "theme")]
+
+
+def test_failing_report_does_not_stop_delivery(recorder, capsys):
+    def broken_report(listener, category, key, elapsed):
+        raise RuntimeError("report failed")
+
+    dispatcher = ListenerDispatcher(slow_threshold=0.001, on_slow=broken_report)
+    dispatcher.dispatch([_slow, recorder], "display", "theme", "light", "dark")
+    assert recorder.changes == [("display", "theme", "light", "dark")]
+    assert "report failed" in capsys.readouterr().out
+
+
+def test_thread_pool_keeps_order_per_preference(recorder):
+    dispatcher = ThreadPoolDispatcher(max_workers=4)
+    try:
+        for i in range(20):
+            dispatcher.dispatch([recorder], "data", "update_interval", i, i + 1)
+            dispatcher.dispatch([recorder], "display", "theme", i, i + 1)
+        assert dispatcher.drain(5)
+    finally:
+        dispatcher.close()
+    intervals = [change[3] for change in recorder.changes if change[1] == "update_interval"]
+    assert intervals == list(range(1, 21))
+
+
+def test_thread_pool_survives_a_failing_report(recorder):
+    def broken_report(listener, category, key, elapsed):
+        raise RuntimeError("report failed")
+
+    dispatcher = ThreadPoolDispatcher(max_workers=1, slow_threshold=0.001, on_slow=broken_report)
+    try:
+        dispatcher.dispatch([_slow], "display", "theme", "light", "dark")
+        dispatcher.dispatch([recorder], "display", "theme", "dark", "auto")
+        assert dispatcher.drain(5)
+    finally:
+        dispatcher.close()
+    assert recorder.changes == [("display", "theme", "dark", "auto")]
+
+
+def test_manager_delivers_through_a_thread_pool(make_manager, recorder):
+    dispatcher = ThreadPoolDispatcher()
+    manager = make_manager(dispatcher=dispatcher)
+    manager.add_change_listener(recorder)
+    manager.set("display", "theme", "dark")
+    assert manager.drain(5)
+    assert recorder.changes == [("display", "theme", "light", "dark")]
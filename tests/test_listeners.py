@@ -0,0 +1,94 @@
+import gc
+
+
+class Widget:
+    """Stands in for a UI widget that listens for changes."""
+
+    def __init__(self):
+        self.changes = []
+
+    def refresh(self, category, key, old_value, new_value):
+        self.changes.append((category, key, new_value))
+
+
+def test_listeners_only_hear_their_subscription(make_manager):
+    manager = make_manager()
+    heard = {"key": [], "category": [], "any_category": [], "all": []}
+    manager.add_change_listener(lambda *c: heard["key"].append(c[:2]), "display", "theme")
+    manager.add_change_listener(lambda *c: heard["category"].append(c[:2]), "display")
+    manager.add_change_listener(lambda *c: heard["any_category"].append(c[:2]), key="theme")
+    manager.add_change_listener(lambda *c: heard["all"].append(c[:2]))
+    manager.set("display", "theme", "dark")
+    manager.set("display", "chart_style", "bar")
+    manager.set("general", "time_format", "24h")
+    assert heard == {
+        "key": [("display", "theme")],
+        "category": [("display", "theme"), ("display", "chart_style")],
+        "any_category": [("display", "theme")],
+        "all": [("display", "theme"), ("display", "chart_style"), ("general", "time_format")],
+    }
+
+
+def test_bound_methods_can_be_removed(make_manager):
+    manager = make_manager()
+    widget = Widget()
+    manager.add_change_listener(widget.refresh, "display")
+    manager.remove_change_listener(widget.refresh, "display")
+    manager.set("display", "theme", "dark")
+    assert widget.changes == []
+
+
+def test_weak_listener_drops_out_with_its_owner(make_manager):
+    manager = make_manager()
+    kept, dropped = Widget(), Widget()
+    manager.add_change_listener(kept.refresh, "display", weak=True)
+    manager.add_change_listener(dropped.refresh, "display", weak=True)
+    manager.set("display", "theme", "dark")
+    changes = dropped.changes
+    del dropped
+    gc.collect()
+
+    manager.set("display", "theme", "auto")
+    assert kept.changes == [("display", "theme", "dark"), ("display", "theme", "auto")]
+    assert changes == [("display", "theme", "dark")]
+    assert len(manager._listeners[("display", None)]) == 1
+
+
+def test_weak_function_listener_drops_out(make_manager):
+    manager = make_manager()
+    heard = []
+
+    def listener(category, key, old_value, new_value):
+        heard.append(key)
+
+    manager.add_change_listener(listener, key="theme", weak=True)
+    manager.set("display", "theme", "dark")
+    del listener
+    gc.collect()
+    manager.set("display", "theme", "auto")
+    assert heard == ["theme"]
+    assert (None, "theme") not in manager._listeners
+
+
+def test_strong_listener_keeps_its_owner_alive(make_manager):
+    manager = make_manager()
+    widget = Widget()
+    manager.add_change_listener(widget.refresh)
+    changes = widget.changes
+    del widget
+    gc.collect()
+    manager.set("display", "theme", "dark")
+    assert changes == [("display", "theme", "dark")]
+
+
+def test_failing_listener_does_not_stop_the_others(make_manager, recorder, capsys):
+    manager = make_manager()
+
+    def broken(category, key, old_value, new_value):
+        raise RuntimeError("listener failed")
+
+    manager.add_change_listener(broken)
+    manager.add_change_listener(recorder)
+    manager.set("display", "theme", "dark")
+    assert recorder.changes == [("display", "theme", "light", "dark")]
+    assert "listener failed" in capsys.readouterr().out
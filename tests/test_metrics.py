@@ -0,0 +1,99 @@
+import logging
+
+import pytest
+
+from preference_metrics import NULL_METRICS, InMemorySink, Metrics, PrometheusSink
+
+
+def test_metrics_are_off_by_default(make_manager):
+    manager = make_manager()
+    assert manager.metrics is NULL_METRICS
+    assert manager.dispatcher.metrics is NULL_METRICS
+
+
+def test_debug_mode_switches_recording_on_and_off(make_manager):
+    manager = make_manager()
+    manager.set("advanced", "debug_mode", True)
+    metrics = manager.metrics
+    assert metrics.enabled and manager.dispatcher.metrics is metrics
+
+    manager.set("display", "theme", "dark")
+    with pytest.raises(ValueError):
+        manager.set("display", "theme", "purple")
+    counters = metrics.memory.snapshot()["counters"]
+    assert counters['saves_total{mode="partial"}'] == 1
+    assert counters["validation_errors_total"] == 1
+
+    manager.set("advanced", "debug_mode", False)
+    assert manager.metrics is NULL_METRICS
+    manager.set("display", "theme", "auto")
+    assert metrics.memory.snapshot()["counters"]["validation_errors_total"] == 1
+
+
+def test_log_api_calls_adds_and_removes_a_logging_sink(make_manager, caplog):
+    manager = make_manager()
+    with caplog.at_level(logging.DEBUG, logger="preferences.metrics"):
+        manager.set("advanced", "log_api_calls", True)
+        manager.set("display", "theme", "dark")
+        assert any(message.startswith("saves_total") for message in caplog.messages)
+        manager.set("advanced", "log_api_calls", False)
+        caplog.clear()
+        manager.set("display", "theme", "auto")
+    assert caplog.messages == []
+    assert manager.metrics is NULL_METRICS
+
+
+def refresh_display(category, key, old_value, new_value):
+    pass
+
+
+def test_recorder_passed_in_stays_on(make_manager):
+    metrics = Metrics()
+    manager = make_manager(metrics=metrics)
+    manager.add_change_listener(refresh_display)
+    manager.set("display", "theme", "dark")
+    manager.set("advanced", "debug_mode", False)
+    assert manager.metrics is metrics
+    histograms = metrics.memory.snapshot()["histograms"]
+    assert histograms["load_seconds"]["count"] == 1
+    assert histograms['listener_seconds{listener="refresh_display"}']["count"] == 1
+
+
+def test_in_memory_sink_keeps_totals_per_label():
+    sink = InMemorySink()
+    metrics = Metrics([sink])
+    metrics.increment("saves_total")
+    metrics.increment("saves_total", 2)
+    metrics.increment("errors_total", kind="lock")
+    metrics.gauge("storage_bytes", 10)
+    metrics.gauge("storage_bytes", 20)
+    with metrics.timer("save_seconds"):
+        pass
+    snapshot = sink.snapshot()
+    assert snapshot["counters"] == {"saves_total": 3, 'errors_total{kind="lock"}': 1}
+    assert snapshot["gauges"] == {"storage_bytes": 20}
+    assert snapshot["histograms"]["save_seconds"]["count"] == 1
+    sink.reset()
+    assert sink.snapshot() == {"counters": {}, "gauges": {}, "histograms": {}}
+
+
+def test_prometheus_render():
+    sink = PrometheusSink(buckets=(0.1, 1.0))
+    metrics = Metrics([sink])
+    metrics.increment("saves_total", listener='say "hi"')
+    metrics.gauge("storage_bytes", 512)
+    metrics.observe("save_seconds", 0.05)
+    metrics.observe("save_seconds", 0.5)
+    metrics.observe("save_seconds", 5)
+    assert sink.render().splitlines() == [
+        "# TYPE preferences_saves_total counter",
+        'preferences_saves_total{listener="say \\"hi\\""} 1',
+        "# TYPE preferences_storage_bytes gauge",
+        "preferences_storage_bytes 512",
+        "# TYPE preferences_save_seconds histogram",
+        'preferences_save_seconds_bucket{le="0.1"} 1',
+        'preferences_save_seconds_bucket{le="1.0"} 2',
+        'preferences_save_seconds_bucket{le="+Inf"} 3',
+        "preferences_save_seconds_sum 5.55",
+        "preferences_save_seconds_count 3",
+    ]
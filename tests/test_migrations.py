@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+from preference_migration import (
+    REMOVE, MapValue, MigrationRegistry, RemoveKey, RenameKey, migrate_directory, migrate_storage,
+    stored_version
+)
+from preference_storage import JournalStorage
+
+
+def _registry():
+    registry = MigrationRegistry()
+    registry.add(2, RenameKey("display", "color_scheme", "display", "theme"))
+    registry.add(3, MapValue("display", "theme", {"black": "dark", "sepia": REMOVE}),
+                 RemoveKey("data", "legacy_sync"))
+    return registry
+
+
+def _write(path, preferences):
+    with open(path, "w") as f:
+        json.dump(preferences, f)
+
+
+def _read(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def test_steps_run_in_version_order():
+    preferences = {"display": {"color_scheme": "black"}, "data": {"legacy_sync": True}}
+    assert _registry().migrate(preferences)
+    assert preferences == {"display": {"theme": "dark"}, "_meta": {"schema_version": 3}}
+
+
+def test_mapping_to_remove_restores_the_default():
+    preferences = {"_meta": {"schema_version": 2}, "display": {"theme": "sepia"}}
+    _registry().migrate(preferences)
+    assert "display" not in preferences
+
+
+def test_current_profiles_are_left_alone():
+    preferences = {"_meta": {"schema_version": 3}, "display": {"color_scheme": "black"}}
+    assert not _registry().migrate(preferences)
+    assert preferences["display"] == {"color_scheme": "black"}
+
+
+def test_migration_versions_must_be_above_the_base():
+    with pytest.raises(ValueError):
+        MigrationRegistry().add(1, RemoveKey("data", "legacy_sync"))
+
+
+def test_manager_migrates_on_load_and_writes_back(make_manager, prefs_path):
+    _write(prefs_path, {"display": {"color_scheme": "black"}})
+    manager = make_manager(migrations=_registry())
+    assert manager.get("display", "theme") == "dark"
+    assert _read(prefs_path) == {"_meta": {"schema_version": 3}, "display": {"theme": "dark"}}
+
+
+def test_newer_profile_keeps_its_version(make_manager, prefs_path):
+    _write(prefs_path, {"_meta": {"schema_version": 5}, "general": {"time_format": "24h"}})
+    manager = make_manager(migrations=_registry())
+    manager.set("display", "theme", "dark")
+    stored = _read(prefs_path)
+    assert stored_version(stored) == 5
+    assert stored["general"]["time_format"] == "24h"
+
+
+def test_migrate_directory(tmp_path):
+    for i in range(3):
+        _write(tmp_path / f"user{i}.json", {"display": {"color_scheme": "black"}})
+    _write(tmp_path / "current.json", {"_meta": {"schema_version": 3}})
+    (tmp_path / "broken.json").write_text("{not json")
+
+    report = migrate_directory(str(tmp_path), _registry(), workers=1, chunk_size=2)
+    assert (report.total, report.migrated, report.unchanged, report.failed) == (5, 3, 1, 1)
+    assert _read(tmp_path / "user0.json")["display"] == {"theme": "dark"}
+
+
+def test_migrate_storage(tmp_path):
+    storage = JournalStorage(str(tmp_path / "checkpoint.json"))
+    try:
+        storage.save("a", {"display": {"color_scheme": "black"}})
+        storage.save("b", {"_meta": {"schema_version": 3}, "display": {"theme": "auto"}})
+        report = migrate_storage(storage, _registry(), workers=1, chunk_size=1)
+        assert (report.total, report.migrated, report.unchanged, report.failed) == (2, 1, 1, 0)
+        assert storage.load("a") == {"_meta": {"schema_version": 3}, "display": {"theme": "dark"}}
+    finally:
+        storage.close()
@@ -0,0 +1,97 @@
+import pytest
+
+from preference_storage import SQLiteStorage
+from preference_store import PreferenceStore
+
+
+class FlakyStorage(SQLiteStorage):
+    """In-memory SQLite storage whose saves can be made to fail."""
+
+    fail = False
+
+    def save(self, profile, preferences, changed=None):
+        if self.fail:
+            return False
+        return super().save(profile, preferences, changed)
+
+
+@pytest.fixture
+def storage():
+    return FlakyStorage(":memory:")
+
+
+@pytest.fixture
+def store(storage):
+    store = PreferenceStore(storage, max_profiles=2)
+    yield store
+    store.close()
+
+
+def test_hits_and_misses(store):
+    assert store.get("alice", "display", "theme") == "light"
+    store.set("alice", "display", "theme", "dark")
+    assert store.get("alice", "display", "theme") == "dark"
+    stats = store.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (2, 1, 1)
+
+
+def test_least_recently_used_profile_is_evicted(store):
+    store.profile("alice")
+    store.profile("bob")
+    store.profile("alice")
+    store.profile("carol")
+    assert "bob" not in store
+    assert "alice" in store and "carol" in store
+    assert len(store) == 2
+    assert store.stats()["evictions"] == 1
+
+
+def test_changes_are_saved_on_eviction_only(store, storage):
+    store.set("alice", "display", "theme", "dark")
+    assert "display" not in storage.load("alice")
+    store.profile("bob")
+    store.profile("carol")
+    assert storage.load("alice")["display"] == {"theme": "dark"}
+    # A reloaded profile reads back what was written
+    assert store.get("alice", "display", "theme") == "dark"
+
+
+def test_failed_save_on_eviction_keeps_the_changes(store, storage, capsys):
+    store.set("alice", "display", "theme", "dark")
+    storage.fail = True
+    store.profile("bob")
+    store.profile("carol")
+    assert "alice" in capsys.readouterr().out
+    assert store.stats()["save_failures"] == 1
+    assert store.stats()["unsaved"] == 1
+    assert not store.flush()
+
+    storage.fail = False
+    assert store.flush()
+    assert store.stats()["unsaved"] == 0
+    assert storage.load("alice")["display"] == {"theme": "dark"}
+
+
+def test_set_aside_profile_is_brought_back(store, storage):
+    store.set("alice", "display", "theme", "dark")
+    storage.fail = True
+    store.profile("bob")
+    store.profile("carol")
+    assert store.get("alice", "display", "theme") == "dark"
+    assert store.stats()["misses"] == 3
+
+    storage.fail = False
+    store.flush()
+    assert storage.load("alice")["display"] == {"theme": "dark"}
+
+
+def test_flush_writes_cached_profiles(store, storage):
+    store.set_many("alice", {"general": {"time_format": "24h"}, "display": {"theme": "dark"}})
+    assert store.flush()
+    assert storage.load("alice")["general"] == {"time_format": "24h"}
+    assert PreferenceStore(storage).get("alice", "display", "theme") == "dark"
+
+
+def test_max_profiles_must_be_positive(storage):
+    with pytest.raises(ValueError):
+        PreferenceStore(storage, max_profiles=0)
@@ -0,0 +1,67 @@
+import json
+
+from recent_locations import RECENT_LOCATIONS_CATEGORY
+
+
+def test_searching_again_moves_a_location_to_the_front(make_manager):
+    recent = make_manager().recent_locations
+    for location in ("Paris", "Berlin", "Tokyo"):
+        recent.add(location)
+    recent.add("  berlin ")
+    assert list(recent) == ["berlin", "Tokyo", "Paris"]
+    assert len(recent) == 3
+
+
+def test_list_is_bounded_and_trimmed_when_the_limit_shrinks(make_manager):
+    manager = make_manager()
+    manager.set("location", "max_recent_locations", 3)
+    recent = manager.recent_locations
+    for location in ("A", "B", "C", "D"):
+        recent.add(location)
+    assert list(recent) == ["D", "C", "B"]
+
+    manager.set("location", "max_recent_locations", 1)
+    assert list(recent) == ["D"]
+    assert manager.internal_values(RECENT_LOCATIONS_CATEGORY).keys() == {"D"}
+
+
+def test_turning_saving_off_clears_the_list(make_manager, prefs_path):
+    manager = make_manager()
+    recent = manager.recent_locations
+    recent.add("Paris")
+    manager.set("location", "save_recent_locations", False)
+    assert list(recent) == []
+    recent.add("Berlin")
+    assert list(recent) == []
+    with open(prefs_path) as f:
+        assert RECENT_LOCATIONS_CATEGORY not in json.load(f)
+
+
+def test_search_matches_any_word_start(make_manager):
+    recent = make_manager().recent_locations
+    for location in ("Yorkshire", "New York, NY", "Newark, NJ"):
+        recent.add(location)
+    assert recent.search("york") == ["New York, NY", "Yorkshire"]
+    assert recent.search("NEW") == ["Newark, NJ", "New York, NY"]
+    assert recent.search("new y") == ["New York, NY"]
+    assert recent.search("ork") == []
+    assert recent.search("", limit=1) == ["Newark, NJ"]
+
+
+def test_remove(make_manager):
+    recent = make_manager().recent_locations
+    recent.add("Paris")
+    assert recent.remove("PARIS")
+    assert not recent.remove("Paris")
+    assert "Paris" not in recent
+    assert recent.search("par") == []
+
+
+def test_list_is_reloaded_in_order(make_manager):
+    recent = make_manager().recent_locations
+    for location in ("Paris", "Berlin", "Tokyo", "paris"):
+        recent.add(location)
+
+    reloaded = make_manager().recent_locations
+    assert list(reloaded) == ["paris", "Tokyo", "Berlin"]
+    assert reloaded.search("tok") == ["Tokyo"]
@@ -0,0 +1,60 @@
+import json
+import os
+
+import pytest
+
+import preference_storage
+from preference_storage import JSONStorage
+
+
+@pytest.fixture
+def storage(prefs_path):
+    storage = JSONStorage(prefs_path, snapshot_cache=True)
+    storage.save("default", {"display": {"theme": "dark"}})
+    return storage
+
+
+def _no_json_parse(*args, **kwargs):
+    raise AssertionError("the JSON file was parsed")
+
+
+def test_miss_parses_the_file_and_writes_the_cache(storage):
+    assert not os.path.exists(storage.cache_path)
+    assert storage.load("default") == {"display": {"theme": "dark"}}
+    assert os.path.exists(storage.cache_path)
+
+
+def test_hit_skips_the_json_parse(storage, monkeypatch):
+    storage.load("default")
+    monkeypatch.setattr(preference_storage.json, "load", _no_json_parse)
+    assert storage.load("default") == {"display": {"theme": "dark"}}
+
+
+def test_save_invalidates_the_cache(storage, monkeypatch):
+    storage.load("default")
+    storage.save("default", {"display": {"theme": "auto"}})
+    assert storage.load("default") == {"display": {"theme": "auto"}}
+
+    # The load after the change wrote a fresh cache
+    monkeypatch.setattr(preference_storage.json, "load", _no_json_parse)
+    assert storage.load("default") == {"display": {"theme": "auto"}}
+
+
+def test_file_replaced_elsewhere_invalidates_the_cache(storage, prefs_path):
+    storage.load("default")
+    with open(prefs_path, "w") as f:
+        json.dump({"general": {"time_format": "24h"}}, f)
+    assert storage.load("default") == {"general": {"time_format": "24h"}}
+
+
+def test_unreadable_cache_falls_back_to_the_file(storage):
+    storage.load("default")
+    with open(storage.cache_path, "wb") as f:
+        f.write(b"not marshal data")
+    assert storage.load("default") == {"display": {"theme": "dark"}}
+
+
+def test_manager_starts_from_the_cache(make_manager, storage, prefs_path, monkeypatch):
+    make_manager(snapshot_cache=True)
+    monkeypatch.setattr(preference_storage.json, "load", _no_json_parse)
+    assert make_manager(snapshot_cache=True).get("display", "theme") == "dark"
@@ -0,0 +1,62 @@
+import pytest
+
+from preference_storage import SQLiteStorage
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "preferences.db"))
+    yield storage
+    storage.close()
+
+
+def test_values_round_trip_with_their_types(storage):
+    preferences = {"data": {"auto_refresh": False, "update_interval": 15},
+                   "display": {"theme": "dark"}}
+    storage.save("a", preferences)
+    assert storage.load("a") == preferences
+    assert storage.load("missing") == {}
+
+
+def test_changed_keys_are_upserted_or_deleted(storage):
+    storage.save("a", {"display": {"theme": "dark", "chart_style": "bar"}})
+    storage.save("a", {"display": {"theme": "auto"}, "general": {"time_format": "24h"}},
+                 [("display", "theme"), ("display", "chart_style"), ("general", "time_format")])
+    assert storage.load("a") == {"display": {"theme": "auto"}, "general": {"time_format": "24h"}}
+
+
+def test_only_changed_keys_are_written(storage):
+    storage.save("a", {"display": {"theme": "dark"}, "general": {"time_format": "24h"}})
+    # A stale value for an unchanged key is not written back
+    storage.save("a", {"display": {"theme": "auto"}, "general": {"time_format": "12h"}},
+                 [("display", "theme")])
+    assert storage.load("a") == {"display": {"theme": "auto"}, "general": {"time_format": "24h"}}
+
+
+def test_full_save_replaces_the_profile_only(storage):
+    storage.save("a", {"display": {"theme": "dark"}, "general": {"time_format": "24h"}})
+    storage.save("b", {"display": {"theme": "auto"}})
+    storage.save("a", {"display": {"theme": "light"}})
+    assert storage.load("a") == {"display": {"theme": "light"}}
+    assert storage.load("b") == {"display": {"theme": "auto"}}
+    assert storage.profiles() == ["a", "b"]
+
+
+def test_profiles_survive_reopening(storage):
+    storage.save("a", {"display": {"theme": "dark"}})
+    reopened = SQLiteStorage(storage.path)
+    try:
+        assert reopened.load("a") == {"display": {"theme": "dark"}}
+    finally:
+        reopened.close()
+
+
+def test_manager_profiles_share_a_database(make_manager, storage):
+    first = make_manager(storage=storage, profile="a")
+    second = make_manager(storage=storage, profile="b")
+    first.set("display", "theme", "dark")
+    second.set("general", "time_format", "24h")
+    first.set("display", "theme", "light")
+    # Back at its default, the value's row is deleted
+    assert "display" not in storage.load("a")
+    assert storage.load("b")["general"] == {"time_format": "24h"}
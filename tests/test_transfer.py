@@ -0,0 +1,80 @@
+import io
+import json
+
+from preference_manager import PreferenceManager
+from preference_storage import JSONStorage, SQLiteStorage
+from preference_transfer import export_profiles, import_profiles
+
+
+def _export(storage, **kwargs):
+    out = io.StringIO()
+    count = export_profiles(storage, out, **kwargs)
+    return count, [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+def test_in_memory_sqlite_exports_its_profiles():
+    storage = SQLiteStorage(":memory:")
+    try:
+        storage.save("a", {"general": {"time_format": "24h"}})
+        storage.save("b", {"display": {"theme": "dark"}})
+        count, records = _export(storage)
+    finally:
+        storage.close()
+    assert count == 2
+    assert records == [
+        {"profile": "a", "preferences": {"general": {"time_format": "24h"}}},
+        {"profile": "b", "preferences": {"display": {"theme": "dark"}}},
+    ]
+
+
+def test_json_storage_exports_its_one_profile(prefs_path):
+    storage = JSONStorage(prefs_path)
+    assert _export(storage) == (0, [])
+    storage.save("default", {"display": {"theme": "dark"}})
+    count, records = _export(storage, materialize=True)
+    assert count == 1
+    assert records[0]["profile"] == "default"
+    assert records[0]["preferences"]["display"]["theme"] == "dark"
+    assert records[0]["preferences"]["general"]["time_format"] == "12h"
+
+
+def test_round_trip_rejects_invalid_records():
+    source = SQLiteStorage(":memory:")
+    target = SQLiteStorage(":memory:")
+    try:
+        source.save("a", {"general": {"time_format": "24h"}})
+        out = io.StringIO()
+        export_profiles(source, out)
+        out.write(json.dumps({"profile": "b", "preferences": {"display": {"theme": "purple"}}}) + "\n")
+        out.seek(0)
+
+        report = import_profiles(target, out)
+        assert (report.total, report.imported, report.failed) == (2, 1, 1)
+        assert report.errors[0][:2] == (2, "b")
+        assert target.load("a")["general"] == {"time_format": "24h"}
+    finally:
+        source.close()
+        target.close()
+
+
+def test_round_trip_keeps_recent_locations():
+    source = SQLiteStorage(":memory:")
+    manager = PreferenceManager(storage=source, profile="alice")
+    manager.set("display", "theme", "dark")
+    manager.recent_locations.add("New York, NY")
+    out = io.StringIO()
+    export_profiles(source, out)
+    manager.close()
+    source.close()
+
+    for drop_unknown in (True, False):
+        target = SQLiteStorage(":memory:")
+        try:
+            report = import_profiles(target, io.StringIO(out.getvalue()), drop_unknown=drop_unknown)
+            assert report.ok, report.errors
+            restored = PreferenceManager(storage=target, profile="alice")
+            assert restored.get("display", "theme") == "dark"
+            assert list(restored.recent_locations) == ["New York, NY"]
+            restored.close()
+        finally:
+            target.close()
@@ -0,0 +1,76 @@
+from datetime import datetime
+
+import pytest
+
+import unit_converter
+from unit_converter import Conversion, UnitConverter
+
+
+def test_many_returns_a_list_of_floats():
+    conversion = Conversion("temperature", "celsius", "fahrenheit")
+    assert conversion.many([0, 100]) == pytest.approx([32.0, 212.0])
+    assert type(conversion.many([0, 100])) is list
+    identity = Conversion("temperature", "celsius", "celsius")
+    assert identity.many((1, 2)) == [1.0, 2.0]
+    assert all(type(value) is float for value in identity.many((1, 2)))
+
+
+def test_many_as_array_needs_numpy(monkeypatch):
+    monkeypatch.setattr(unit_converter, "numpy", None)
+    with pytest.raises(ImportError):
+        Conversion("pressure", "hPa", "inHg").many([1013.25], as_array=True)
+
+
+def test_many_returns_a_list_with_numpy_installed():
+    numpy = pytest.importorskip("numpy")
+    conversion = Conversion("wind_speed", "m/s", "kph")
+    for values in ([1.0, 2.0], numpy.array([1.0, 2.0])):
+        result = conversion.many(values)
+        assert type(result) is list
+        assert result == pytest.approx([3.6, 7.2])
+    array = conversion.many([1.0, 2.0], as_array=True)
+    assert isinstance(array, numpy.ndarray)
+
+
+@pytest.mark.parametrize("kind, source, target, value, expected", [
+    ("temperature", "celsius", "fahrenheit", 100, 212.0),
+    ("temperature", "fahrenheit", "celsius", -40, -40.0),
+    ("temperature", "kelvin", "celsius", 0, -273.15),
+    ("wind_speed", "m/s", "kph", 10, 36.0),
+    ("wind_speed", "mph", "m/s", 1, 0.44704),
+    ("wind_speed", "knots", "kph", 1, 1.852),
+    ("pressure", "hPa", "inHg", 1013.25, 29.921),
+    ("pressure", "mb", "hPa", 1000, 1000.0),
+])
+def test_conversion_constants(kind, source, target, value, expected):
+    assert Conversion(kind, source, target)(value) == pytest.approx(expected, abs=1e-3)
+
+
+def test_unknown_units_are_rejected():
+    with pytest.raises(ValueError):
+        Conversion("temperature", "celsius", "mph")
+
+
+def test_converter_follows_the_unit_preferences(make_manager):
+    manager = make_manager()
+    manager.set("general", "temperature_unit", "celsius")
+    converter = UnitConverter(manager)
+    assert converter.format("temperature", 21.4) == "21 °C"
+    celsius = converter.conversion("temperature")
+    # The conversion is cached until its preference changes
+    assert converter.conversion("temperature") is celsius
+
+    pressure = converter.conversion("pressure")
+    manager.set("general", "temperature_unit", "fahrenheit")
+    assert converter.conversion("pressure") is pressure
+    assert converter.symbol("temperature") == "°F"
+    assert converter.temperature([0, 100]) == pytest.approx([32.0, 212.0])
+
+
+def test_time_format_follows_the_preference(make_manager):
+    manager = make_manager()
+    converter = UnitConverter(manager)
+    moment = datetime(2024, 1, 1, 15, 5)
+    assert converter.format_time(moment) == "03:05 PM"
+    manager.set("general", "time_format", "24h")
+    assert converter.format_times([moment]) == ["15:05"]
@@ -0,0 +1,205 @@
+import os
+import threading
+
+import pytest
+
+from weather_cache import WeatherCache
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class StubFetcher:
+    """Stands in for the weather API; counts calls and can be made to fail or block."""
+
+    def __init__(self):
+        self.calls = []
+        self.error = None
+        self.gate = None
+
+    def __call__(self, location, request, timeout):
+        self.calls.append((location, request, timeout))
+        if self.gate is not None:
+            self.gate.wait(5)
+        if self.error is not None:
+            raise self.error
+        return {"location": location, "request": request, "fetch": len(self.calls)}
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def fetcher():
+    return StubFetcher()
+
+
+@pytest.fixture
+def manager(make_manager):
+    return make_manager()
+
+
+@pytest.fixture
+def make_cache(manager, fetcher, clock, tmp_path):
+    def make(**kwargs):
+        kwargs.setdefault("cache_dir", str(tmp_path / "cache"))
+        return WeatherCache(manager, fetcher, clock=clock, **kwargs)
+    return make
+
+
+def test_fresh_response_is_served_from_memory(make_cache, fetcher):
+    cache = make_cache()
+    first = cache.get("London")
+    assert cache.get(" london ") == first
+    assert len(fetcher.calls) == 1
+    stats = cache.stats()
+    assert stats["memory_hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+
+def test_requests_are_cached_separately(make_cache, fetcher):
+    cache = make_cache()
+    cache.get("London", "current")
+    cache.get("London", {"days": 3, "hourly": True})
+    cache.get("London", {"hourly": True, "days": 3})
+    assert len(fetcher.calls) == 2
+
+
+def test_update_interval_sets_freshness(make_cache, manager, fetcher, clock):
+    cache = make_cache()
+    cache.get("London")
+    clock.advance(manager.get("data", "update_interval") * 60 - 1)
+    cache.get("London")
+    assert len(fetcher.calls) == 1
+    clock.advance(2)
+    assert cache.get("London")["fetch"] == 2
+
+
+def test_force_always_fetches(make_cache, fetcher):
+    cache = make_cache()
+    cache.get("London")
+    cache.get("London", force=True)
+    assert len(fetcher.calls) == 2
+
+
+def test_timeout_comes_from_preferences(make_cache, manager, fetcher):
+    cache = make_cache()
+    manager.set("advanced", "api_timeout", 20)
+    cache.get("London")
+    assert fetcher.calls[0][2] == 20
+
+
+def test_preference_changes_retune_live(make_cache, manager, fetcher, clock):
+    cache = make_cache()
+    cache.get("London")
+    clock.advance(10 * 60)
+    manager.set("data", "update_interval", 5)
+    assert cache.fresh_for == 5 * 60
+    cache.get("London")
+    assert len(fetcher.calls) == 2
+
+
+def test_disk_tier_survives_a_new_cache(make_cache, manager, fetcher, clock, tmp_path):
+    make_cache().get("London")
+    cache = WeatherCache(manager, fetcher, cache_dir=str(tmp_path / "cache"), clock=clock)
+    assert cache.get("London")["fetch"] == 1
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_memory_tier_is_bounded(make_cache, fetcher):
+    cache = make_cache(cache_dir=None, memory_size=2)
+    for location in ("London", "Paris", "Rome"):
+        cache.get(location)
+    assert cache.stats()["memory_entries"] == 2
+    cache.get("London")
+    assert len(fetcher.calls) == 4
+
+
+def test_stale_response_is_served_when_fetch_fails(make_cache, manager, fetcher, clock):
+    cache = make_cache()
+    first = cache.get("London")
+    clock.advance(manager.get("data", "update_interval") * 60 + 1)
+    fetcher.error = OSError("API down")
+    assert cache.get("London") == first
+    stats = cache.stats()
+    assert stats["stale_hits"] == 1
+    assert stats["fetch_errors"] == 1
+
+
+def test_fetch_error_without_fallback_is_raised(make_cache, fetcher):
+    cache = make_cache()
+    fetcher.error = OSError("API down")
+    with pytest.raises(OSError):
+        cache.get("London")
+
+
+def test_responses_older_than_cache_duration_are_evicted(make_cache, manager, fetcher, clock, tmp_path):
+    cache = make_cache()
+    cache.get("London")
+    clock.advance(manager.get("data", "cache_duration") * 86400 + 1)
+    fetcher.error = OSError("API down")
+    with pytest.raises(OSError):
+        cache.get("London")
+    assert os.listdir(tmp_path / "cache") == []
+
+
+def test_shrinking_cache_duration_purges_at_once(make_cache, manager, clock, tmp_path):
+    cache = make_cache()
+    cache.get("London")
+    clock.advance(2 * 86400)
+    manager.set("data", "cache_duration", 1)
+    assert os.listdir(tmp_path / "cache") == []
+    assert cache.stats()["memory_entries"] == 0
+
+
+def test_concurrent_misses_share_one_fetch(make_cache, fetcher):
+    cache = make_cache()
+    fetcher.gate = threading.Event()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("London"))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    # Let every caller reach the fetch before it completes
+    while cache.stats()["coalesced"] < 4:
+        threading.Event().wait(0.01)
+    fetcher.gate.set()
+    for thread in threads:
+        thread.join()
+    assert len(fetcher.calls) == 1
+    assert len(results) == 5
+    assert all(result == results[0] for result in results)
+
+
+def test_coalesced_callers_see_the_fetch_error(make_cache, fetcher):
+    cache = make_cache()
+    fetcher.gate = threading.Event()
+    fetcher.error = OSError("API down")
+    errors = []
+
+    def get():
+        try:
+            cache.get("London")
+        except OSError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=get) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    while cache.stats()["coalesced"] < 2:
+        threading.Event().wait(0.01)
+    fetcher.gate.set()
+    for thread in threads:
+        thread.join()
+    assert len(fetcher.calls) == 1
+    assert len(errors) == 3
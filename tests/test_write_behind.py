@@ -0,0 +1,49 @@
+import json
+import time
+
+from preference_storage import JSONStorage
+
+
+def _counting_storage(path, monkeypatch):
+    storage = JSONStorage(path)
+    saves = []
+    save = storage.save
+
+    def counted(profile, preferences, changed=None):
+        saves.append(changed)
+        return save(profile, preferences, changed)
+
+    monkeypatch.setattr(storage, "save", counted)
+    return storage, saves
+
+
+def test_burst_of_sets_is_saved_once(make_manager, prefs_path, monkeypatch):
+    storage, saves = _counting_storage(prefs_path, monkeypatch)
+    manager = make_manager(storage=storage, write_behind=True, flush_delay=0.5)
+    # Spread the burst out so the flusher is already waiting while it arrives
+    for i in range(50):
+        manager.set("data", "update_interval", 5 + i)
+        time.sleep(0.002)
+    assert saves == []
+
+    deadline = time.monotonic() + 5
+    while not saves and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.1)
+    assert len(saves) == 1
+    with open(prefs_path) as f:
+        assert json.load(f)["data"]["update_interval"] == 54
+
+
+def test_close_writes_what_is_pending(make_manager, prefs_path, monkeypatch):
+    storage, saves = _counting_storage(prefs_path, monkeypatch)
+    manager = make_manager(storage=storage, write_behind=True, flush_delay=60)
+    manager.set("display", "theme", "dark")
+    manager.set("general", "time_format", "24h")
+    started = time.monotonic()
+    manager.close()
+    assert time.monotonic() - started < 5
+    assert len(saves) == 1
+    with open(prefs_path) as f:
+        stored = json.load(f)
+    assert (stored["display"]["theme"], stored["general"]["time_format"]) == ("dark", "24h")
@@ -0,0 +1,208 @@
+from typing import Any, Dict, Iterable, List, Sequence
+from datetime import datetime
+import threading
+
+try:
+    import numpy
+except ImportError:  # Optional; only needed for as_array=True
+    numpy = None
+
+from preference_manager import PreferenceManager
+
+
+# Each unit as an affine map onto a base unit: base = value * scale + offset
+UNIT_SCALES = {
+    "temperature": {  # base: kelvin
+        "celsius": (1.0, 273.15),
+        "fahrenheit": (5.0 / 9.0, 273.15 - 32.0 * 5.0 / 9.0),
+        "kelvin": (1.0, 0.0),
+    },
+    "wind_speed": {  # base: metres per second
+        "m/s": (1.0, 0.0),
+        "kph": (1.0 / 3.6, 0.0),
+        "mph": (0.44704, 0.0),
+        "knots": (1852.0 / 3600.0, 0.0),
+    },
+    "pressure": {  # base: pascal
+        "hPa": (100.0, 0.0),
+        "mb": (100.0, 0.0),
+        "inHg": (3386.389, 0.0),
+    },
+}
+
+UNIT_SYMBOLS = {
+    "celsius": "°C",
+    "fahrenheit": "°F",
+    "kelvin": "K",
+    "m/s": "m/s",
+    "kph": "km/h",
+    "mph": "mph",
+    "knots": "kn",
+    "hPa": "hPa",
+    "mb": "mb",
+    "inHg": "inHg",
+}
+
+# Which general preference picks the display unit of each quantity
+UNIT_PREFERENCES = {
+    "temperature": "temperature_unit",
+    "wind_speed": "wind_speed_unit",
+    "pressure": "pressure_unit",
+}
+
+# Units that weather readings arrive in unless told otherwise
+DEFAULT_SOURCE_UNITS = {
+    "temperature": "celsius",
+    "wind_speed": "m/s",
+    "pressure": "hPa",
+}
+
+TIME_FORMATS = {
+    "12h": "%I:%M %p",
+    "24h": "%H:%M",
+}
+
+
+class Conversion:
+    """Convert readings from one unit to another as value * scale + offset."""
+    __slots__ = ('source', 'target', 'scale', 'offset')
+
+    def __init__(self, kind: str, source: str, target: str):
+        try:
+            source_scale, source_offset = UNIT_SCALES[kind][source]
+            target_scale, target_offset = UNIT_SCALES[kind][target]
+        except KeyError:
+            raise ValueError(f"Cannot convert {kind} from {source} to {target}")
+        self.source = source
+        self.target = target
+        self.scale = source_scale / target_scale
+        self.offset = (source_offset - target_offset) / target_scale
+
+    @property
+    def is_identity(self) -> bool:
+        """True if readings are already in the target unit."""
+        return self.scale == 1.0 and self.offset == 0.0
+
+    def __call__(self, value: float) -> float:
+        return value * self.scale + self.offset
+
+    def many(self, values, as_array: bool = False):
+        """Convert a whole series at once.
+
+        Returns a list of floats whether or not NumPy is installed. With
+        as_array=True a NumPy array is returned instead, which needs NumPy.
+        NumPy arrays passed in are converted with one vectorized expression.
+        """
+        scale = self.scale
+        offset = self.offset
+        if as_array or (numpy is not None and isinstance(values, numpy.ndarray)):
+            if numpy is None:
+                raise ImportError("as_array=True needs NumPy")
+            array = numpy.asarray(values, dtype=float)
+            array = array.copy() if self.is_identity else array * scale + offset
+            return array if as_array else array.tolist()
+        if self.is_identity:
+            return [float(value) for value in values]
+        if offset == 0.0:
+            return [value * scale for value in values]
+        return [value * scale + offset for value in values]
+
+
+class UnitConverter:
+    """Convert and format weather readings in the units the user picked.
+
+    The conversion for each quantity is worked out once and cached; a change
+    listener on the general category drops only the cached conversion whose
+    preference changed, so converting never re-reads preferences.
+    """
+
+    def __init__(self, pref_manager: PreferenceManager, source_units: Dict[str, str] = None):
+        self.pref_manager = pref_manager
+        self.source_units = {**DEFAULT_SOURCE_UNITS, **(source_units or {})}
+        self._lock = threading.Lock()
+        self._conversions = {}  # quantity -> Conversion
+        self._time_format = None
+        pref_manager.add_change_listener(self._on_preference_change, "general", weak=True)
+
+    def _on_preference_change(self, category: str, key: str, old_value: Any, new_value: Any):
+        """Forget the cached conversion that depends on the changed preference."""
+        with self._lock:
+            if key == "time_format":
+                self._time_format = None
+            for kind, preference in UNIT_PREFERENCES.items():
+                if preference == key:
+                    self._conversions.pop(kind, None)
+
+    def conversion(self, kind: str) -> Conversion:
+        """Return the cached conversion from the source unit to the user's unit."""
+        conversion = self._conversions.get(kind)
+        if conversion is None:
+            if kind not in UNIT_PREFERENCES:
+                raise ValueError(f"Unknown quantity: {kind}")
+            with self._lock:
+                target = self.pref_manager.get("general", UNIT_PREFERENCES[kind])
+                conversion = Conversion(kind, self.source_units[kind], target)
+                self._conversions[kind] = conversion
+        return conversion
+
+    def unit(self, kind: str) -> str:
+        """The unit readings of kind are shown in."""
+        return self.conversion(kind).target
+
+    def symbol(self, kind: str) -> str:
+        """Short symbol for the display unit, such as °F or km/h."""
+        return UNIT_SYMBOLS[self.unit(kind)]
+
+    def convert(self, kind: str, value: float) -> float:
+        """Convert a single reading."""
+        return self.conversion(kind)(value)
+
+    def convert_many(self, kind: str, values: Iterable[float], as_array: bool = False):
+        """Convert a series of readings in one batched call; see Conversion.many()."""
+        return self.conversion(kind).many(values, as_array)
+
+    def temperature(self, values, as_array: bool = False):
+        """Convert temperature readings to the user's unit."""
+        return self.convert_many("temperature", values, as_array)
+
+    def wind_speed(self, values, as_array: bool = False):
+        """Convert wind speed readings to the user's unit."""
+        return self.convert_many("wind_speed", values, as_array)
+
+    def pressure(self, values, as_array: bool = False):
+        """Convert pressure readings to the user's unit."""
+        return self.convert_many("pressure", values, as_array)
+
+    def format(self, kind: str, value: float, precision: int = 0) -> str:
+        """Convert a reading and format it with its unit symbol."""
+        conversion = self.conversion(kind)
+        return f"{conversion(value):.{precision}f} {UNIT_SYMBOLS[conversion.target]}"
+
+    def time_format(self) -> str:
+        """strftime pattern for the user's 12h/24h choice."""
+        time_format = self._time_format
+        if time_format is None:
+            time_format = self._time_format = TIME_FORMATS[
+                self.pref_manager.get("general", "time_format")
+            ]
+        return time_format
+
+    def format_time(self, moment: datetime) -> str:
+        """Format a time of day the way the user prefers."""
+        return moment.strftime(self.time_format())
+
+    def format_times(self, moments: Iterable[datetime]) -> List[str]:
+        """Format many times of day, such as the labels of an hourly chart."""
+        pattern = self.time_format()
+        return [moment.strftime(pattern) for moment in moments]
+
+    def chart_series(self, kind: str, times: Sequence[datetime], values) -> Dict[str, Any]:
+        """Everything a chart needs to plot a series in the user's units and style."""
+        conversion = self.conversion(kind)
+        return {
+            "style": self.pref_manager.get("display", "chart_style"),
+            "unit": conversion.target,
+            "symbol": UNIT_SYMBOLS[conversion.target],
+            "labels": self.format_times(times),
+            "values": conversion.many(values),
+        }
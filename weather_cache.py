@@ -0,0 +1,273 @@
+from typing import Any, Callable, Dict, Optional, Tuple
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import threading
+import time
+
+from preference_storage import _write_atomic
+
+
+class _Entry:
+    """A cached response and when it was fetched."""
+    __slots__ = ('fetched_at', 'response')
+
+    def __init__(self, fetched_at: float, response: Any):
+        self.fetched_at = fetched_at
+        self.response = response
+
+
+class _Flight:
+    """A fetch in progress that other callers for the same key wait on."""
+    __slots__ = ('done', 'response', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+class WeatherCache:
+    """Cache weather API responses by location and request.
+
+    Responses live in an in-memory LRU in front of an optional on-disk tier
+    (one JSON file per key under cache_dir). How long things are kept follows
+    the preferences and is re-tuned as soon as they change:
+
+    - data.update_interval: a response younger than this is served without
+      contacting the API
+    - data.cache_duration: older responses are still kept, and served if a
+      refresh fails, until they are this old; then they are evicted
+    - advanced.api_timeout: passed to the fetcher, and how long callers
+      wait on a fetch another caller already started for the same key
+
+    fetcher is called as fetcher(location, request, timeout) and must return
+    a JSON-serializable response; a local stub works for testing. Concurrent
+    misses for one key share a single fetch.
+    """
+
+    def __init__(self, pref_manager, fetcher: Callable[[str, Any, float], Any],
+                 cache_dir: Optional[str] = None, memory_size: int = 256,
+                 clock: Callable[[], float] = time.time):
+        if memory_size < 1:
+            raise ValueError("memory_size must be at least 1")
+        self.pref_manager = pref_manager
+        self.fetcher = fetcher
+        self.cache_dir = cache_dir
+        self.memory_size = memory_size
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> _Entry, least recently used first
+        self._flights = {}  # key -> _Flight
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.coalesced = 0
+        self.fetch_errors = 0
+
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+        self._apply_preferences()
+        self.purge()
+        for category in ("data", "advanced"):
+            pref_manager.add_change_listener(self._on_preference_change, category, weak=True)
+
+    def _apply_preferences(self):
+        """Read the cache lifetimes from the preferences."""
+        self.fresh_for = self.pref_manager.get("data", "update_interval") * 60
+        self.keep_for = self.pref_manager.get("data", "cache_duration") * 86400
+        self.api_timeout = self.pref_manager.get("advanced", "api_timeout")
+
+    def _on_preference_change(self, category: str, key: str, old_value: Any, new_value: Any):
+        """Re-tune the lifetimes, evicting at once if cache_duration shrank."""
+        if key in ("update_interval", "cache_duration", "api_timeout"):
+            self._apply_preferences()
+            if key == "cache_duration" and new_value < old_value:
+                self.purge()
+
+    @staticmethod
+    def _key(location: str, request: Any) -> str:
+        """Cache key for a location and request (an endpoint name or a dict of parameters)."""
+        location = " ".join(location.split()).casefold()
+        return location + "|" + json.dumps(request, sort_keys=True, separators=(',', ':'))
+
+    def get(self, location: str, request: Any = "current", force: bool = False) -> Any:
+        """Return the response for a request, from the cache while it is fresh.
+
+        With force=True the API is always asked. If fetching fails, an older
+        response that is still within cache_duration is returned instead;
+        otherwise the fetch error is raised.
+        """
+        key = self._key(location, request)
+        now = self.clock()
+        entry, tier = self._lookup(key, now)
+        if entry is not None and not force and now - entry.fetched_at < self.fresh_for:
+            self._count(tier + "_hits", "weather_cache_hits_total", tier=tier)
+            return entry.response
+
+        self._count("misses", "weather_cache_misses_total")
+        try:
+            return self._fetch(key, location, request)
+        except Exception:
+            if entry is None:
+                raise
+            self._count("stale_hits", "weather_cache_stale_hits_total")
+            return entry.response
+
+    def invalidate(self, location: str, request: Any = "current"):
+        """Drop one cached response from both tiers."""
+        key = self._key(location, request)
+        with self._lock:
+            self._memory.pop(key, None)
+        if self.cache_dir is not None:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def clear(self):
+        """Drop every cached response."""
+        with self._lock:
+            self._memory.clear()
+        if self.cache_dir is not None:
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(".json"):
+                    try:
+                        os.remove(os.path.join(self.cache_dir, name))
+                    except OSError:
+                        pass
+
+    def purge(self) -> int:
+        """Evict everything older than cache_duration; returns how many disk entries went."""
+        cutoff = self.clock() - self.keep_for
+        with self._lock:
+            for key in [k for k, entry in self._memory.items() if entry.fetched_at < cutoff]:
+                del self._memory[key]
+        removed = 0
+        if self.cache_dir is not None:
+            # File modification times are set to the fetch time, so no file is read
+            with os.scandir(self.cache_dir) as entries:
+                for item in entries:
+                    try:
+                        if item.name.endswith(".json") and item.stat().st_mtime < cutoff:
+                            os.remove(item.path)
+                            removed += 1
+                    except OSError:
+                        pass
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit and miss counts, and the share of lookups served from the cache."""
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "stale_hits": self.stale_hits,
+            "coalesced": self.coalesced,
+            "fetch_errors": self.fetch_errors,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+    def _count(self, counter: str, metric: str, **labels):
+        """Bump one of the stats() counters and the matching manager metric."""
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+        self.pref_manager.metrics.increment(metric, **labels)
+
+    def _lookup(self, key: str, now: float) -> Tuple[Optional[_Entry], Optional[str]]:
+        """Find a response within cache_duration, checking memory before disk.
+
+        Returns the entry and the tier it came from.
+        """
+        cutoff = now - self.keep_for
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry.fetched_at >= cutoff:
+                    self._memory.move_to_end(key)
+                    return entry, "memory"
+                del self._memory[key]
+
+        entry = self._read_disk(key)
+        if entry is None:
+            return None, None
+        if entry.fetched_at < cutoff:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            return None, None
+        self._remember(key, entry)
+        return entry, "disk"
+
+    def _remember(self, key: str, entry: _Entry):
+        """Put an entry at the front of the memory tier, evicting the least recently used."""
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def _fetch(self, key: str, location: str, request: Any) -> Any:
+        """Fetch a response, or wait for the fetch another caller already started."""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            self._count("coalesced", "weather_cache_coalesced_total")
+            if not flight.done.wait(self.api_timeout):
+                raise TimeoutError(f"Timed out waiting for weather data for {location}")
+            if flight.error is not None:
+                raise flight.error
+            return flight.response
+
+        try:
+            response = self.fetcher(location, request, self.api_timeout)
+            entry = _Entry(self.clock(), response)
+            self._remember(key, entry)
+            self._write_disk(key, entry)
+            flight.response = response
+            return response
+        except Exception as e:
+            self._count("fetch_errors", "weather_cache_fetch_errors_total")
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode()).hexdigest() + ".json")
+
+    def _read_disk(self, key: str) -> Optional[_Entry]:
+        if self.cache_dir is None:
+            return None
+        try:
+            with open(self._path(key), 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Guard against the (unlikely) hash collision
+        if data.get("key") != key:
+            return None
+        return _Entry(data["fetched_at"], data["response"])
+
+    def _write_disk(self, key: str, entry: _Entry):
+        if self.cache_dir is None:
+            return
+        path = self._path(key)
+        data = {"key": key, "fetched_at": entry.fetched_at, "response": entry.response}
+        if _write_atomic(path, json.dumps(data, separators=(',', ':')), "weather cache entry"):
+            try:
+                os.utime(path, (entry.fetched_at, entry.fetched_at))
+            except OSError:
+                pass